@@ -13,6 +13,7 @@ from langgraph.prebuilt import ToolNode, tools_condition
 from langchain_core.runnables import RunnableConfig
 
 from tools import get_current_datetime, get_system_info, list_files, read_file
+from summarization import clamp_summary, summary_prompt
 
 load_dotenv()
 api_key = os.environ["GOOGLE_API_KEY"]
@@ -38,12 +39,10 @@ def chat(user_query: list[AnyMessage] | str) -> AnyMessage:
     return response
 
 
-def create_summary(messages: list[AnyMessage]) -> AnyMessage:
-    prompt = f"""
-    Summarize the following conversation. Make sure redundancy is removed.
-    {messages}
-    """
-    response = chat(prompt)
+def create_summary(existing_summary: str, messages: list[AnyMessage]) -> AnyMessage:
+    # only the newly evicted messages are sent, rendered as compact text, and
+    # the plain client is used so no tool schemas ride along
+    response = client.invoke(summary_prompt(existing_summary, messages))
     return response
 
 
@@ -80,7 +79,7 @@ def check_len_node(state: State) -> State:
 
 def echo(state: State) -> State:
     if state.get("summary"):
-        summary = state.get("summary", "")
+        summary = f"Here is the conversation summary so far: {state['summary']}"
         messages = [SystemMessage(content=summary)] + state.get("messages", [])
         response = chat(messages)
     else:
@@ -94,12 +93,9 @@ def summarize(state: State) -> State:
     safe_index = get_safe_trim_index(messages)
     if (len(messages) > 10) and (safe_index > 0):
         messages_to_delete = messages[:safe_index]
-        conversation_to_summarize = [
-            SystemMessage(content=existing_summary)
-        ] + messages_to_delete
-        summary = create_summary(conversation_to_summarize)
-        summary = existing_summary + "\n" + summary.text
-        summary = f"Here is the conversation summary so far: {summary}"
+        summary = create_summary(existing_summary, messages_to_delete)
+        # the updated summary replaces the old one and is held to a token budget
+        summary = clamp_summary(summary.text)
 
         # step 2: delete all messages except last n
         delete_messages = [RemoveMessage(id=m.id) for m in messages_to_delete]
@@ -14,6 +14,7 @@ from langchain_core.runnables import RunnableConfig
 
 from tools import (
     get_current_datetime,
+    get_search_result,
     get_system_info,
     list_files,
     read_file,
@@ -25,7 +26,14 @@ load_dotenv()
 api_key = os.environ["GOOGLE_API_KEY"]
 
 model = "gemini-2.5-flash-lite"
-tools = [get_current_datetime, list_files, read_file, get_system_info, search_web]
+tools = [
+    get_current_datetime,
+    list_files,
+    read_file,
+    get_system_info,
+    search_web,
+    get_search_result,
+]
 
 client = init_chat_model(
     model="google_genai:gemini-3-flash-preview",  # or gpt-4.1, claude-sonnet-4-5-20250929
@@ -1,7 +1,6 @@
 import os
 import sqlite3
 from typing import Annotated, TypedDict
-import json
 
 from dotenv import load_dotenv
 from langchain.chat_models import init_chat_model
@@ -10,17 +9,17 @@ from langchain_core.messages import (
     HumanMessage,
     AIMessage,
     SystemMessage,
-    ToolMessage,
 )
 from langgraph.checkpoint.sqlite import SqliteSaver
-from langgraph.graph import START, StateGraph
+from langgraph.graph import END, START, StateGraph
 from langgraph.graph.message import add_messages, RemoveMessage
 from langgraph.graph.state import Checkpointer, CompiledStateGraph
 from langgraph.prebuilt import ToolNode, tools_condition
-from langchain_core.runnables import RunnableConfig
+from langchain_core.runnables import RunnableConfig, RunnableLambda
 
 from tools import (
     get_current_datetime,
+    get_search_result,
     get_system_info,
     list_files,
     read_file,
@@ -28,9 +27,19 @@ from tools import (
     update_user_preferences,
 )
 from prompts import LIBRARIAN_SYSTEM_PROMPT
+from preferences import (
+    PreferenceExtractor,
+    PreferenceUpdate,
+    preference_store,
+    user_id_from_config,
+)
+from prompt_prefix import PrefixTracker, assemble
 
 load_dotenv()
 api_key = os.environ["GOOGLE_API_KEY"]
+# PREFERENCE_TOOL=1 goes back to the librarian saving preferences with the
+# update_user_preferences tool, one extra model loop per preference it hears
+PREFERENCE_TOOL = os.environ.get("PREFERENCE_TOOL", "") not in ("", "0")
 
 model = "gemini-2.5-flash-lite"
 tools = [
@@ -39,8 +48,10 @@ tools = [
     read_file,
     get_system_info,
     search_web,
-    update_user_preferences,
+    get_search_result,
 ]
+if PREFERENCE_TOOL:
+    tools.append(update_user_preferences)
 
 client = init_chat_model(
     model="google_genai:gemini-3-flash-preview",  # or gpt-4.1, claude-sonnet-4-5-20250929
@@ -54,18 +65,42 @@ client = init_chat_model(
 
 model_with_tools = client.bind_tools(tools)
 
+# unless PREFERENCE_TOOL is set, preferences are pulled out of the user's
+# message after the turn by the lite model, instead of the librarian spending
+# a tool round trip on them
+extractor_client = init_chat_model(
+    model=f"google_genai:{model}", api_key=api_key, temperature=0, max_retries=2
+)
+preference_extractor = PreferenceExtractor(
+    extractor_client.with_structured_output(PreferenceUpdate)
+)
+prefix_tracker = PrefixTracker()
+
 
 def chat(user_query: list[AnyMessage] | str) -> AnyMessage:
     response = model_with_tools.invoke(user_query)
     return response
 
 
-def create_summary(messages: list[AnyMessage]) -> AnyMessage:
-    prompt = f"""
+async def achat(user_query: list[AnyMessage] | str) -> AnyMessage:
+    response = await model_with_tools.ainvoke(user_query)
+    return response
+
+
+def summary_prompt(messages: list[AnyMessage]) -> str:
+    return f"""
     Summarize the following conversation. Make sure redundancy is removed.
     {messages}
     """
-    response = chat(prompt)
+
+
+def create_summary(messages: list[AnyMessage]) -> AnyMessage:
+    response = chat(summary_prompt(messages))
+    return response
+
+
+async def acreate_summary(messages: list[AnyMessage]) -> AnyMessage:
+    response = await achat(summary_prompt(messages))
     return response
 
 
@@ -91,7 +126,6 @@ def get_safe_trim_index(messages: list[AnyMessage], keep_last_n: int = 5) -> int
 
 class State(TypedDict, total=False):
     messages: Annotated[list[AnyMessage], add_messages]
-    user_preferences: dict[str, list[str]]
     conversation_length: int
     summary: str
 
@@ -101,82 +135,75 @@ def check_len_node(state: State) -> State:
     return {"conversation_length": cl}
 
 
-def load_user_preference(state: State) -> dict[str, list[str]]:
-    existing_user_preferences = state.get(
-        "user_preferences", {"likes": [], "dislikes": []}
-    )
+def echo_prompt(state: State, config: RunnableConfig) -> list[AnyMessage]:
+    # preferences live in the store, keyed by user, not in the thread's state;
+    # the rendered prompt is cached until the user's preferences change
+    user_id = user_id_from_config(config)
+    system = preference_store.system_prompt(user_id, LIBRARIAN_SYSTEM_PROMPT)
+    # the system prompt only changes with the user's preferences, and the
+    # summary goes after it, so consecutive prompts share their prefix
+    prompt = assemble(system, state.get("messages", []), state.get("summary", ""))
+    prefix_tracker.observe(config["configurable"].get("thread_id"), prompt)
+    return prompt
 
-    recent_messages = state.get("messages", [])[-5:]
-    for message in recent_messages:
-        if (
-            isinstance(message, ToolMessage)
-            and message.name == "update_user_preferences"
-        ):
-            content = str(message.content)
 
-            if not content.startswith("PREF_UPDATE:"):
-                continue
+def echo(state: State, config: RunnableConfig) -> State:
+    response = chat(echo_prompt(state, config))
+    prefix_tracker.observe_usage(response)
+    return {"messages": [response]}
 
-            try:
-                updated_str = content.replace("PREF_UPDATE:", "")
-                prefs = json.loads(updated_str)
 
-                likes = set(
-                    existing_user_preferences.get("likes", []) + prefs.get("likes", [])
-                )
-                dislikes = set(
-                    existing_user_preferences.get("dislikes", [])
-                    + prefs.get("dislikes", [])
-                )
+async def aecho(state: State, config: RunnableConfig) -> State:
+    response = await achat(echo_prompt(state, config))
+    prefix_tracker.observe_usage(response)
+    return {"messages": [response]}
 
-                existing_user_preferences["likes"] = list(likes)
-                existing_user_preferences["dislikes"] = list(dislikes)
-            except json.JSONDecodeError:
-                continue  # Skip if parsing fails
 
-    return existing_user_preferences
+def messages_to_summarize(state: State) -> list[AnyMessage]:
+    """Messages that summarize should fold into the summary, empty if none."""
+    messages = state.get("messages", [])
+    safe_index = get_safe_trim_index(messages)
+    if (len(messages) > 10) and (safe_index > 0):
+        return messages[:safe_index]
+    return []
 
 
-def echo(state: State) -> State:
-    messages = state.get("messages", [])
+def summary_update(
+    state: State, messages_to_delete: list[AnyMessage], summary: AnyMessage
+) -> State:
+    existing_summary = state.get("summary", "")
+    # echo_prompt labels the summary, so it is stored without a heading
+    summary = (existing_summary + "\n" + summary.text).strip()
 
-    user_preferences = load_user_preference(state)
+    # step 2: delete all messages except last n
+    delete_messages = [RemoveMessage(id=m.id) for m in messages_to_delete]
 
-    system_msg = SystemMessage(
-        content=LIBRARIAN_SYSTEM_PROMPT.format(user_preferences=user_preferences)
-    )
-    summary = state.get("summary", "")
-    if summary:
-        messages = [system_msg, SystemMessage(content=summary)] + state.get(
-            "messages", []
-        )
-        response = chat(messages)
-    else:
-        messages = [system_msg] + state.get("messages", [])
-        response = chat(messages)
-    return {"messages": [response], "user_preferences": user_preferences}
+    return {"messages": delete_messages, "summary": summary}
 
 
 def summarize(state: State) -> State:
-    messages = state.get("messages", [])
-    existing_summary = state.get("summary", "")
-    safe_index = get_safe_trim_index(messages)
-    if (len(messages) > 10) and (safe_index > 0):
-        messages_to_delete = messages[:safe_index]
-        conversation_to_summarize = [
-            SystemMessage(content=existing_summary)
-        ] + messages_to_delete
-        summary = create_summary(conversation_to_summarize)
-        summary = existing_summary + "\n" + summary.text
-        summary = f"Here is the conversation summary so far: {summary}"
-
-        # step 2: delete all messages except last n
-        delete_messages = [RemoveMessage(id=m.id) for m in messages_to_delete]
-
-        return {"messages": delete_messages, "summary": summary}
-    else:
+    messages_to_delete = messages_to_summarize(state)
+    if not messages_to_delete:
         return {}  # to make no changes to the state
 
+    conversation_to_summarize = [
+        SystemMessage(content=state.get("summary", ""))
+    ] + messages_to_delete
+    summary = create_summary(conversation_to_summarize)
+    return summary_update(state, messages_to_delete, summary)
+
+
+async def asummarize(state: State) -> State:
+    messages_to_delete = messages_to_summarize(state)
+    if not messages_to_delete:
+        return {}  # to make no changes to the state
+
+    conversation_to_summarize = [
+        SystemMessage(content=state.get("summary", ""))
+    ] + messages_to_delete
+    summary = await acreate_summary(conversation_to_summarize)
+    return summary_update(state, messages_to_delete, summary)
+
 
 def len_condition(state: State) -> str:
     if state.get("conversation_length", 0) > 10:
@@ -184,13 +211,45 @@ def len_condition(state: State) -> str:
     return "echo"
 
 
+def last_user_message(state: State) -> str | None:
+    for message in reversed(state.get("messages", [])):
+        if isinstance(message, HumanMessage):
+            return message.text
+    return None
+
+
+def extract_preferences(state: State, config: RunnableConfig) -> State:
+    # runs after the reply, and only schedules the extraction
+    text = last_user_message(state)
+    if text:
+        preference_extractor.submit(user_id_from_config(config), text)
+    return {}
+
+
+async def aextract_preferences(state: State, config: RunnableConfig) -> State:
+    text = last_user_message(state)
+    if text:
+        preference_extractor.asubmit(user_id_from_config(config), text)
+    return {}
+
+
 def build_graph(checkpointer: Checkpointer | None = None) -> CompiledStateGraph:
     builder = StateGraph(State)
 
-    builder.add_node("echo", echo)
+    # echo and summarize call the model, so they get async twins for ainvoke/astream
+    builder.add_node("echo", RunnableLambda(echo, afunc=aecho, name="echo"))
     builder.add_node("check_len", check_len_node)
-    builder.add_node("summarize", summarize)
+    builder.add_node(
+        "summarize", RunnableLambda(summarize, afunc=asummarize, name="summarize")
+    )
     builder.add_node("tools", ToolNode(tools))
+    if not PREFERENCE_TOOL:
+        builder.add_node(
+            "extract_preferences",
+            RunnableLambda(
+                extract_preferences, afunc=aextract_preferences, name="extract_preferences"
+            ),
+        )
 
     builder.add_edge(START, "check_len")
     builder.add_conditional_edges(
@@ -198,8 +257,13 @@ def build_graph(checkpointer: Checkpointer | None = None) -> CompiledStateGraph:
     )
 
     builder.add_edge("summarize", "echo")
-    builder.add_conditional_edges("echo", tools_condition)
+    after_reply = END if PREFERENCE_TOOL else "extract_preferences"
+    builder.add_conditional_edges(
+        "echo", tools_condition, {"tools": "tools", END: after_reply}
+    )
     builder.add_edge("tools", "echo")
+    if not PREFERENCE_TOOL:
+        builder.add_edge("extract_preferences", END)
 
     return builder.compile(checkpointer=checkpointer)
 
@@ -208,7 +272,10 @@ if __name__ == "__main__":
     # memory=MemorySaver()
     conn = sqlite3.connect("chat_echo.db", check_same_thread=False)
     memory = SqliteSaver(conn)
-    config: RunnableConfig = {"configurable": {"thread_id": "OMOMOM"}}
+    # preferences are stored per user_id and shared by all of the user's threads
+    config: RunnableConfig = {
+        "configurable": {"thread_id": "OMOMOM", "user_id": os.getenv("USER", "default")}
+    }
     graph = build_graph(checkpointer=memory)
     while True:
         msg: str = input("User: ")
@@ -228,7 +295,11 @@ if __name__ == "__main__":
                 message, metadata = chunk
                 # We only care about the final response from the model, not intermediate tool calls
                 if isinstance(message, AIMessage) and not message.tool_calls:
-                    if metadata.get("langgraph_node") in ["check_len", "summarize"]:
+                    if metadata.get("langgraph_node") in [
+                        "check_len",
+                        "summarize",
+                        "extract_preferences",
+                    ]:
                         continue
 
                     if message.content:
@@ -0,0 +1,179 @@
+"""
+Offline stand-ins used by the benchmarks.
+
+Nothing in here talks to the network: `StubChatModel` sleeps for a fixed
+latency and answers every structured-output call with a schema instance,
+`FakeTavilyClient` does the same for web search, and `stub_workspace` builds
+a throwaway directory with a generated schema and the prompt files the
+Inquira nodes read.
+"""
+
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+import typing
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any
+
+from langchain_core.callbacks import CallbackManagerForLLMRun
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_core.runnables import RunnableLambda
+from pydantic import PrivateAttr
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+PROMPTS = {
+    "is_safe_prompt.yaml": "Decide if the question is safe to run against the data.",
+    "is_relevant_prompt.yaml": "Decide if the question is relevant to this schema:\n{schema}",
+    "require_code_prompt.yaml": "Decide if answering needs code. Schema:\n{schema}",
+    "create_plan_prompt.yaml": "Write a plan. Schema:\n{schema}\nCode:\n{current_code}",
+    "code_prompt.yaml": "Write code for the plan:\n{plan}\nCode:\n{current_code}",
+    "noncode_prompt.yaml": "Answer in prose. Schema:\n{schema}\nCode:\n{current_code}",
+    "classify_prompt.yaml": "Classify safety, relevancy and code need. Schema:\n{schema}",
+}
+
+
+def _default_value(annotation: Any) -> Any:
+    args = typing.get_args(annotation) or (annotation,)
+    if bool in args:
+        return True
+    if str in args:
+        return "stub"
+    return None
+
+
+def default_responder(schema: type, prompt: Any) -> dict[str, Any]:
+    return {
+        name: _default_value(field.annotation)
+        for name, field in schema.model_fields.items()
+    }
+
+
+class StubChatModel(BaseChatModel):
+    """Chat model that waits `latency` seconds and records every prompt it sees."""
+
+    latency: float = 0.1
+    responder: Callable[[type, Any], dict[str, Any]] = default_responder
+    calls: list[dict[str, Any]] = []
+
+    _lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+
+    @property
+    def _llm_type(self) -> str:
+        return "stub"
+
+    def _record(self, kind: str, prompt: Any, messages: list[BaseMessage] | None = None) -> None:
+        text = prompt.to_string() if hasattr(prompt, "to_string") else str(prompt)
+        with self._lock:
+            self.calls.append(
+                {"kind": kind, "chars": len(text), "prompt": text, "messages": messages}
+            )
+
+    def _generate(
+        self,
+        messages: list[BaseMessage],
+        stop: list[str] | None = None,
+        run_manager: CallbackManagerForLLMRun | None = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        self._record("chat", "\n".join(str(m.content) for m in messages), messages)
+        time.sleep(self.latency)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage("stub"))])
+
+    async def _agenerate(
+        self,
+        messages: list[BaseMessage],
+        stop: list[str] | None = None,
+        run_manager: Any = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        self._record("chat", "\n".join(str(m.content) for m in messages), messages)
+        await asyncio.sleep(self.latency)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage("stub"))])
+
+    def with_structured_output(self, schema: Any, **kwargs: Any) -> Any:  # type: ignore[override]
+        def call(prompt: Any) -> Any:
+            self._record(schema.__name__, prompt)
+            time.sleep(self.latency)
+            return schema(**self.responder(schema, prompt))
+
+        async def acall(prompt: Any) -> Any:
+            self._record(schema.__name__, prompt)
+            await asyncio.sleep(self.latency)
+            return schema(**self.responder(schema, prompt))
+
+        return RunnableLambda(call, afunc=acall)
+
+
+class FakeTavilyClient:
+    """TavilyClient stand-in: `search` sleeps `latency` seconds and makes up hits."""
+
+    def __init__(self, latency: float = 0.8, n_results: int = 5) -> None:
+        self.latency = latency
+        self.n_results = n_results
+        self.calls: list[dict[str, Any]] = []
+        self._lock = threading.Lock()
+
+    def search(self, query: str, search_depth: str = "basic", **kwargs: Any) -> dict:
+        with self._lock:
+            self.calls.append({"query": query, "search_depth": search_depth})
+        time.sleep(self.latency)
+        sentence = f"A reader's note on {query}, with themes, pacing and prose style."
+        return {
+            "query": query,
+            "answer": None,
+            "results": [
+                {
+                    "title": f"{query.title()} - result {i}",
+                    "url": f"https://example.com/{abs(hash(query)) % 10_000}/{i}",
+                    "content": " ".join([sentence] * 20),
+                    "score": 1.0 - i / self.n_results,
+                }
+                for i in range(self.n_results)
+            ],
+            "response_time": self.latency,
+        }
+
+
+def make_schema(n_columns: int = 12) -> dict[str, Any]:
+    columns = [
+        {"name": f"col_{i}", "type": "int", "description": f"generated column {i}"}
+        for i in range(n_columns)
+    ]
+    return {"table": "deliveries", "columns": columns}
+
+
+@contextmanager
+def stub_workspace(n_columns: int = 12) -> Iterator[Path]:
+    """chdir into a temp dir holding deliveries_schema.json and prompts/*.yaml."""
+    previous = Path.cwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        (root / "prompts").mkdir()
+        for name, text in PROMPTS.items():
+            (root / "prompts" / name).write_text(text)
+        (root / "deliveries_schema.json").write_text(json.dumps(make_schema(n_columns)))
+        os.chdir(root)
+        try:
+            yield root
+        finally:
+            os.chdir(previous)
+
+
+def timed(fn: Callable[[], Any], repeat: int = 5) -> list[float]:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return samples
@@ -0,0 +1,78 @@
+"""
+put/get throughput of the shared single-connection SqliteSaver vs the pooled
+WAL checkpointer from `checkpointers.sqlite_checkpointer`.
+
+Every worker thread owns one thread_id and loops put -> put_writes ->
+get_tuple with a checkpoint carrying `--messages` messages, the shape of a
+graph superstep.
+
+    python -m benchmarks.checkpoint_concurrency --threads 1 8 64
+"""
+
+import argparse
+import sqlite3
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from langchain_core.messages import AIMessage
+from langgraph.checkpoint.base import empty_checkpoint
+from langgraph.checkpoint.sqlite import SqliteSaver
+
+from benchmarks._stubs import REPO_ROOT  # noqa: F401  (puts the repo on sys.path)
+from checkpointers import sqlite_checkpointer
+
+
+def worker(saver, thread_id: str, ops: int, messages: list, counts: list) -> None:
+    config = {"configurable": {"thread_id": thread_id, "checkpoint_ns": ""}}
+    for _ in range(ops):
+        checkpoint = empty_checkpoint()
+        checkpoint["channel_values"] = {"messages": messages}
+        saved = saver.put(config, checkpoint, {"source": "loop", "step": 1}, {})
+        saver.put_writes(saved, [("messages", messages[-1])], task_id="echo")
+        saver.get_tuple({"configurable": {"thread_id": thread_id}})
+        config = saved
+    counts.append(ops)
+
+
+def run(saver, threads: int, ops: int, messages: list) -> float:
+    counts: list[int] = []
+    workers = [
+        threading.Thread(target=worker, args=(saver, f"t{i}", ops, messages, counts))
+        for i in range(threads)
+    ]
+    start = time.perf_counter()
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    return sum(counts) / (time.perf_counter() - start)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 8, 64])
+    parser.add_argument("--ops", type=int, default=1600, help="total iterations per run")
+    parser.add_argument("--messages", type=int, default=10)
+    args = parser.parse_args()
+
+    messages = [AIMessage(content="x" * 300, id=f"m{i}") for i in range(args.messages)]
+    print(f"{'threads':>8} {'saver':<8} {'iterations/s':>13}")
+    for threads in args.threads:
+        ops = max(1, args.ops // threads)
+        with tempfile.TemporaryDirectory() as tmp:
+            conn = sqlite3.connect(Path(tmp) / "shared.db", check_same_thread=False)
+            shared = run(SqliteSaver(conn), threads, ops, messages)
+            conn.close()
+            with sqlite_checkpointer(str(Path(tmp) / "pooled.db"), delta=False) as saver:
+                pooled = run(saver, threads, ops, messages)
+            with sqlite_checkpointer(str(Path(tmp) / "delta.db")) as saver:
+                delta = run(saver, threads, ops, messages)
+        print(f"{threads:>8} {'shared':<8} {shared:>13.0f}")
+        print(f"{threads:>8} {'pooled':<8} {pooled:>13.0f}")
+        print(f"{threads:>8} {'p+delta':<8} {delta:>13.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+DB size and get_tuple latency vs thread length: SqliteSaver vs DeltaSqliteSaver.
+
+Runs an echo-style graph (every turn appends a human and an AI message of
+`--message-chars` characters, no summarization) for increasing numbers of
+turns on one thread, then reports the database file size and the median time
+to load the latest checkpoint.
+
+    python -m benchmarks.checkpoint_size --turns 25 50 100 200
+"""
+
+import argparse
+import os
+import sqlite3
+import statistics
+import tempfile
+import time
+from pathlib import Path
+from typing import Annotated, TypedDict
+
+from langchain_core.messages import AIMessage, AnyMessage, HumanMessage
+from langgraph.checkpoint.sqlite import SqliteSaver
+from langgraph.graph import START, StateGraph
+from langgraph.graph.message import add_messages
+
+from benchmarks._stubs import REPO_ROOT  # noqa: F401  (puts the repo on sys.path)
+from checkpointers import DeltaSqliteSaver
+
+
+class State(TypedDict):
+    messages: Annotated[list[AnyMessage], add_messages]
+
+
+def build_graph(checkpointer, message_chars: int):
+    def echo(state: State) -> State:
+        return {"messages": [AIMessage(content="x" * message_chars)]}
+
+    builder = StateGraph(State)
+    builder.add_node("echo", echo)
+    builder.add_edge(START, "echo")
+    return builder.compile(checkpointer=checkpointer)
+
+
+def measure(saver_cls, turns: int, message_chars: int) -> tuple[int, float, float]:
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = Path(tmp) / "bench.db"
+        conn = sqlite3.connect(db_path, check_same_thread=False)
+        saver = saver_cls(conn)
+        graph = build_graph(saver, message_chars)
+        config = {"configurable": {"thread_id": "bench"}}
+        for i in range(turns):
+            graph.invoke(
+                {"messages": [HumanMessage(content=f"{i} " + "y" * message_chars)]},
+                config=config,
+            )
+
+        # cold: a fresh reader with its message cache emptied before every read;
+        # warm: the same reader reused, as a long-running server would
+        reader = saver_cls(sqlite3.connect(db_path, check_same_thread=False))
+        cold, warm = [], []
+        for _ in range(20):
+            if hasattr(reader, "_message_cache"):
+                reader._message_cache.clear()
+            start = time.perf_counter()
+            reader.get_tuple(config)
+            cold.append(time.perf_counter() - start)
+        for _ in range(20):
+            start = time.perf_counter()
+            reader.get_tuple(config)
+            warm.append(time.perf_counter() - start)
+
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        conn.close()
+        reader.conn.close()
+        return os.path.getsize(db_path), statistics.median(cold), statistics.median(warm)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--turns", type=int, nargs="+", default=[25, 50, 100, 200])
+    parser.add_argument("--message-chars", type=int, default=400)
+    args = parser.parse_args()
+
+    print(f"{'turns':>6} {'saver':<8} {'db KB':>8} {'cold get ms':>12} {'warm get ms':>12}")
+    for turns in args.turns:
+        for name, saver_cls in (("sqlite", SqliteSaver), ("delta", DeltaSqliteSaver)):
+            size, cold, warm = measure(saver_cls, turns, args.message_chars)
+            print(
+                f"{turns:>6} {name:<8} {size / 1024:>8.0f}"
+                f" {cold * 1000:>12.2f} {warm * 1000:>12.2f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+Serial, fan-out and fused classifiers in InquiraAgent, against a stubbed model.
+
+Every model call sleeps for `--latency` seconds, so the numbers show how many
+round-trips sit on the critical path rather than anything about Gemini.
+`classifier chars` is the rendered prompt size sent to the routing calls per
+turn, a stand-in for input tokens.
+
+    python -m benchmarks.classifier_fanout --latency 0.2 --repeat 5
+"""
+
+import argparse
+import statistics
+
+from langchain_core.messages import HumanMessage
+
+from benchmarks._stubs import StubChatModel, stub_workspace, timed
+
+CLASSIFIER_SCHEMAS = {"IsSafe", "IsRelevant", "RequireCode", "Classification"}
+MODES = {
+    "serial": {},
+    "fan-out": {"parallel_classifiers": True},
+    "fused": {"fused_classifier": True},
+}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--columns", type=int, default=200)
+    args = parser.parse_args()
+
+    with stub_workspace(n_columns=args.columns):
+        from inquira_agent import InquiraAgent
+
+        model = StubChatModel(latency=args.latency)
+        agent = InquiraAgent(gemini_lite=model, gemini=model)
+
+        print(f"stub latency per call: {args.latency * 1000:.0f} ms")
+        print(
+            f"{'mode':<10} {'median ms':>10} {'min ms':>10} {'calls':>6}"
+            f" {'classifier calls':>17} {'classifier chars':>17}"
+        )
+        for mode, flags in MODES.items():
+            graph = agent.compile(**flags)
+            model.calls.clear()
+            samples = timed(
+                lambda: graph.invoke(
+                    {"messages": [HumanMessage(content="total deliveries per city?")]}
+                ),
+                repeat=args.repeat,
+            )
+            routing = [c for c in model.calls if c["kind"] in CLASSIFIER_SCHEMAS]
+            print(
+                f"{mode:<10} {statistics.median(samples) * 1000:>10.1f}"
+                f" {min(samples) * 1000:>10.1f} {len(model.calls) // args.repeat:>6}"
+                f" {len(routing) // args.repeat:>17}"
+                f" {sum(c['chars'] for c in routing) // args.repeat:>17}"
+            )
+
+
+if __name__ == "__main__":
+    main()
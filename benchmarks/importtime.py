@@ -0,0 +1,111 @@
+"""
+Cold start of each graph: a fresh interpreter imports the module and calls
+`build_graph`, the way `langgraph dev` or a server worker boots.
+
+Each run is a new process, so nothing is warm but the OS file cache. The
+script reports the import time, the `build_graph` time and the process wall
+time. It also lists which provider SDKs had been loaded by the end, and
+nothing on that path should need one. `--top` prints the slowest imports
+made by the graph module itself, from `python -X importtime`.
+
+    python -m benchmarks.importtime --runs 5 --top 10
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from benchmarks._stubs import REPO_ROOT, stub_workspace
+
+SDKS = ("google.genai", "langchain_google_genai", "tavily", "langchain.chat_models")
+TARGETS = {
+    "main": "main.build_graph(checkpointer=None)",
+    "inquira_agent": "inquira_agent.build_graph(checkpointer=None)",
+}
+
+SNIPPET = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+imported = time.perf_counter()
+{call}
+built = time.perf_counter()
+print(json.dumps({{
+    "import": imported - start,
+    "build": built - imported,
+    "sdks": [m for m in {sdks!r} if m in sys.modules],
+}}))
+"""
+
+
+def env() -> dict[str, str]:
+    return {
+        **os.environ,
+        "PYTHONPATH": str(REPO_ROOT),
+        "GOOGLE_API_KEY": os.environ.get("GOOGLE_API_KEY", "stub"),
+        "PYTHONDONTWRITEBYTECODE": "1",
+    }
+
+
+def run_once(module: str, call: str) -> dict:
+    code = SNIPPET.format(module=module, call=call, sdks=SDKS)
+    start = time.perf_counter()
+    out = subprocess.run(
+        [sys.executable, "-c", code], env=env(), capture_output=True, text=True, check=True
+    )
+    result = json.loads(out.stdout.strip().splitlines()[-1])
+    result["wall"] = time.perf_counter() - start
+    return result
+
+
+def slowest_imports(module: str, call: str, top: int) -> list[tuple[int, str]]:
+    code = SNIPPET.format(module=module, call=call, sdks=SDKS)
+    out = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        env=env(),
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    rows = []
+    for line in out.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        # imports made directly by the graph module, two levels of indent
+        if not name.startswith("   ") or name.startswith("     "):
+            continue
+        rows.append((int(cumulative), name.strip()))
+    return sorted(rows, reverse=True)[:top]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=0)
+    args = parser.parse_args()
+
+    # inquira_agent reads its prompt files in build_graph
+    with stub_workspace():
+        print("| graph | import ms | build_graph ms | process ms | SDKs loaded |")
+        print("|-------|-----------|----------------|------------|-------------|")
+        for module, call in TARGETS.items():
+            runs = [run_once(module, call) for _ in range(args.runs)]
+            print(
+                f"| {module} | {statistics.median(r['import'] for r in runs) * 1000:.0f}"
+                f" | {statistics.median(r['build'] for r in runs) * 1000:.0f}"
+                f" | {statistics.median(r['wall'] for r in runs) * 1000:.0f}"
+                f" | {', '.join(runs[-1]['sdks']) or '-'} |"
+            )
+        for module, call in TARGETS.items() if args.top else ():
+            print(f"\nslowest imports made by {module}:")
+            for cumulative, name in slowest_imports(module, call, args.top):
+                print(f"  {cumulative / 1000:8.1f} ms  {name}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""
+How much of each echo prompt repeats the previous one, byte for byte.
+
+Runs `--turns` turns of one thread through `main.build_graph` with a tight
+context window, so summaries are applied along the way. The model is a
+StubChatModel that records every prompt. Each recorded prompt is flattened
+the way Gemini receives it: every SystemMessage goes into
+`system_instruction`, followed by the contents. The benchmark then measures
+the common prefix with the previous prompt. "before" is the old
+`echo_prompt` (summary as a second SystemMessage); "after" is
+`prompt_prefix.assemble`; "cached" is "after" with a `ContextCache` whose
+creation is faked, so the system prompt is no longer sent at all.
+
+    python -m benchmarks.prompt_prefix --turns 40
+"""
+
+import argparse
+import os
+import time
+
+from langchain_core.messages import AnyMessage, HumanMessage, SystemMessage
+from langgraph.checkpoint.memory import InMemorySaver
+
+from benchmarks._stubs import StubChatModel
+
+
+def legacy_prompt(state, config) -> list[AnyMessage]:
+    from prompts import LIBRARIAN_SYSTEM_PROMPT
+
+    system_msg = SystemMessage(content=LIBRARIAN_SYSTEM_PROMPT)
+    summary = state.get("summary", "")
+    if summary:
+        summary_msg = SystemMessage(content=f"Here is the conversation summary so far: {summary}")
+        return [system_msg, summary_msg] + state.get("messages", [])
+    return [system_msg] + state.get("messages", [])
+
+
+def gemini_view(messages: list[AnyMessage]) -> str:
+    from prompt_prefix import canonical
+
+    system = "\n".join(m.text for m in messages if isinstance(m, SystemMessage))
+    contents = "".join(canonical(m) for m in messages if not isinstance(m, SystemMessage))
+    return system + "\x00" + contents
+
+
+def common_prefix(a: str, b: str) -> int:
+    n = 0
+    for x, y in zip(a, b):
+        if x != y:
+            break
+        n += 1
+    return n
+
+
+def run(layout: str, turns: int, message_chars: int) -> dict:
+    import main
+    from context_window import ContextWindow
+    from prompt_prefix import ContextCache, PrefixTracker
+
+    model = StubChatModel(latency=0.0)
+    main.model_with_tools = model
+    main.client = StubChatModel(latency=0.0)  # summaries
+    main.context_window = ContextWindow(token_budget=2000, keep_tokens=600)
+    main.prefix_tracker = PrefixTracker()
+    original = main.echo_prompt
+    if layout == "before":
+        main.echo_prompt = legacy_prompt
+    if layout == "cached":
+        # echo goes to the plain client with cached_content, like summaries do
+        main.client = model
+        main.context_cache = ContextCache("stub", main.SYSTEM_PROMPT, main.tools)
+        main.context_cache._create = lambda: "cachedContents/stub"
+        main.context_cache.refresh()  # what the background thread does first
+
+    graph = main.build_graph(checkpointer=InMemorySaver())
+    config = {"configurable": {"thread_id": f"prefix-{layout}"}}
+    summaries = 0
+    try:
+        for turn in range(turns):
+            question = f"turn {turn}: " + "what should I read next? " * (message_chars // 25)
+            for update in graph.stream(
+                {"messages": [HumanMessage(content=question)]}, config, stream_mode="updates"
+            ):
+                summaries += bool(update.get("apply_summary"))
+            time.sleep(0.02)  # let the background summary finish before the next turn
+    finally:
+        main.echo_prompt = original
+        main.context_cache = None
+
+    prompts = [
+        gemini_view(call["messages"])
+        for call in model.calls
+        if not call["prompt"].startswith("Update the running summary")
+    ]
+    total = reused = extends = 0
+    previous = ""
+    for prompt in prompts:
+        shared = common_prefix(previous, prompt)
+        extends += bool(previous) and shared == len(previous)
+        total += len(prompt) // 4
+        reused += shared // 4
+        previous = prompt
+    return {
+        "calls": len(prompts),
+        "summaries": summaries,
+        "extends": extends,
+        "prompt_tokens": total,
+        "reusable_tokens": reused,
+        "tracker": main.prefix_tracker.stats(),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--turns", type=int, default=40)
+    parser.add_argument("--message-chars", type=int, default=400)
+    args = parser.parse_args()
+    os.environ.setdefault("GOOGLE_API_KEY", "stub")
+
+    print("| layout | calls | summaries | extends previous | tokens sent | reusable | reuse |")
+    print("|--------|-------|-----------|------------------|-------------|----------|-------|")
+    results = {}
+    for layout in ("before", "after", "cached"):
+        r = results[layout] = run(layout, args.turns, args.message_chars)
+        print(
+            f"| {layout} | {r['calls']} | {r['summaries']} | {r['extends']} "
+            f"| {r['prompt_tokens']} | {r['reusable_tokens']} "
+            f"| {r['reusable_tokens'] / r['prompt_tokens']:.2f} |"
+        )
+    tracker = results["after"]["tracker"]
+    print(
+        f"\nPrefixTracker (after): {tracker['reusable_tokens']} of "
+        f"{tracker['prompt_tokens']} tokens reusable ({tracker['reuse_rate']:.2f})"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Inquira routing with and without the structured-output response cache.
+
+Sends `--requests` single-question conversations, each on its own thread as
+if from a different user. The questions are drawn with a skew from a pool of
+`--questions`, against a stubbed model and the default serial classifiers.
+"cold" starts from an empty cache; "warm" runs the same workload again on
+the filled one.
+
+    python -m benchmarks.response_cache --requests 200 --latency 0.05
+"""
+
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from langchain_core.messages import HumanMessage
+
+from benchmarks._stubs import StubChatModel, stub_workspace
+
+CLASSIFIER_SCHEMAS = {"IsSafe", "IsRelevant", "RequireCode", "Classification"}
+TOPICS = ["deliveries", "late deliveries", "cancelled orders", "revenue", "drivers"]
+GROUPINGS = ["per city", "per day", "per driver", "this week", "by vehicle type"]
+
+
+def workload(requests: int, questions: int, seed: int = 7) -> list[str]:
+    pool = [
+        f"how many {TOPICS[i % len(TOPICS)]} {GROUPINGS[i // len(TOPICS) % len(GROUPINGS)]}?"
+        for i in range(questions)
+    ]
+    rng = random.Random(seed)
+    weights = [1 / (rank + 1) for rank in range(len(pool))]
+    return rng.choices(pool, weights=weights, k=requests)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--questions", type=int, default=25)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--columns", type=int, default=200)
+    args = parser.parse_args()
+
+    with stub_workspace(n_columns=args.columns), tempfile.TemporaryDirectory() as tmp:
+        from inquira_agent import InquiraAgent
+        from response_cache import ResponseCache
+
+        questions = workload(args.requests, args.questions)
+        cache = ResponseCache(db_path=os.path.join(tmp, "responses.db"))
+        modes = [("no cache", None), ("cold", cache), ("warm", cache)]
+
+        print(f"stub latency per call: {args.latency * 1000:.0f} ms, {args.requests} requests")
+        print("| mode | median ms | p95 ms | classifier calls | hit rate |")
+        print("|------|-----------|--------|------------------|----------|")
+        for mode, response_cache in modes:
+            model = StubChatModel(latency=args.latency)
+            agent = InquiraAgent(gemini_lite=model, gemini=model, response_cache=response_cache)
+            graph = agent.compile()
+            before = cache.stats()
+            samples = []
+            for question in questions:
+                start = time.perf_counter()
+                graph.invoke({"messages": [HumanMessage(content=question)]})
+                samples.append(time.perf_counter() - start)
+            routing = [c for c in model.calls if c["kind"] in CLASSIFIER_SCHEMAS]
+            after = cache.stats()
+            hits = after["hits"] - before["hits"]
+            lookups = hits + after["misses"] - before["misses"]
+            print(
+                f"| {mode} | {statistics.median(samples) * 1000:.1f}"
+                f" | {statistics.quantiles(samples, n=20)[-1] * 1000:.1f}"
+                f" | {len(routing)} | {hits / lookups if lookups else 0.0:.2f} |"
+            )
+
+        # cost of a hit on its own: key from the prompt inputs, then the lookup
+        state = {"messages": [HumanMessage(content=questions[0])]}
+        from inquira_agent import State
+
+        inputs = agent._inputs("check_relevancy", State(**state))
+        timings = []
+        for _ in range(1000):
+            start = time.perf_counter()
+            agent._cached("check_relevancy", agent._cache_key("check_relevancy", inputs))
+            timings.append(time.perf_counter() - start)
+        print(f"\nhit (key + lookup): {statistics.median(timings) * 1e6:.0f} us median")
+        print(f"entries: {cache.stats()['entries']}")
+
+
+if __name__ == "__main__":
+    main()
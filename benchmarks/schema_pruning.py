@@ -0,0 +1,117 @@
+"""
+Recall and prompt size of top-k column retrieval vs full-schema prompting.
+
+Builds a wide synthetic deliveries warehouse table (a few dozen meaningful
+columns buried in hundreds of generated metric columns), asks questions whose
+answer needs known columns, and checks how many of those columns survive
+`ColumnIndex.prune`. Full-schema prompting has recall 1.0 by construction, so
+the interesting numbers are recall@k and how much smaller the prompt gets.
+
+    python -m benchmarks.schema_pruning --filler 400 --top-k 5 10 20
+"""
+
+import argparse
+import random
+import statistics
+import time
+
+from benchmarks._stubs import REPO_ROOT  # noqa: F401  (puts the repo on sys.path)
+from column_index import ColumnIndex
+from schema_registry import render_schema
+
+COLUMNS = [
+    ("delivery_id", "unique id of the delivery", ["D-1001", "D-1002"]),
+    ("order_id", "id of the customer order", ["O-77", "O-78"]),
+    ("driver_id", "id of the driver who made the delivery", ["DR-4"]),
+    ("city", "city where the order was delivered", ["Pune", "Delhi", "Mumbai"]),
+    ("pickup_time", "timestamp the driver picked up the parcel", []),
+    ("dropoff_time", "timestamp the parcel was handed to the customer", []),
+    ("delivery_minutes", "minutes between pickup and dropoff", []),
+    ("order_value", "total order amount in rupees", []),
+    ("tip_amount", "tip paid to the driver in rupees", []),
+    ("distance_km", "road distance travelled in kilometres", []),
+    ("vehicle_type", "vehicle used by the driver", ["bike", "scooter", "car"]),
+    ("weather", "weather at the time of delivery", ["rain", "clear", "fog"]),
+    ("customer_rating", "rating from 1 to 5 given by the customer", []),
+    ("is_late", "whether the delivery missed the promised time", []),
+    ("restaurant_name", "restaurant that prepared the order", []),
+    ("cuisine", "cuisine of the restaurant", ["north indian", "chinese"]),
+    ("payment_method", "how the customer paid", ["upi", "card", "cash"]),
+    ("discount_code", "promo code applied to the order", []),
+    ("cancelled", "whether the order was cancelled", []),
+    ("festival_day", "whether the order was placed on a festival", []),
+]
+
+QUESTIONS = [
+    ("average delivery minutes per city", {"delivery_minutes", "city"}),
+    ("which drivers get the highest tips", {"driver_id", "tip_amount"}),
+    ("how does rain affect late deliveries", {"weather", "is_late"}),
+    ("total order value by payment method", {"order_value", "payment_method"}),
+    ("do customers rate scooter deliveries lower", {"customer_rating", "vehicle_type"}),
+    ("cancellation rate for chinese restaurants", {"cancelled", "cuisine"}),
+    ("distance travelled per vehicle type", {"distance_km", "vehicle_type"}),
+    ("orders using a promo code on festival days", {"discount_code", "festival_day"}),
+    ("which restaurant has the most late orders", {"restaurant_name", "is_late"}),
+    ("tips compared to order amount in Mumbai", {"tip_amount", "order_value", "city"}),
+]
+
+FILLER_WORDS = (
+    "warehouse batch sync score bucket segment region channel flag weight legacy "
+    "version source snapshot partition quality metric cohort latency uplift"
+).split()
+
+
+def make_wide_schema(filler: int, seed: int = 0) -> dict:
+    rng = random.Random(seed)
+    columns = [
+        {"name": name, "type": "str", "description": desc, "sample_values": samples}
+        for name, desc, samples in COLUMNS
+    ]
+    for i in range(filler):
+        words = rng.sample(FILLER_WORDS, 3)
+        columns.append(
+            {
+                "name": f"{words[0]}_{words[1]}_{i:03d}",
+                "type": "float",
+                "description": f"{' '.join(words)} metric from the {words[2]} pipeline",
+            }
+        )
+    rng.shuffle(columns)
+    return {"table": "deliveries_wide", "columns": columns}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--filler", type=int, default=400)
+    parser.add_argument("--top-k", type=int, nargs="+", default=[5, 10, 20])
+    args = parser.parse_args()
+
+    schema = make_wide_schema(args.filler)
+    start = time.perf_counter()
+    index = ColumnIndex(schema["columns"])
+    build_ms = (time.perf_counter() - start) * 1000
+    full_chars = len(render_schema(schema))
+
+    print(f"columns: {len(schema['columns'])}, index build: {build_ms:.1f} ms")
+    print(f"{'prompt':<10} {'recall':>7} {'columns':>8} {'chars':>8} {'query ms':>9}")
+    print(f"{'full':<10} {1.0:>7.2f} {len(schema['columns']):>8} {full_chars:>8} {0:>9.2f}")
+
+    for k in args.top_k:
+        recalls, sizes, shown, latencies = [], [], [], []
+        for question, needed in QUESTIONS:
+            start = time.perf_counter()
+            pruned = index.prune(schema, question, k)
+            latencies.append((time.perf_counter() - start) * 1000)
+            names = {c["name"] for c in pruned["columns"]}
+            recalls.append(len(needed & names) / len(needed))
+            sizes.append(len(render_schema(pruned)))
+            shown.append(len(pruned["columns"]))
+        print(
+            f"{'top-' + str(k):<10} {statistics.mean(recalls):>7.2f}"
+            f" {statistics.mean(shown):>8.1f} {statistics.mean(sizes):>8.0f}"
+            f" {statistics.mean(latencies):>9.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""
+Hit rate and latency of the persistent search cache behind `search_web`.
+
+Replays a session of librarian searches in which popular questions come back
+with different casing, punctuation and spacing, and (with --reword) in a
+different word order or with a filler word added or dropped. The searches run
+against `FakeTavilyClient`, which has a fixed per-search latency. The
+benchmark compares calling the client every time with `SearchCache` using
+exact matching only, and with near-duplicate matching as well. It reports the
+hit rate, how many searches reached the client, and how many searches were
+answered with another topic's results ("wrong"). Some topics differ by a
+single word to check that last number.
+
+    python -m benchmarks.search_cache --searches 300 --latency 0.05 --reword
+"""
+
+import argparse
+import random
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+from benchmarks._stubs import FakeTavilyClient
+import tools
+from search_cache import SearchCache, normalize_query
+from tool_results import ToolResultStore
+
+TOPICS = [
+    "sad novels set in japan",
+    "sad novels set in korea",
+    "best translated french classics",
+    "books like the remains of the day",
+    "short fantasy series for teenagers",
+    "best translated russian classics",
+    "cozy mysteries with a cat detective",
+    "non fiction about the history of maps",
+    "literary thrillers with unreliable narrators",
+    "books about grief that are not depressing",
+    "science fiction with first contact",
+    "poetry collections for beginners",
+    "historical fiction set in mughal india",
+    "award winning graphic novels 2024",
+]
+
+
+def rephrase(query: str, rng: random.Random) -> str:
+    """The same question as a user might type it again."""
+    variants = [
+        query,
+        query.capitalize(),
+        query.upper(),
+        query + "?",
+        "  " + query.replace(" ", "  ") + " ",
+        query.title() + "!",
+    ]
+    return rng.choice(variants)
+
+
+def reword(query: str, rng: random.Random) -> str:
+    """The same question with its words shuffled, or a filler word added or dropped."""
+    words = query.split()
+    choice = rng.randrange(4)
+    if choice == 1:
+        rng.shuffle(words)
+    elif choice == 2:
+        words.insert(rng.randrange(len(words) + 1), rng.choice(["good", "some", "books"]))
+    elif choice == 3 and len(words) > 4:
+        del words[rng.randrange(len(words))]
+    return " ".join(words)
+
+
+def workload(searches: int, reworded: bool, seed: int = 0) -> list[tuple[str, str]]:
+    """(query, topic) pairs."""
+    rng = random.Random(seed)
+    # a few topics account for most searches
+    weights = [1 / (rank + 1) for rank in range(len(TOPICS))]
+    queries = []
+    for _ in range(searches):
+        topic = rng.choices(TOPICS, weights)[0]
+        query = reword(topic, rng) if reworded else topic
+        queries.append((rephrase(query, rng), topic))
+    return queries
+
+
+def run(
+    queries: list[tuple[str, str]], client: FakeTavilyClient, cache: SearchCache
+) -> tuple[list[float], int]:
+    tools.search_client = client
+    tools.search_cache = cache
+    latencies, wrong = [], 0
+    asked: dict[str, str] = {}
+    for query, topic in queries:
+        asked[normalize_query(query)] = topic
+        start = time.perf_counter()
+        result = tools.search_web.invoke({"query": query})
+        latencies.append((time.perf_counter() - start) * 1000)
+        # compact results start with the query the cached response was made for
+        served = result.split("'")[1]
+        wrong += asked[normalize_query(served)] != topic
+    return latencies, wrong
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--searches", type=int, default=300)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--reword", action="store_true")
+    args = parser.parse_args()
+
+    queries = workload(args.searches, args.reword)
+    print(f"searches: {len(queries)}, distinct topics: {len(TOPICS)}, "
+          f"search latency: {args.latency * 1000:.0f} ms")
+    print(f"{'mode':<10} {'hit rate':>9} {'near hits':>10} {'client calls':>13} "
+          f"{'wrong':>6} {'median ms':>10} {'p95 ms':>8} {'total s':>8}")
+
+    modes = {
+        "no cache": {"ttl": 0.0, "near_duplicates": False},
+        "exact": {"ttl": 3600.0, "near_duplicates": False},
+        "near-dup": {"ttl": 3600.0, "near_duplicates": True},
+    }
+    with tempfile.TemporaryDirectory() as tmp:
+        tools.tool_result_store = ToolResultStore(str(Path(tmp) / "tool_results.db"))
+        for mode, options in modes.items():
+            client = FakeTavilyClient(latency=args.latency)
+            cache = SearchCache(str(Path(tmp) / f"{mode}.db"), **options)
+            latencies, wrong = run(queries, client, cache)
+            stats = cache.stats()
+            print(
+                f"{mode:<10} {stats['hit_rate']:>9.2f} {stats['near_hits']:>10}"
+                f" {len(client.calls):>13} {wrong:>6}"
+                f" {statistics.median(latencies):>10.2f}"
+                f" {statistics.quantiles(latencies, n=20)[-1]:>8.2f}"
+                f" {sum(latencies) / 1000:>8.2f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Throughput of the SSE server with stubbed models.
+
+Drives `server.create_app` in-process over httpx's ASGI transport, with the
+echo graph compiled against a StubChatModel and an in-memory checkpointer,
+and fires `--requests` streaming chats across `--concurrency` threads.
+
+    python -m benchmarks.server_load --requests 200 --concurrency 50
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+import httpx
+from langgraph.checkpoint.memory import InMemorySaver
+
+from benchmarks._stubs import StubChatModel
+
+
+async def run(requests: int, concurrency: int, latency: float) -> None:
+    os.environ.setdefault("GOOGLE_API_KEY", "stub")
+    import main
+    from server import create_app
+
+    main.model_with_tools = StubChatModel(latency=latency)
+    app = create_app({"echo": main.build_graph(checkpointer=InMemorySaver())})
+
+    latencies: list[float] = []
+    statuses: dict[int, int] = {}
+    pending = iter(range(requests))
+
+    async def worker(client: httpx.AsyncClient, worker_id: int) -> None:
+        for i in pending:
+            start = time.perf_counter()
+            response = await client.post(
+                f"/echo/threads/load-{worker_id}/stream", json={"message": f"q{i}"}
+            )
+            latencies.append(time.perf_counter() - start)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            start = time.perf_counter()
+            await asyncio.gather(*(worker(client, w) for w in range(concurrency)))
+            elapsed = time.perf_counter() - start
+
+    print(f"requests: {requests}, concurrency: {concurrency}, stub latency: {latency * 1000:.0f} ms")
+    print(f"statuses: {statuses}")
+    print(f"throughput: {requests / elapsed:.1f} req/s")
+    print(f"latency median: {statistics.median(latencies) * 1000:.1f} ms, max: {max(latencies) * 1000:.1f} ms")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.1)
+    args = parser.parse_args()
+    asyncio.run(run(args.requests, args.concurrency, args.latency))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""
+Wall-clock time of the echo graph's tool stage with several tool calls per turn.
+
+One turn asks for three slow "searches" (sync, like Tavily), one async lookup
+and the date, plus optionally a call that hangs. Those run through:
+
+- serial: ToolNode limited to one call at a time (max_concurrency=1), so
+  the calls run one after another
+- toolnode: plain ToolNode, which already overlaps the calls but has no
+  timeout
+- parallel: `tool_runner.parallel_tool_node` under invoke
+- parallel async: the same node under ainvoke
+
+The sum and max columns are the total and the longest synthetic latency in
+the turn. `ordered` checks that ToolMessages come back in call order.
+
+    python -m benchmarks.tool_parallelism --hang
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+from typing import Any
+
+from benchmarks._stubs import REPO_ROOT  # noqa: F401  (puts the repo on sys.path)
+from langchain_core.messages import AIMessage
+from langchain_core.tools import StructuredTool, tool
+from langgraph.graph import END, START, MessagesState, StateGraph
+from langgraph.prebuilt import ToolNode
+
+from tool_runner import parallel_tool_node
+
+
+@tool
+def slow_search(query: str, seconds: float) -> str:
+    """Search that takes `seconds`."""
+    time.sleep(seconds)
+    return f"results for {query}"
+
+
+def lookup(key: str, seconds: float) -> str:
+    """Lookup that takes `seconds`."""
+    time.sleep(seconds)
+    return f"value of {key}"
+
+
+async def alookup(key: str, seconds: float) -> str:
+    await asyncio.sleep(seconds)
+    return f"value of {key}"
+
+
+# has a coroutine, so under ainvoke it runs on the event loop, not a thread
+async_lookup = StructuredTool.from_function(lookup, coroutine=alookup, name="async_lookup")
+
+
+@tool
+def current_date() -> str:
+    """Today's date."""
+    return time.strftime("%Y-%m-%d")
+
+
+TOOLS = [slow_search, async_lookup, current_date]
+
+CALLS = [
+    ("slow_search", {"query": "sad novels set in japan", "seconds": 0.3}),
+    ("slow_search", {"query": "cozy mysteries", "seconds": 0.5}),
+    ("slow_search", {"query": "first contact science fiction", "seconds": 0.4}),
+    ("async_lookup", {"key": "reading list", "seconds": 0.2}),
+    ("current_date", {}),
+]
+HANG = ("slow_search", {"query": "a search that never returns", "seconds": 3.0})
+
+
+def turn(calls: list[tuple[str, dict]]) -> dict[str, Any]:
+    tool_calls = [
+        {"name": name, "args": args, "id": f"call_{i}", "type": "tool_call"}
+        for i, (name, args) in enumerate(calls)
+    ]
+    return {"messages": [AIMessage(content="", tool_calls=tool_calls)]}
+
+
+def tools_graph(node: ToolNode) -> Any:
+    builder = StateGraph(MessagesState)
+    builder.add_node("tools", node)
+    builder.add_edge(START, "tools")
+    builder.add_edge("tools", END)
+    return builder.compile()
+
+
+def ordered(result: dict[str, Any], n_calls: int) -> bool:
+    ids = [m.tool_call_id for m in result["messages"][1:]]
+    return ids == [f"call_{i}" for i in range(n_calls)]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--hang", action="store_true", help="add a call that outlives its 1 s timeout")
+    args = parser.parse_args()
+
+    calls = CALLS + ([HANG] if args.hang else [])
+    latencies = [c[1].get("seconds", 0.0) for c in calls]
+    timeouts = {"slow_search": 1.0}
+    print(f"calls per turn: {len(calls)}, sum: {sum(latencies) * 1000:.0f} ms, "
+          f"max: {max(latencies) * 1000:.0f} ms"
+          + (", slow_search timeout: 1000 ms" if args.hang else ""))
+    print(f"{'mode':<16} {'median ms':>10} {'ordered':>8} {'errors':>7}")
+
+    serial = tools_graph(ToolNode(TOOLS))
+    parallel = tools_graph(parallel_tool_node(TOOLS, timeouts=timeouts))
+    modes = {
+        "serial": lambda: serial.invoke(turn(calls), {"max_concurrency": 1}),
+        "toolnode": lambda: serial.invoke(turn(calls)),
+        "parallel": lambda: parallel.invoke(turn(calls)),
+        "parallel async": lambda: asyncio.run(parallel.ainvoke(turn(calls))),
+    }
+    for mode, run in modes.items():
+        samples, result = [], None
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            result = run()
+            samples.append((time.perf_counter() - start) * 1000)
+        errors = sum(m.status == "error" for m in result["messages"][1:])
+        print(
+            f"{mode:<16} {statistics.median(samples):>10.0f}"
+            f" {str(ordered(result, len(calls))):>8} {errors:>7}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,734 @@
+"""
+SQLite checkpointers for the echo graphs.
+
+`DeltaSqliteSaver` is a drop-in `SqliteSaver` that stops re-serializing the
+whole `messages` list into every checkpoint. Each message is stored once in a
+content-addressed `messages` table and checkpoints keep only the list of
+message hashes. Rows written by a plain `SqliteSaver` still load, so an
+existing database can be opened as-is and migrated later:
+
+    python -m checkpointers migrate Chat_echo.db
+
+`sqlite_checkpointer` builds a WAL-mode saver with a reader connection pool
+and a single batching writer, for many concurrent threads.
+
+`compact` / `CompactionJob` prune old checkpoints according to a
+`RetentionPolicy` while the graph keeps serving:
+
+    python -m checkpointers compact chat_echo.db --keep-last 20
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import queue
+import sqlite3
+import threading
+from collections import OrderedDict
+from collections.abc import Iterator
+from contextlib import closing, contextmanager
+from typing import Any
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    get_checkpoint_metadata,
+)
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+from langgraph.checkpoint.sqlite import SqliteSaver
+from pydantic import BaseModel
+
+MESSAGE_REFS = "__message_refs__"
+
+logger = logging.getLogger(__name__)
+
+
+class DeltaSqliteSaver(SqliteSaver):
+    """
+    SqliteSaver that stores each message once and checkpoints by reference.
+
+    `messages` in a checkpoint's channel_values is replaced by
+    ``{"__message_refs__": [hash, ...]}`` on write and resolved back on read.
+    Decoded messages are kept in a small LRU, since consecutive checkpoints of
+    a thread share almost all of them.
+    """
+
+    def __init__(
+        self,
+        conn: sqlite3.Connection,
+        *,
+        message_channel: str = "messages",
+        cache_size: int = 4096,
+        **kwargs: Any,
+    ) -> None:
+        super().__init__(conn, **kwargs)
+        self.message_channel = message_channel
+        self.cache_size = cache_size
+        self._message_cache: OrderedDict[str, Any] = OrderedDict()
+        self._cache_lock = threading.Lock()
+
+    def setup(self) -> None:
+        if self.is_setup:
+            return
+        # only takes effect on a brand-new file; lets compaction hand freed
+        # pages back to the OS with incremental_vacuum instead of a full VACUUM
+        self.conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        super().setup()
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS messages (
+                hash TEXT PRIMARY KEY,
+                type TEXT,
+                value BLOB
+            )
+            """
+        )
+        self.conn.commit()
+
+    def _store_messages(self, cur: sqlite3.Cursor, messages: list[Any]) -> list[str]:
+        refs, rows = [], []
+        for message in messages:
+            type_, blob = self.serde.dumps_typed(message)
+            digest = hashlib.sha256(type_.encode() + b"\0" + blob).hexdigest()[:32]
+            refs.append(digest)
+            rows.append((digest, type_, blob))
+            self._remember(digest, message)
+        cur.executemany(
+            "INSERT OR IGNORE INTO messages (hash, type, value) VALUES (?, ?, ?)", rows
+        )
+        return refs
+
+    def _remember(self, digest: str, message: Any) -> None:
+        with self._cache_lock:
+            self._message_cache[digest] = message
+            self._message_cache.move_to_end(digest)
+            while len(self._message_cache) > self.cache_size:
+                self._message_cache.popitem(last=False)
+
+    def _load_messages(self, refs: list[str]) -> list[Any]:
+        found: dict[str, Any] = {}
+        with self._cache_lock:
+            for ref in dict.fromkeys(refs):
+                if ref in self._message_cache:
+                    self._message_cache.move_to_end(ref)
+                    found[ref] = self._message_cache[ref]
+
+        missing = [ref for ref in dict.fromkeys(refs) if ref not in found]
+        if missing:
+            with self.cursor(transaction=False) as cur:
+                # stay under sqlite's bound-parameter limit
+                for start in range(0, len(missing), 500):
+                    chunk = missing[start : start + 500]
+                    cur.execute(
+                        f"SELECT hash, type, value FROM messages WHERE hash IN ({','.join('?' * len(chunk))})",
+                        chunk,
+                    )
+                    for digest, type_, blob in cur.fetchall():
+                        found[digest] = self.serde.loads_typed((type_, blob))
+                        self._remember(digest, found[digest])
+
+        return [found[ref] for ref in refs]
+
+    def encode_checkpoint(self, cur: sqlite3.Cursor, checkpoint: Checkpoint) -> Checkpoint:
+        """Copy of `checkpoint` with its message list swapped for hashes."""
+        channel_values = checkpoint.get("channel_values", {})
+        messages = channel_values.get(self.message_channel)
+        if not isinstance(messages, list):
+            return checkpoint
+        refs = self._store_messages(cur, messages)
+        return {
+            **checkpoint,
+            "channel_values": {
+                **channel_values,
+                self.message_channel: {MESSAGE_REFS: refs},
+            },
+        }
+
+    def _decode(self, checkpoint_tuple: CheckpointTuple | None) -> CheckpointTuple | None:
+        if checkpoint_tuple is None:
+            return None
+        channel_values = checkpoint_tuple.checkpoint.get("channel_values", {})
+        value = channel_values.get(self.message_channel)
+        if isinstance(value, dict) and MESSAGE_REFS in value:
+            channel_values[self.message_channel] = self._load_messages(value[MESSAGE_REFS])
+        return checkpoint_tuple
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        # messages and the checkpoint row are written in one transaction, so
+        # compaction's message GC never sees a hash that is about to be used
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"]["checkpoint_ns"]
+        serialized_metadata = json.dumps(
+            get_checkpoint_metadata(config, metadata), ensure_ascii=False
+        ).encode("utf-8", "ignore")
+        with self.cursor() as cur:
+            encoded = self.encode_checkpoint(cur, checkpoint)
+            type_, serialized_checkpoint = self.serde.dumps_typed(encoded)
+            cur.execute(
+                "INSERT OR REPLACE INTO checkpoints (thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, type, checkpoint, metadata) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    str(thread_id),
+                    checkpoint_ns,
+                    checkpoint["id"],
+                    config["configurable"].get("checkpoint_id"),
+                    type_,
+                    serialized_checkpoint,
+                    serialized_metadata,
+                ),
+            )
+        return {
+            "configurable": {
+                "thread_id": thread_id,
+                "checkpoint_ns": checkpoint_ns,
+                "checkpoint_id": checkpoint["id"],
+            }
+        }
+
+    def get_tuple(self, config: RunnableConfig) -> CheckpointTuple | None:
+        return self._decode(super().get_tuple(config))
+
+    def list(self, config: RunnableConfig | None, **kwargs: Any) -> Iterator[CheckpointTuple]:
+        # materialize first: resolving refs needs the connection lock the
+        # parent generator holds while it iterates
+        for checkpoint_tuple in list(super().list(config, **kwargs)):
+            yield self._decode(checkpoint_tuple)
+
+
+def migrate(db_path: str, vacuum: bool = True) -> tuple[int, int]:
+    """
+    Rewrite every checkpoint in `db_path` to the delta format.
+
+    Already-migrated rows are left alone, so this is safe to re-run.
+    Returns (rows migrated, rows total).
+    """
+    with closing(sqlite3.connect(db_path)) as conn:
+        saver = DeltaSqliteSaver(conn)
+        saver.setup()
+        rows = conn.execute(
+            "SELECT thread_id, checkpoint_ns, checkpoint_id, type, checkpoint FROM checkpoints"
+        ).fetchall()
+
+        migrated = 0
+        cur = conn.cursor()
+        for thread_id, checkpoint_ns, checkpoint_id, type_, blob in rows:
+            checkpoint = saver.serde.loads_typed((type_, blob))
+            encoded = saver.encode_checkpoint(cur, checkpoint)
+            if encoded is checkpoint:
+                continue
+            new_type, new_blob = saver.serde.dumps_typed(encoded)
+            cur.execute(
+                "UPDATE checkpoints SET type = ?, checkpoint = ? WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+                (new_type, new_blob, thread_id, checkpoint_ns, checkpoint_id),
+            )
+            migrated += 1
+        conn.commit()
+
+    if vacuum:
+        # VACUUM can't run inside a transaction, use an autocommit connection
+        with closing(sqlite3.connect(db_path, isolation_level=None)) as conn:
+            conn.execute("VACUUM")
+
+    return migrated, len(rows)
+
+
+PRAGMAS = {
+    "journal_mode": "WAL",
+    # with WAL, NORMAL only risks the last transactions on power loss, never corruption
+    "synchronous": "NORMAL",
+    "busy_timeout": 5000,
+    "cache_size": -64000,  # KiB, i.e. 64 MB of page cache per connection
+    "temp_store": "MEMORY",
+    "mmap_size": 256 * 1024 * 1024,
+}
+
+
+def connect(db_path: str, read_only: bool = False) -> sqlite3.Connection:
+    # autocommit: the writer issues BEGIN/COMMIT itself, readers never hold a
+    # transaction open (which would stop WAL checkpoints from completing)
+    conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+    if not read_only:
+        # has to come before journal_mode=WAL, which writes the header of a new
+        # file and fixes auto_vacuum for good; see DeltaSqliteSaver.setup
+        conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+    for pragma, value in PRAGMAS.items():
+        conn.execute(f"PRAGMA {pragma}={value}")
+    if read_only:
+        conn.execute("PRAGMA query_only=1")
+    return conn
+
+
+class _RecordingCursor:
+    """Collects the statements of a write block so the writer thread can replay them."""
+
+    def __init__(self) -> None:
+        self.ops: list[tuple[str, str, Any]] = []
+
+    def execute(self, sql: str, parameters: Any = ()) -> None:
+        self.ops.append(("execute", sql, parameters))
+
+    def executemany(self, sql: str, seq_of_parameters: Any) -> None:
+        self.ops.append(("executemany", sql, list(seq_of_parameters)))
+
+
+class _WriteJob:
+    def __init__(self, ops: list[tuple[str, str, Any]]) -> None:
+        self.ops = ops
+        self.done = threading.Event()
+        self.error: BaseException | None = None
+
+
+class PooledSqliteMixin:
+    """
+    Connection handling for a SqliteSaver that many threads share.
+
+    Reads borrow a connection from a pool of up to `pool_size` read-only
+    connections, so concurrent `get_tuple`/`list` calls run in parallel under
+    WAL. Writes are recorded on the calling thread and replayed by a single
+    writer thread, which drains whatever is queued (up to `max_batch` blocks)
+    into one transaction: one fsync for many checkpoints. Callers still block
+    until their write is committed, so the saver's semantics don't change.
+
+    The inherited `list` reads pending writes through `self.conn` (the
+    writer's connection); SQLite serializes calls on a shared connection, so
+    that stays correct, it just doesn't use the pool.
+    """
+
+    def __init__(
+        self,
+        conn: sqlite3.Connection,
+        *,
+        db_path: str,
+        pool_size: int = 8,
+        max_batch: int = 64,
+        **kwargs: Any,
+    ) -> None:
+        super().__init__(conn, **kwargs)
+        self.db_path = db_path
+        self.pool_size = pool_size
+        self.max_batch = max_batch
+        self._readers: queue.LifoQueue[sqlite3.Connection] = queue.LifoQueue()
+        self._reader_count = 0
+        self._pool_lock = threading.Lock()
+        self._writes: queue.Queue[_WriteJob | None] = queue.Queue()
+        self._writer: threading.Thread | None = None
+        self._setup_lock = threading.Lock()
+
+    def _ensure_setup(self) -> None:
+        if self.is_setup and self._writer is not None:
+            return
+        with self._setup_lock:
+            if not self.is_setup:
+                self.setup()
+            if self._writer is None:
+                self._writer = threading.Thread(
+                    target=self._write_loop, name="checkpoint-writer", daemon=True
+                )
+                self._writer.start()
+
+    def _borrow_reader(self) -> sqlite3.Connection:
+        try:
+            return self._readers.get_nowait()
+        except queue.Empty:
+            pass
+        with self._pool_lock:
+            if self._reader_count < self.pool_size:
+                self._reader_count += 1
+                return connect(self.db_path, read_only=True)
+        return self._readers.get()
+
+    @contextmanager
+    def cursor(self, transaction: bool = True) -> Iterator[Any]:
+        self._ensure_setup()
+        if not transaction:
+            conn = self._borrow_reader()
+            cur = conn.cursor()
+            try:
+                yield cur
+            finally:
+                cur.close()
+                self._readers.put(conn)
+            return
+
+        recorder = _RecordingCursor()
+        yield recorder
+        if recorder.ops:
+            job = _WriteJob(recorder.ops)
+            self._writes.put(job)
+            job.done.wait()
+            if job.error is not None:
+                raise job.error
+
+    def _apply(self, jobs: list[_WriteJob]) -> None:
+        cur = self.conn.cursor()
+        try:
+            cur.execute("BEGIN IMMEDIATE")
+            for job in jobs:
+                for method, sql, parameters in job.ops:
+                    getattr(cur, method)(sql, parameters)
+            cur.execute("COMMIT")
+        finally:
+            cur.close()
+
+    def _write_loop(self) -> None:
+        while True:
+            job = self._writes.get()
+            if job is None:
+                return
+            batch = [job]
+            while len(batch) < self.max_batch:
+                try:
+                    queued = self._writes.get_nowait()
+                except queue.Empty:
+                    break
+                if queued is None:
+                    self._writes.put(None)  # stop after this batch
+                    break
+                batch.append(queued)
+
+            try:
+                self._apply(batch)
+            except sqlite3.Error:
+                if self.conn.in_transaction:
+                    self.conn.execute("ROLLBACK")
+                # replay one by one so a bad write only fails its own caller
+                for single in batch:
+                    try:
+                        self._apply([single])
+                    except sqlite3.Error as exc:
+                        if self.conn.in_transaction:
+                            self.conn.execute("ROLLBACK")
+                        single.error = exc
+            for done in batch:
+                done.done.set()
+
+    def close(self) -> None:
+        """Flush queued writes, stop the writer and close every connection."""
+        if self._writer is not None:
+            self._writes.put(None)
+            self._writer.join()
+            self._writer = None
+        while True:
+            try:
+                self._readers.get_nowait().close()
+            except queue.Empty:
+                break
+        self.conn.close()
+
+
+class PooledSqliteSaver(PooledSqliteMixin, SqliteSaver):
+    pass
+
+
+class PooledDeltaSqliteSaver(PooledSqliteMixin, DeltaSqliteSaver):
+    pass
+
+
+@contextmanager
+def sqlite_checkpointer(
+    db_path: str, *, delta: bool = True, pool_size: int = 8, max_batch: int = 64
+) -> Iterator[SqliteSaver]:
+    """
+    Checkpointer for graphs served to many threads at once.
+
+        with sqlite_checkpointer("chat_echo.db") as memory:
+            graph = build_graph(checkpointer=memory)
+
+    WAL journaling and the PRAGMAS above on every connection, a pool of
+    read-only connections and a single batching writer. `delta=True` also
+    stores messages once (see DeltaSqliteSaver).
+    """
+    saver_cls = PooledDeltaSqliteSaver if delta else PooledSqliteSaver
+    saver = saver_cls(
+        connect(db_path), db_path=db_path, pool_size=pool_size, max_batch=max_batch
+    )
+    try:
+        yield saver
+    finally:
+        saver.close()
+
+
+class RetentionPolicy(BaseModel):
+    """
+    Which checkpoints of a thread survive compaction.
+
+    The newest `keep_last` checkpoints are always kept (the graph only ever
+    resumes from the latest, and a few more keep short-range time travel
+    working). With `keep_turns`, the "input" checkpoint of every turn is kept
+    too. It holds the state exactly as the previous turn left it, with the new
+    user input as its pending write, so the conversation can still be
+    replayed turn by turn.
+    """
+
+    keep_last: int = 20
+    keep_turns: bool = True
+    # pages handed back to the OS per compaction run, 0 disables
+    vacuum_pages: int = 2000
+
+
+def checkpoints_to_keep(
+    rows: list[tuple[str, str | None]], policy: RetentionPolicy
+) -> set[str]:
+    """`rows` are (checkpoint_id, metadata source), oldest first."""
+    keep = {checkpoint_id for checkpoint_id, _ in rows[-policy.keep_last :]}
+    if policy.keep_turns:
+        keep.update(checkpoint_id for checkpoint_id, source in rows if source == "input")
+    return keep
+
+
+def compact_thread(
+    conn: sqlite3.Connection,
+    thread_id: str,
+    checkpoint_ns: str,
+    policy: RetentionPolicy,
+) -> int:
+    """
+    Delete one thread's expired checkpoints and their writes in a single
+    short transaction. Kept checkpoints are re-parented onto the nearest kept
+    ancestor so history walks stay connected. Returns the number deleted.
+    """
+    with conn:
+        conn.execute("BEGIN IMMEDIATE")
+        rows = conn.execute(
+            "SELECT checkpoint_id, parent_checkpoint_id, metadata FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? ORDER BY checkpoint_id",
+            (thread_id, checkpoint_ns),
+        ).fetchall()
+        sources = [
+            (checkpoint_id, json.loads(metadata).get("source") if metadata else None)
+            for checkpoint_id, _, metadata in rows
+        ]
+        keep = checkpoints_to_keep(sources, policy)
+        expired = [checkpoint_id for checkpoint_id, _ in sources if checkpoint_id not in keep]
+        if not expired:
+            return 0
+
+        previous_kept = None
+        for checkpoint_id, parent_id, _ in rows:
+            if checkpoint_id not in keep:
+                continue
+            if parent_id is not None and parent_id not in keep:
+                conn.execute(
+                    "UPDATE checkpoints SET parent_checkpoint_id = ? WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+                    (previous_kept, thread_id, checkpoint_ns, checkpoint_id),
+                )
+            previous_kept = checkpoint_id
+
+        for start in range(0, len(expired), 500):
+            chunk = expired[start : start + 500]
+            placeholders = ",".join("?" * len(chunk))
+            for table in ("checkpoints", "writes"):
+                conn.execute(
+                    f"DELETE FROM {table} WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id IN ({placeholders})",
+                    (thread_id, checkpoint_ns, *chunk),
+                )
+        return len(expired)
+
+
+def _referenced_messages(
+    serde: JsonPlusSerializer, rows: Iterator[tuple[str, bytes]]
+) -> set[str]:
+    referenced: set[str] = set()
+    for type_, blob in rows:
+        channel_values = serde.loads_typed((type_, blob)).get("channel_values", {})
+        for value in channel_values.values():
+            if isinstance(value, dict) and MESSAGE_REFS in value:
+                referenced.update(value[MESSAGE_REFS])
+    return referenced
+
+
+def collect_message_garbage(conn: sqlite3.Connection) -> int:
+    """
+    Delete rows of the delta `messages` table no checkpoint refers to.
+
+    Decoding every checkpoint happens in a read transaction, which under WAL
+    doesn't hold up the savers. Only the delete takes the write lock; before
+    it, checkpoints written since the scan (rowid past the newest scanned)
+    are decoded too and whatever they refer to is spared.
+    """
+    has_messages = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'messages'"
+    ).fetchone()
+    if not has_messages:
+        return 0
+
+    serde = JsonPlusSerializer()
+    with conn:
+        conn.execute("BEGIN")
+        newest = conn.execute(
+            "SELECT rowid, thread_id, checkpoint_ns, checkpoint_id FROM checkpoints ORDER BY rowid DESC LIMIT 1"
+        ).fetchone()
+        referenced = _referenced_messages(
+            serde, conn.execute("SELECT type, checkpoint FROM checkpoints")
+        )
+        stored = [row[0] for row in conn.execute("SELECT hash FROM messages")]
+    garbage = {digest for digest in stored if digest not in referenced}
+    if not garbage:
+        return 0
+
+    with conn:
+        conn.execute("BEGIN IMMEDIATE")
+        # new and replaced rows get a rowid past the newest one scanned, unless
+        # that row was deleted and its rowid handed out again: then check all
+        unchanged = newest is not None and conn.execute(
+            "SELECT 1 FROM checkpoints WHERE rowid = ? AND thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+            newest,
+        ).fetchone()
+        since = newest[0] if unchanged else 0
+        garbage -= _referenced_messages(
+            serde,
+            conn.execute("SELECT type, checkpoint FROM checkpoints WHERE rowid > ?", (since,)),
+        )
+        doomed = sorted(garbage)
+        for start in range(0, len(doomed), 500):
+            chunk = doomed[start : start + 500]
+            conn.execute(
+                f"DELETE FROM messages WHERE hash IN ({','.join('?' * len(chunk))})",
+                chunk,
+            )
+        return len(doomed)
+
+
+def compact(
+    db_path: str, policy: RetentionPolicy | None = None, gc_messages: bool = True
+) -> dict[str, int]:
+    """
+    Apply `policy` to every thread in `db_path`, then reclaim space.
+
+    Runs on its own connection with one transaction per thread, so it can
+    run next to a live SqliteSaver/DeltaSqliteSaver (the savers enable WAL,
+    and writers only wait for the thread currently being compacted).
+    """
+    policy = policy or RetentionPolicy()
+    with closing(sqlite3.connect(db_path, timeout=30, isolation_level=None)) as conn:
+        conn.execute("PRAGMA busy_timeout = 30000")
+        threads = conn.execute(
+            "SELECT DISTINCT thread_id, checkpoint_ns FROM checkpoints"
+        ).fetchall()
+
+        deleted = 0
+        for thread_id, checkpoint_ns in threads:
+            deleted += compact_thread(conn, thread_id, checkpoint_ns, policy)
+
+        messages_deleted = collect_message_garbage(conn) if gc_messages else 0
+
+        pages_freed = 0
+        auto_vacuum = conn.execute("PRAGMA auto_vacuum").fetchone()[0]
+        if policy.vacuum_pages and auto_vacuum == 2:  # INCREMENTAL
+            before = conn.execute("PRAGMA freelist_count").fetchone()[0]
+            conn.execute(f"PRAGMA incremental_vacuum({int(policy.vacuum_pages)})")
+            pages_freed = before - conn.execute("PRAGMA freelist_count").fetchone()[0]
+
+    return {
+        "threads": len(threads),
+        "checkpoints_deleted": deleted,
+        "messages_deleted": messages_deleted,
+        "pages_freed": pages_freed,
+    }
+
+
+def enable_incremental_vacuum(db_path: str) -> None:
+    """
+    Switch an existing database to auto_vacuum=INCREMENTAL.
+
+    Needs one full VACUUM, which blocks writers while it runs, so do this
+    during a quiet period; afterwards `compact` reclaims space incrementally.
+    """
+    with closing(sqlite3.connect(db_path, isolation_level=None)) as conn:
+        conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        conn.execute("VACUUM")
+
+
+class CompactionJob:
+    """
+    Run `compact` every `interval` seconds on a background thread.
+
+        job = CompactionJob("chat_echo.db", RetentionPolicy(keep_last=20))
+        job.start()
+        ...
+        job.stop()
+    """
+
+    def __init__(
+        self,
+        db_path: str,
+        policy: RetentionPolicy | None = None,
+        interval: float = 600.0,
+    ) -> None:
+        self.db_path = db_path
+        self.policy = policy or RetentionPolicy()
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def run_once(self) -> dict[str, int]:
+        stats = compact(self.db_path, self.policy)
+        logger.info("compacted %s: %s", self.db_path, stats)
+        return stats
+
+    def _loop(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                self.run_once()
+            except sqlite3.Error:
+                # a busy database shouldn't kill the job, try again next round
+                logger.exception("compaction of %s failed", self.db_path)
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._loop, name="checkpoint-compaction", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="checkpoint database tools")
+    commands = parser.add_subparsers(dest="command", required=True)
+    migrate_parser = commands.add_parser(
+        "migrate", help="store messages once per database instead of per checkpoint"
+    )
+    migrate_parser.add_argument("db_path")
+    migrate_parser.add_argument("--no-vacuum", action="store_true")
+    compact_parser = commands.add_parser(
+        "compact", help="delete old checkpoints according to a retention policy"
+    )
+    compact_parser.add_argument("db_path")
+    compact_parser.add_argument("--keep-last", type=int, default=20)
+    compact_parser.add_argument(
+        "--no-turns",
+        dest="drop_turns",
+        action="store_true",
+        help="only keep the newest checkpoints, not one per turn",
+    )
+    compact_parser.add_argument(
+        "--enable-incremental-vacuum",
+        action="store_true",
+        help="one-off full VACUUM so later runs can free space incrementally",
+    )
+    args = parser.parse_args()
+
+    if args.command == "migrate":
+        migrated, total = migrate(args.db_path, vacuum=not args.no_vacuum)
+        print(f"migrated {migrated} of {total} checkpoints in {args.db_path}")
+    elif args.command == "compact":
+        if args.enable_incremental_vacuum:
+            enable_incremental_vacuum(args.db_path)
+        policy = RetentionPolicy(keep_last=args.keep_last, keep_turns=not args.drop_turns)
+        print(compact(args.db_path, policy))
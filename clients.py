@@ -0,0 +1,31 @@
+"""
+Chat model clients, created on first use and shared by the whole process.
+
+Importing a provider SDK (google-genai alone takes ~0.5 s) and building its
+client used to happen when `main` or `inquira_agent` was imported, so every
+worker and `langgraph dev` paid for it before serving anything. Graphs now
+ask for a client the first time they call a model; `chat_model` imports
+`init_chat_model` at that point and hands the same instance to every caller
+asking for the same model and parameters.
+"""
+
+import threading
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from langchain_core.language_models import BaseChatModel
+
+_models: dict[tuple[str, tuple[tuple[str, Any], ...]], "BaseChatModel"] = {}
+_lock = threading.Lock()
+
+
+def chat_model(model: str, **kwargs: Any) -> "BaseChatModel":
+    """`init_chat_model(model, **kwargs)`, built once per process."""
+    key = (model, tuple(sorted(kwargs.items())))
+    with _lock:
+        client = _models.get(key)
+        if client is None:
+            from langchain.chat_models import init_chat_model
+
+            client = _models[key] = init_chat_model(model, **kwargs)
+        return client
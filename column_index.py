@@ -0,0 +1,110 @@
+import math
+import re
+from collections import Counter
+from typing import Any
+
+_SPLIT = re.compile(r"[^0-9a-zA-Z]+|(?<=[a-z])(?=[A-Z])")
+_STOPWORDS = frozenset(
+    "a an and are as at be by for from how in is it of on or per the to was what "
+    "which who with show me give list many much".split()
+)
+_KEY_FLAGS = ("key", "is_key", "primary_key", "foreign_key")
+
+
+def tokenize(text: str) -> list[str]:
+    tokens = []
+    for raw in _SPLIT.split(str(text)):
+        token = raw.lower()
+        if not token or token in _STOPWORDS:
+            continue
+        # cheap plural folding so "deliveries" meets "delivery" and "cities" meets "city"
+        if token.endswith("ies") and len(token) > 4:
+            token = token[:-3] + "y"
+        elif token.endswith("s") and not token.endswith("ss") and len(token) > 3:
+            token = token[:-1]
+        tokens.append(token)
+    return tokens
+
+
+def is_key_column(column: dict[str, Any]) -> bool:
+    if any(column.get(flag) for flag in _KEY_FLAGS):
+        return True
+    name = str(column.get("name", "")).lower()
+    return name == "id" or name.endswith("_id")
+
+
+class ColumnIndex:
+    """
+    BM25 index over a schema's columns.
+
+    Each column is indexed on its name (weighted double), description and
+    sample values, so a question can be matched to the handful of columns it
+    is about without sending the whole schema to the model.
+    """
+
+    k1 = 1.5
+    b = 0.75
+
+    def __init__(self, columns: list[dict[str, Any]]) -> None:
+        self.columns = columns
+        self.keys = [i for i, column in enumerate(columns) if is_key_column(column)]
+
+        self._docs: list[Counter[str]] = []
+        for column in columns:
+            name_tokens = tokenize(column.get("name", ""))
+            tokens = name_tokens * 2 + tokenize(column.get("description") or "")
+            samples = column.get("sample_values") or column.get("samples") or []
+            if isinstance(samples, list):
+                for value in samples:
+                    tokens += tokenize(value)
+            self._docs.append(Counter(tokens))
+
+        self._lengths = [sum(doc.values()) for doc in self._docs]
+        # at least 1, so columns that tokenize to nothing don't divide by zero
+        self._avg_length = max(sum(self._lengths) / len(self._lengths), 1.0) if columns else 1.0
+
+        document_frequency: Counter[str] = Counter()
+        for doc in self._docs:
+            document_frequency.update(doc.keys())
+        n = len(self._docs)
+        self._idf = {
+            term: math.log(1 + (n - df + 0.5) / (df + 0.5))
+            for term, df in document_frequency.items()
+        }
+
+    def scores(self, query: str) -> list[float]:
+        terms = [t for t in set(tokenize(query)) if t in self._idf]
+        scores = [0.0] * len(self._docs)
+        for i, doc in enumerate(self._docs):
+            norm = self.k1 * (1 - self.b + self.b * self._lengths[i] / self._avg_length)
+            for term in terms:
+                tf = doc.get(term)
+                if tf:
+                    scores[i] += self._idf[term] * tf * (self.k1 + 1) / (tf + norm)
+        return scores
+
+    def search(self, query: str, top_k: int) -> list[int]:
+        """Indices of the top_k columns that match the query at all, best first."""
+        scores = self.scores(query)
+        ranked = sorted(
+            (i for i, score in enumerate(scores) if score > 0),
+            key=lambda i: (-scores[i], i),
+        )
+        return ranked[:top_k]
+
+    def prune(self, schema: dict[str, Any], query: str, top_k: int) -> dict[str, Any]:
+        """
+        Copy of `schema` keeping only key columns plus the top_k matches.
+
+        Falls back to the full schema when nothing matches, since sending
+        every column is safer than sending none.
+        """
+        hits = self.search(query, top_k)
+        if not hits:
+            return schema
+
+        keep = sorted(set(hits) | set(self.keys))
+        pruned = {key: value for key, value in schema.items() if key != "columns"}
+        pruned["columns"] = [self.columns[i] for i in keep]
+        pruned["columns_shown"] = f"{len(keep)} of {len(self.columns)}"
+        return pruned
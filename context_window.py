@@ -0,0 +1,95 @@
+"""
+Token-aware context window for the echo graph.
+
+Deciding when to summarize by message count treats a one-word reply and a
+10k-character `search_web` result the same. `ContextWindow` budgets in
+(estimated) tokens instead: the conversation is summarized once it grows past
+`token_budget`, and summarization keeps the most recent `keep_tokens` worth of
+turns. The gap between the two means a summary call buys several turns before
+the next one.
+
+Counts come from the local chars/4 estimate in summarization.py, not a
+tokenizer round-trip, and are cached per message id, since the same messages
+are re-counted on every turn.
+"""
+
+import json
+from collections import OrderedDict
+
+from langchain_core.messages import AIMessage, AnyMessage, HumanMessage
+
+from summarization import estimate_tokens, message_text
+
+CONTEXT_TOKEN_BUDGET = 6000
+KEEP_TOKENS = 2000
+# role markers and separators the provider adds around every message
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+class ContextWindow:
+    def __init__(
+        self,
+        token_budget: int = CONTEXT_TOKEN_BUDGET,
+        keep_tokens: int = KEEP_TOKENS,
+        cache_size: int = 4096,
+    ) -> None:
+        if keep_tokens > token_budget:
+            raise ValueError("keep_tokens must not exceed token_budget")
+        self.token_budget = token_budget
+        self.keep_tokens = keep_tokens
+        self.cache_size = cache_size
+        self._counts: OrderedDict[tuple[str, int], int] = OrderedDict()
+
+    def count(self, message: AnyMessage) -> int:
+        """Estimated tokens `message` takes up in a prompt."""
+        # the content's length (characters, or parts for a list) guards
+        # against a message being replaced under the same id; the text itself
+        # is only built on a miss
+        key = (message.id, len(message.content)) if message.id else None
+        if key in self._counts:
+            self._counts.move_to_end(key)
+            return self._counts[key]
+
+        tokens = estimate_tokens(message_text(message)) + MESSAGE_OVERHEAD_TOKENS
+        if isinstance(message, AIMessage):
+            for call in message.tool_calls:
+                tokens += estimate_tokens(call["name"] + json.dumps(call["args"]))
+
+        if key is not None:
+            self._counts[key] = tokens
+            if len(self._counts) > self.cache_size:
+                self._counts.popitem(last=False)
+        return tokens
+
+    def total(self, messages: list[AnyMessage]) -> int:
+        return sum(self.count(m) for m in messages)
+
+    def over_budget(self, messages: list[AnyMessage], summary: str = "") -> bool:
+        return self.total(messages) + estimate_tokens(summary) > self.token_budget
+
+    def trim_index(self, messages: list[AnyMessage]) -> int:
+        """
+        Index of the first message to keep, 0 if nothing can be trimmed.
+
+        The kept tail fits in `keep_tokens` where possible and always starts
+        at a HumanMessage, so a tool call is never separated from its result.
+        The latest turn is kept whole even if it alone is over `keep_tokens`.
+        """
+        kept = 0
+        candidate = len(messages)
+        while candidate > 0:
+            tokens = self.count(messages[candidate - 1])
+            if kept + tokens > self.keep_tokens:
+                break
+            kept += tokens
+            candidate -= 1
+
+        for i in range(candidate, len(messages)):
+            if isinstance(messages[i], HumanMessage):
+                return i
+        # the tail that fits has no turn boundary, fall back to the start of
+        # the latest turn
+        for i in range(min(candidate, len(messages)) - 1, -1, -1):
+            if isinstance(messages[i], HumanMessage):
+                return i
+        return 0
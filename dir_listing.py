@@ -0,0 +1,102 @@
+"""
+Directory listing for the `list_files` tool.
+
+One `os.scandir` pass gives each entry's name and type without extra stat
+calls (the type comes from the directory itself on Linux and macOS, and the
+entry caches its stat after the first use). Sizes and mtimes are only
+statted for the entries that are actually needed: the page being shown when
+sorting by name, every entry when sorting by size or mtime, or in summary
+mode. The page of a name-sorted listing is picked with a heap rather than a
+full sort, so a 100k-entry directory costs one pass and a small heap.
+"""
+
+import fnmatch
+import heapq
+import os
+from collections import Counter
+from dataclasses import dataclass
+
+SORT_KEYS = ("name", "size", "mtime")
+MAX_LIMIT = 200
+
+
+@dataclass
+class Listing:
+    entries: list[os.DirEntry]
+    total: int  # entries matching the pattern
+    offset: int
+
+    @property
+    def next_offset(self) -> int | None:
+        end = self.offset + len(self.entries)
+        return end if end < self.total else None
+
+
+def human_size(size: int) -> str:
+    if size < 1024:
+        return f"{size} B"
+    if size < 1024 * 1024:
+        return f"{size / 1024:.1f} KB"
+    if size < 1024 * 1024 * 1024:
+        return f"{size / (1024 * 1024):.1f} MB"
+    return f"{size / (1024 * 1024 * 1024):.1f} GB"
+
+
+def entry_stat(entry: os.DirEntry) -> os.stat_result | None:
+    try:
+        return entry.stat()
+    except OSError:  # vanished or a dangling symlink
+        return None
+
+
+def scan(path: str, pattern: str = "*") -> list[os.DirEntry]:
+    with os.scandir(path) as it:
+        if pattern in ("", "*"):
+            return list(it)
+        return [e for e in it if fnmatch.fnmatch(e.name, pattern)]
+
+
+def _name_key(entry: os.DirEntry) -> tuple[bool, str]:
+    # directories first, then case-insensitive name
+    return (not entry.is_dir(), entry.name.lower())
+
+
+def list_page(
+    path: str,
+    pattern: str = "*",
+    sort_by: str = "name",
+    offset: int = 0,
+    limit: int = 50,
+) -> Listing:
+    if sort_by not in SORT_KEYS:
+        raise ValueError(f"sort_by must be one of {', '.join(SORT_KEYS)}")
+    entries = scan(path, pattern)
+    offset = max(offset, 0)
+    limit = max(0, min(limit, MAX_LIMIT))
+
+    if sort_by == "name":
+        page = heapq.nsmallest(offset + limit, entries, key=_name_key)[offset:]
+    else:
+        attr = "st_size" if sort_by == "size" else "st_mtime"
+
+        def largest_first(entry: os.DirEntry) -> float:
+            stat = entry_stat(entry)
+            return -getattr(stat, attr) if stat else 0.0
+
+        page = heapq.nsmallest(offset + limit, entries, key=largest_first)[offset:]
+    return Listing(entries=page, total=len(entries), offset=offset)
+
+
+def summarize(path: str, pattern: str = "*") -> dict[str, tuple[int, int]]:
+    """{extension: (file count, total bytes)}, plus '<dir>' for directories."""
+    counts: Counter[str] = Counter()
+    sizes: Counter[str] = Counter()
+    for entry in scan(path, pattern):
+        if entry.is_dir():
+            counts["<dir>"] += 1
+            continue
+        ext = os.path.splitext(entry.name)[1].lower() or "<none>"
+        counts[ext] += 1
+        stat = entry_stat(entry)
+        sizes[ext] += stat.st_size if stat else 0
+    return {ext: (counts[ext], sizes[ext]) for ext in counts}
@@ -0,0 +1,264 @@
+"""
+Memory-bounded file reading for the `read_file` tool.
+
+Files are never loaded whole. A page of lines is streamed from the start of
+the file, from a line offset, or backwards from the end (tail). Output is
+capped in bytes as well as lines, and at most MAX_LINE_BYTES of any one line
+is read, so a huge line (a minified bundle, a one-line JSON dump) can't
+flood the context or the process's memory.
+
+Jumping to a line offset uses a `LineIndex`: the newline count of every
+1 MiB block, counted one block at a time. Building it is a memchr-speed pass over
+the file and costs a few bytes per MiB. It is built only when an offset
+needs it and cached per (path, size, mtime). Without one, the total line
+count in the header is estimated from the lines already read.
+"""
+
+import bisect
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+
+BLOCK_BYTES = 1 << 20
+SNIFF_BYTES = 8192
+MAX_OUTPUT_BYTES = 20_000
+MAX_LINE_CHARS = 1000
+# enough bytes for MAX_LINE_CHARS characters of UTF-8; the rest of a longer
+# line is skipped without being held in memory
+MAX_LINE_BYTES = 4 * MAX_LINE_CHARS
+# read_tail never scans back further than this, newlines or not
+MAX_TAIL_BYTES = 4 * MAX_OUTPUT_BYTES
+
+
+def is_binary(path: str) -> bool:
+    """Binary if the first block has a NUL byte or isn't valid UTF-8."""
+    with open(path, "rb") as f:
+        block = f.read(SNIFF_BYTES)
+    if b"\x00" in block:
+        return True
+    try:
+        block.decode("utf-8")
+    except UnicodeDecodeError as e:
+        # a multi-byte character cut off at the end of the block is fine
+        return e.start < len(block) - 3
+    return False
+
+
+class LineIndex:
+    """Cumulative newline counts at every BLOCK_BYTES boundary of a file."""
+
+    def __init__(self, path: str) -> None:
+        self.size = os.path.getsize(path)
+        # starts[i] = number of newlines before byte i * BLOCK_BYTES
+        self.starts = [0]
+        if self.size:
+            # plain block reads rather than an mmap, so the mapped file doesn't
+            # count towards the process's resident memory
+            with open(path, "rb") as f:
+                while block := f.read(BLOCK_BYTES):
+                    self.starts.append(self.starts[-1] + block.count(b"\n"))
+        newlines = self.starts[-1]
+        # a last line without a trailing newline still counts
+        self.total_lines = newlines + (1 if self.size and not self._ends_with_newline(path) else 0)
+
+    @staticmethod
+    def _ends_with_newline(path: str) -> bool:
+        with open(path, "rb") as f:
+            f.seek(-1, os.SEEK_END)
+            return f.read(1) == b"\n"
+
+    def seek_line(self, f, line: int) -> None:
+        """Position binary file `f` at the start of (0-based) `line`."""
+        if line <= 0:
+            f.seek(0)
+            return
+        # the block holding the newline that ends line - 1
+        block = bisect.bisect_left(self.starts, line) - 1
+        f.seek(block * BLOCK_BYTES)
+        to_skip = line - self.starts[block]
+        while to_skip > 0:
+            chunk = f.read(BLOCK_BYTES)
+            if not chunk:
+                return
+            count = chunk.count(b"\n")
+            if count < to_skip:
+                to_skip -= count
+                continue
+            pos = -1
+            for _ in range(to_skip):
+                pos = chunk.index(b"\n", pos + 1)
+            f.seek(pos + 1 - len(chunk), os.SEEK_CUR)
+            return
+
+
+_indexes: OrderedDict[tuple[str, int, int], LineIndex] = OrderedDict()
+_indexes_lock = threading.Lock()
+
+
+def line_index(path: str, build: bool = True) -> LineIndex | None:
+    """Cached LineIndex for the file as it is now; None if not built and `build` is False."""
+    stat = os.stat(path)
+    key = (os.path.realpath(path), stat.st_size, stat.st_mtime_ns)
+    with _indexes_lock:
+        if key in _indexes:
+            _indexes.move_to_end(key)
+            return _indexes[key]
+    if not build:
+        return None
+    index = LineIndex(path)
+    with _indexes_lock:
+        _indexes[key] = index
+        while len(_indexes) > 32:
+            _indexes.popitem(last=False)
+    return index
+
+
+@dataclass
+class Page:
+    lines: list[str]
+    first_line: int  # 1-based number of lines[0]
+    total_lines: int | None  # exact, if known
+    estimated_total: int | None  # from the bytes per line read so far
+    truncated_bytes: bool  # stopped by MAX_OUTPUT_BYTES rather than the line limit
+    more_after: bool
+
+
+def _read_line(f) -> tuple[bytes, int]:
+    """
+    The next line's first MAX_LINE_BYTES and its full length in bytes.
+
+    The rest of a longer line is skipped a block at a time; (b"", 0) at EOF.
+    """
+    raw = f.readline(MAX_LINE_BYTES + 1)
+    length = len(raw)
+    if length <= MAX_LINE_BYTES or raw.endswith(b"\n"):
+        return raw, length
+    while True:
+        chunk = f.read(BLOCK_BYTES)
+        if not chunk:
+            break
+        end = chunk.find(b"\n")
+        if end >= 0:
+            length += end + 1
+            f.seek(end + 1 - len(chunk), os.SEEK_CUR)
+            break
+        length += len(chunk)
+    return raw, length
+
+
+def _decode(raw: bytes, length: int | None = None) -> str:
+    """`raw` as text, cut at MAX_LINE_CHARS; `length` is the line's full size."""
+    line = raw.rstrip(b"\r\n").decode("utf-8", errors="replace")
+    if length is not None and length > len(raw):
+        return line[:MAX_LINE_CHARS] + f" ... [line continues, {length} bytes in all]"
+    if len(line) > MAX_LINE_CHARS:
+        line = line[:MAX_LINE_CHARS] + f" ... [{len(line) - MAX_LINE_CHARS} more chars]"
+    return line
+
+
+def read_page(path: str, offset: int = 0, limit: int = 50) -> Page:
+    """Up to `limit` lines starting at (0-based) line `offset`."""
+    index = line_index(path, build=offset > 0)
+    size = os.path.getsize(path)
+    lines: list[str] = []
+    used = 0
+    truncated = False
+    with open(path, "rb") as f:
+        if index is not None:
+            index.seek_line(f, offset)
+        while len(lines) < limit:
+            raw, length = _read_line(f)
+            if not raw:
+                break
+            line = _decode(raw, length)
+            if lines and used + len(line) + 1 > MAX_OUTPUT_BYTES:
+                truncated = True
+                break
+            lines.append(line)
+            used += len(line) + 1
+        position = f.tell()
+        more_after = position < size or truncated
+
+        total = estimated = None
+        if index is not None:
+            total = index.total_lines
+        elif not more_after:
+            total = offset + len(lines)
+        elif size <= BLOCK_BYTES:
+            # one block: counting is as cheap as guessing from the lines read
+            f.seek(0)
+            data = f.read()
+            total = data.count(b"\n") + (1 if data and not data.endswith(b"\n") else 0)
+        elif lines:
+            estimated = offset + round(len(lines) * size / max(position, 1))
+    return Page(
+        lines=lines,
+        first_line=offset + 1,
+        total_lines=total,
+        estimated_total=estimated,
+        truncated_bytes=truncated,
+        more_after=more_after,
+    )
+
+
+def read_tail(path: str, limit: int = 50) -> Page:
+    """The last `limit` lines, read backwards from the end in blocks."""
+    size = os.path.getsize(path)
+    chunks: list[bytes] = []
+    newlines = 0
+    position = size
+    with open(path, "rb") as f:
+        # one more newline than lines wanted, plus the file's trailing one, but
+        # never more than MAX_TAIL_BYTES
+        while position > 0 and newlines <= limit and size - position < MAX_TAIL_BYTES:
+            step = min(SNIFF_BYTES * 8, position)
+            position -= step
+            f.seek(position)
+            chunk = f.read(step)
+            chunks.append(chunk)
+            newlines += chunk.count(b"\n")
+    data = b"".join(reversed(chunks))
+    raw_lines = data.splitlines()
+    # the first line is most likely partial; if it's the only one, it is the
+    # end of a line longer than MAX_TAIL_BYTES and its end is shown instead
+    cut_line = position > 0 and len(raw_lines) == 1
+    if position > 0 and len(raw_lines) > 1:
+        raw_lines = raw_lines[1:]
+    raw_lines = raw_lines[-limit:] if limit else []
+
+    lines: list[str] = []
+    used = 0
+    truncated = False
+    for raw in reversed(raw_lines):
+        if cut_line:
+            text = raw.rstrip(b"\r\n").decode("utf-8", errors="replace")
+            line = "[line starts earlier] ... " + text[-MAX_LINE_CHARS:]
+        else:
+            line = _decode(raw)
+        if lines and used + len(line) + 1 > MAX_OUTPUT_BYTES:
+            truncated = True
+            break
+        lines.append(line)
+        used += len(line) + 1
+    lines.reverse()
+
+    index = line_index(path, build=False)
+    if index is not None:
+        total, estimated = index.total_lines, None
+    elif position == 0 and not truncated:
+        total, estimated = len(data.splitlines()), None
+    else:
+        total = None
+        read = sum(map(len, chunks))
+        # one cut line says nothing about how long the others are
+        estimated = None if cut_line else round(len(raw_lines) * size / max(read, 1))
+    first = (total or estimated or len(lines)) - len(lines) + 1
+    return Page(
+        lines=lines,
+        first_line=max(first, 1),
+        total_lines=total,
+        estimated_total=estimated,
+        truncated_bytes=truncated,
+        more_after=False,
+    )
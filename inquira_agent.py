@@ -4,7 +4,7 @@ import os
 os.environ["GRPC_DNS_RESOLVER"] = "native"
 
 from pydantic import BaseModel, Field
-from langchain.chat_models import init_chat_model
+from langchain_core.language_models import BaseChatModel
 from langchain_core.messages import AnyMessage, HumanMessage, AIMessage
 from langgraph.graph import add_messages, StateGraph, START, END
 from langchain_core.prompts import (
@@ -13,25 +13,30 @@ from langchain_core.prompts import (
     MessagesPlaceholder,
 )
 from langgraph.graph.state import CompiledStateGraph, Checkpointer
-from langchain_core.runnables import RunnableConfig
+from langchain_core.runnables import Runnable, RunnableConfig, RunnableLambda
 from dotenv import load_dotenv
 
 from typing import Annotated, Any, cast, Mapping
-from collections.abc import Iterator
+from collections.abc import AsyncIterator, Iterator
 
+import asyncio
+import hashlib
 import json
-from pathlib import Path
-
-
-def load_json(filepath: str | Path):
-    with open(filepath, "r") as file:
-        schema = json.load(file)
-
-    return schema
 
+from clients import chat_model
+from response_cache import (
+    ResponseCache,
+    digest,
+    model_identity,
+    response_cache as default_response_cache,
+    response_key,
+)
+from schema_registry import SchemaRegistry, render_schema, schema_registry
 
 load_dotenv()
 
+DEFAULT_SCHEMA_PATH = "deliveries_schema.json"
+
 
 class MetaData(BaseModel):
     is_safe: bool | None = Field(
@@ -69,8 +74,9 @@ class State(BaseModel):
     metadata: Annotated[MetaData, merge_metadata] = Field(default=MetaData())
     plan: str | None = Field(default=None)
     code: str | None = Field(default=None)
-    active_schema: dict[str, Any] | None = Field(
-        default=load_json("deliveries_schema.json")
+    schema_path: str | None = Field(
+        default=DEFAULT_SCHEMA_PATH,
+        description="path of the active schema, resolved through the schema registry",
     )
     current_code: str = Field(
         default="", description="current code which can provide LLM more context"
@@ -79,7 +85,7 @@ class State(BaseModel):
 
 class InputSchema(BaseModel):
     messages: Annotated[list[AnyMessage], add_messages]
-    active_schema: dict[str, Any] | None = Field(default=None)
+    schema_path: str | None = Field(default=None)
     current_code: str = Field(
         default="", description="current code which can provide LLM more context"
     )
@@ -92,34 +98,272 @@ class OutputSchema(BaseModel):
     code: str | None = Field(default=None)
 
 
+class IsRelevant(BaseModel):
+    is_relevant: bool | None = Field(
+        default=None,
+        description="if the question asked is relevant to the active schema",
+    )
+    relevancy_reasoning: str | None = Field(default=None)
+
+
+class IsSafe(BaseModel):
+    is_safe: bool | None = Field(
+        default=None,
+        description="if the question asked is not malicious or it cannot corrupt data",
+    )
+    safety_reasoning: str | None = Field(default=None)
+
+
+class RequireCode(BaseModel):
+    require_code: bool | None
+
+
+class Classification(BaseModel):
+    is_safe: bool | None = Field(
+        default=None,
+        description="if the question asked is not malicious or it cannot corrupt data",
+    )
+    safety_reasoning: str | None = Field(default=None)
+    is_relevant: bool | None = Field(
+        default=None,
+        description="if the question asked is relevant to the active schema",
+    )
+    relevancy_reasoning: str | None = Field(default=None)
+    require_code: bool | None = Field(
+        default=None,
+        description="if answering the question requires writing code against the schema",
+    )
+
+
+class Plan(BaseModel):
+    plan: str | None
+
+
+class Code(BaseModel):
+    code: str | None
+
+
+# node name -> (system prompt file, template variables)
+PROMPT_FILES: dict[str, tuple[str, list[str]]] = {
+    "check_relevancy": ("prompts/is_relevant_prompt.yaml", ["schema"]),
+    "check_safety": ("prompts/is_safe_prompt.yaml", []),
+    "require_code": ("prompts/require_code_prompt.yaml", ["schema"]),
+    "classify": ("prompts/classify_prompt.yaml", ["schema"]),
+    "create_plan": ("prompts/create_plan_prompt.yaml", ["schema", "current_code"]),
+    "code_generator": ("prompts/code_prompt.yaml", ["plan", "current_code"]),
+    "noncode_generator": ("prompts/noncode_prompt.yaml", ["schema", "current_code"]),
+}
+
+# nodes that get the retrieved subset of columns when schema_top_k is set
+PRUNED_SCHEMA_NODES = {"require_code", "create_plan"}
+
+# node name -> structured output of its model call; other nodes get plain text
+STRUCTURED_OUTPUTS: dict[str, type[BaseModel]] = {
+    "check_relevancy": IsRelevant,
+    "check_safety": IsSafe,
+    "require_code": RequireCode,
+    "classify": Classification,
+    "create_plan": Plan,
+    "code_generator": Code,
+}
+
+# routing nodes whose structured output can be served from a ResponseCache
+CACHED_NODES = {"check_safety", "check_relevancy", "require_code", "classify"}
+
+
 class InquiraAgent:
-    def __init__(self) -> None:
-        self.gemini_lite = init_chat_model("google_genai:gemini-2.5-flash-lite")
-        self.gemini = init_chat_model("google_genai:gemini-2.5-flash")
+    def __init__(
+        self,
+        gemini_lite: BaseChatModel | None = None,
+        gemini: BaseChatModel | None = None,
+        schemas: SchemaRegistry | None = None,
+        schema_top_k: int | None = None,
+        response_cache: ResponseCache | None = None,
+    ) -> None:
+        self.schemas = schemas or schema_registry
+        # when set, create_plan and require_code only see key columns plus the
+        # top-k columns retrieved for the question
+        self.schema_top_k = schema_top_k
+        # default clients are created on the first model call and shared by
+        # every agent in the process, see clients.py
+        self._gemini_lite = gemini_lite
+        self._gemini = gemini
         self.counter = 0
 
-    def check_relevancy(self, state: State) -> dict[str, Any]:
-        class IsRelevant(BaseModel):
-            is_relevant: bool | None = Field(
-                default=None,
-                description="if the question asked is relevant to the active schema",
+        # model side of every chain, wrapped once on first use
+        self._chain_models: dict[str, Runnable] = {}
+        # node name -> (prompt file mtime, prompt, hash of the prompt file)
+        self._prompts: dict[str, tuple[int, ChatPromptTemplate, str]] = {}
+        # node name -> (prompt file mtime, chain)
+        self._chains: dict[str, tuple[int, Runnable]] = {}
+        self._general_purpose_chain: Runnable | None = None
+
+        # opt-in: routing decisions for a prompt seen before skip the model
+        self.response_cache = response_cache
+        self._model_id: str | None = None
+        self._output_schemas = {
+            name: digest(
+                json.dumps(STRUCTURED_OUTPUTS[name].model_json_schema(), sort_keys=True)
             )
-            relevancy_reasoning: str | None = Field(default=None)
+            for name in CACHED_NODES
+        }
+
+    @property
+    def gemini_lite(self) -> BaseChatModel:
+        if self._gemini_lite is None:
+            self._gemini_lite = chat_model("google_genai:gemini-2.5-flash-lite")
+        return self._gemini_lite
+
+    @property
+    def gemini(self) -> BaseChatModel:
+        if self._gemini is None:
+            self._gemini = chat_model("google_genai:gemini-2.5-flash")
+        return self._gemini
+
+    def _chain_model(self, name: str) -> Runnable:
+        model = self._chain_models.get(name)
+        if model is None:
+            schema = STRUCTURED_OUTPUTS.get(name)
+            if schema is None:
+                model = self.gemini
+            else:
+                model = self.gemini_lite.with_structured_output(schema)
+            self._chain_models[name] = model
+        return model
+
+    def _prompt(self, name: str) -> tuple[int, ChatPromptTemplate, str]:
+        """
+        Return (mtime, prompt, version) for a node's prompt file.
+
+        The file is only re-read when its mtime changes, so edits to the
+        YAML are picked up without a restart.
+        """
+        template_file, input_variables = PROMPT_FILES[name]
+        mtime = os.stat(template_file).st_mtime_ns
+
+        cached = self._prompts.get(name)
+        if cached is not None and cached[0] == mtime:
+            return cached
 
         system_prompt_template = SystemMessagePromptTemplate.from_template_file(
-            "prompts/is_relevant_prompt.yaml", input_variables=["schema"]
+            template_file, input_variables=input_variables
         )
         prompt = ChatPromptTemplate.from_messages(
             [system_prompt_template, MessagesPlaceholder("messages")]
         )
+        with open(template_file, "rb") as f:
+            version = hashlib.sha256(f.read()).hexdigest()
+        self._prompts[name] = (mtime, prompt, version)
+        return self._prompts[name]
+
+    def _chain(self, name: str) -> Runnable:
+        """Return the prompt | model chain for a node, rebuilt when its prompt changes."""
+        if name == "general_purpose":
+            if self._general_purpose_chain is None:
+                general_purpose_prompt = ChatPromptTemplate.from_messages(
+                    [
+                        """You are an helpful assistant, answer the question on less than 3 lines.""",
+                        MessagesPlaceholder("messages"),
+                    ]
+                )
+                self._general_purpose_chain = general_purpose_prompt | self.gemini
+            return self._general_purpose_chain
+
+        mtime, prompt, _ = self._prompt(name)
+        cached = self._chains.get(name)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+        chain = prompt | self._chain_model(name)
+        self._chains[name] = (mtime, chain)
+        return chain
+
+    def _schema(self, state: State, prune: bool = False) -> str | None:
+        """
+        Compact, cached rendering of the state's active schema.
+
+        With `prune=True` and `schema_top_k` set, columns are first narrowed
+        down to the ones retrieved for the latest question.
+        """
+        if state.schema_path is None:
+            return None
+        entry = self.schemas.get(state.schema_path)
+        if not prune or self.schema_top_k is None or entry.index is None:
+            return entry.rendered
+
+        question = next(
+            (
+                _stringify_content(m.content)
+                for m in reversed(state.messages)
+                if isinstance(m, HumanMessage)
+            ),
+            "",
+        )
+        pruned = entry.index.prune(entry.data, question, self.schema_top_k)
+        return render_schema(pruned)
+
+    def _inputs(self, name: str, state: State) -> dict[str, Any]:
+        """Prompt variables for a node, derived from its entry in PROMPT_FILES."""
+        _, variables = PROMPT_FILES.get(name, (None, []))
+        inputs: dict[str, Any] = {"messages": state.messages}
+        if "schema" in variables:
+            inputs["schema"] = self._schema(state, prune=name in PRUNED_SCHEMA_NODES)
+        if "plan" in variables:
+            inputs["plan"] = state.plan
+        if "current_code" in variables:
+            inputs["current_code"] = state.current_code
+        return inputs
+
+    def _cache_key(self, name: str, inputs: dict[str, Any]) -> str | None:
+        if self.response_cache is None or name not in CACHED_NODES:
+            return None
+        if self._model_id is None:
+            self._model_id = model_identity(self.gemini_lite)
+        return response_key(
+            self._model_id,
+            self._prompt(name)[2],
+            self._output_schemas[name],
+            inputs,
+        )
 
-        chain = prompt | self.gemini_lite.with_structured_output(IsRelevant)
-
-        response = chain.invoke(
-            {"messages": state.messages, "schema": state.active_schema}
+    def _cached(self, name: str, key: str | None) -> Any:
+        if key is None:
+            return None
+        cached = self.response_cache.get(name, key)
+        return None if cached is None else STRUCTURED_OUTPUTS[name].model_validate(cached)
+
+    def _store(self, name: str, key: str | None, response: Any) -> None:
+        if key is not None and isinstance(response, BaseModel):
+            self.response_cache.put(name, key, response.model_dump())
+
+    def _run(self, name: str, state: State) -> Any:
+        chain = self._chain(name)
+        inputs = self._inputs(name, state)
+        key = self._cache_key(name, inputs)
+        response = self._cached(name, key)
+        if response is None:
+            response = chain.invoke(inputs)
+            self._store(name, key, response)
+        return response
+
+    async def _arun(self, name: str, state: State) -> Any:
+        chain = self._chain(name)
+        inputs = self._inputs(name, state)
+        key = self._cache_key(name, inputs)
+        # the cache reads and writes sqlite, which would block the loop
+        response = await asyncio.to_thread(self._cached, name, key)
+        if response is None:
+            response = await chain.ainvoke(inputs)
+            await asyncio.to_thread(self._store, name, key, response)
+        return response
+
+    def _node(self, name: str) -> Runnable:
+        """Wrap a node so the graph uses `name` under invoke and `a<name>` under ainvoke."""
+        return RunnableLambda(
+            getattr(self, name), afunc=getattr(self, f"a{name}"), name=name
         )
-        response = cast(IsRelevant, response)
 
+    @staticmethod
+    def _relevancy_update(response: IsRelevant) -> dict[str, Any]:
         return {
             "metadata": {
                 "is_relevant": response.is_relevant,
@@ -128,26 +372,8 @@ class InquiraAgent:
             "messages": [AIMessage(content=response.relevancy_reasoning)],
         }
 
-    def check_safety(self, state: State) -> dict[str, Any]:
-        class IsSafe(BaseModel):
-            is_safe: bool | None = Field(
-                default=None,
-                description="if the question asked is not malicious or it cannot corrupt data",
-            )
-            safety_reasoning: str | None = Field(default=None)
-
-        system_prompt_template = SystemMessagePromptTemplate.from_template_file(
-            "prompts/is_safe_prompt.yaml", input_variables=[]
-        )
-        prompt = ChatPromptTemplate.from_messages(
-            [system_prompt_template, MessagesPlaceholder("messages")]
-        )
-
-        chain = prompt | self.gemini_lite.with_structured_output(IsSafe)
-
-        response = chain.invoke({"messages": state.messages})
-        response = cast(IsSafe, response)
-
+    @staticmethod
+    def _safety_update(response: IsSafe) -> dict[str, Any]:
         return {
             "metadata": {
                 "is_safe": response.is_safe,
@@ -156,111 +382,86 @@ class InquiraAgent:
             "messages": [AIMessage(content=response.safety_reasoning)],
         }
 
-    def require_code(self, state: State) -> dict[str, Any]:
-        class RequireCode(BaseModel):
-            require_code: bool | None
-
-        system_prompt_template = SystemMessagePromptTemplate.from_template_file(
-            "prompts/require_code_prompt.yaml", input_variables=["schema"]
-        )
-        prompt = ChatPromptTemplate.from_messages(
-            [system_prompt_template, MessagesPlaceholder("messages")]
-        )
-
-        chain = prompt | self.gemini_lite.with_structured_output(RequireCode)
-
-        response = chain.invoke(
-            {"messages": state.messages, "schema": state.active_schema}
-        )
-        response = cast(RequireCode, response)
-
+    @staticmethod
+    def _require_code_update(response: RequireCode) -> dict[str, Any]:
         return {
             "metadata": {
-                "require_safe": response.require_code,
+                "require_code": response.require_code,
             }
         }
 
-    def create_plan(self, state: State) -> dict[str, Any]:
-        class Plan(BaseModel):
-            plan: str | None
+    @staticmethod
+    def _classify_update(response: Classification) -> dict[str, Any]:
+        return {
+            "metadata": response.model_dump(),
+            "messages": [
+                AIMessage(content=response.safety_reasoning),
+                AIMessage(content=response.relevancy_reasoning),
+            ],
+        }
 
-        system_prompt_template = SystemMessagePromptTemplate.from_template_file(
-            "prompts/create_plan_prompt.yaml",
-            input_variables=["schema", "current_code"],
-        )
-        prompt = ChatPromptTemplate.from_messages(
-            [system_prompt_template, MessagesPlaceholder("messages")]
-        )
+    def check_relevancy(self, state: State) -> dict[str, Any]:
+        response = cast(IsRelevant, self._run("check_relevancy", state))
+        return self._relevancy_update(response)
 
-        chain = prompt | self.gemini_lite.with_structured_output(Plan)
+    async def acheck_relevancy(self, state: State) -> dict[str, Any]:
+        response = cast(IsRelevant, await self._arun("check_relevancy", state))
+        return self._relevancy_update(response)
 
-        response = chain.invoke(
-            {
-                "messages": state.messages,
-                "schema": state.active_schema,
-                "current_code": state.current_code,
-            }
-        )
-        response = cast(Plan, response)
+    def check_safety(self, state: State) -> dict[str, Any]:
+        response = cast(IsSafe, self._run("check_safety", state))
+        return self._safety_update(response)
 
-        return {"plan": response.plan}
+    async def acheck_safety(self, state: State) -> dict[str, Any]:
+        response = cast(IsSafe, await self._arun("check_safety", state))
+        return self._safety_update(response)
 
-    def code_generator(self, state: State) -> dict[str, Any]:
-        class Code(BaseModel):
-            code: str | None
+    def require_code(self, state: State) -> dict[str, Any]:
+        response = cast(RequireCode, self._run("require_code", state))
+        return self._require_code_update(response)
 
-        system_prompt_template = SystemMessagePromptTemplate.from_template_file(
-            "prompts/code_prompt.yaml",
-            input_variables=["plan", "current_code"],
-        )
-        prompt = ChatPromptTemplate.from_messages(
-            [system_prompt_template, MessagesPlaceholder("messages")]
-        )
+    async def arequire_code(self, state: State) -> dict[str, Any]:
+        response = cast(RequireCode, await self._arun("require_code", state))
+        return self._require_code_update(response)
 
-        chain = prompt | self.gemini_lite.with_structured_output(Code)
+    def classify(self, state: State) -> dict[str, Any]:
+        response = cast(Classification, self._run("classify", state))
+        return self._classify_update(response)
 
-        response = chain.invoke(
-            {
-                "messages": state.messages,
-                "plan": state.plan,
-                "current_code": state.current_code,
-            }
-        )
-        response = cast(Code, response)
+    async def aclassify(self, state: State) -> dict[str, Any]:
+        response = cast(Classification, await self._arun("classify", state))
+        return self._classify_update(response)
 
-        return {"current_code": response.code}
+    def create_plan(self, state: State) -> dict[str, Any]:
+        response = cast(Plan, self._run("create_plan", state))
+        return {"plan": response.plan}
 
-    def noncode_generator(self, state: State) -> dict[str, Any]:
-        system_prompt_template = SystemMessagePromptTemplate.from_template_file(
-            "prompts/noncode_prompt.yaml",
-            input_variables=["schema", "current_code"],
-        )
-        prompt = ChatPromptTemplate.from_messages(
-            [system_prompt_template, MessagesPlaceholder("messages")]
-        )
+    async def acreate_plan(self, state: State) -> dict[str, Any]:
+        response = cast(Plan, await self._arun("create_plan", state))
+        return {"plan": response.plan}
 
-        chain = prompt | self.gemini
+    def code_generator(self, state: State) -> dict[str, Any]:
+        response = cast(Code, self._run("code_generator", state))
+        return {"current_code": response.code}
 
-        response = chain.invoke(
-            {
-                "messages": state.messages,
-                "schema": state.active_schema,
-                "current_code": state.current_code,
-            }
-        )
+    async def acode_generator(self, state: State) -> dict[str, Any]:
+        response = cast(Code, await self._arun("code_generator", state))
+        return {"current_code": response.code}
 
+    def noncode_generator(self, state: State) -> dict[str, Any]:
+        response = self._run("noncode_generator", state)
         return {"messages": [AIMessage(content=response.content)]}
 
-    def general_purpose(self, state: State) -> dict[str, Any]:
-        system_prompt_template = """You are an helpful assistant, answer the question on less than 3 lines."""
-        prompt = ChatPromptTemplate.from_messages(
-            [system_prompt_template, MessagesPlaceholder("messages")]
-        )
-
-        chain = prompt | self.gemini
+    async def anoncode_generator(self, state: State) -> dict[str, Any]:
+        response = await self._arun("noncode_generator", state)
+        return {"messages": [AIMessage(content=response.content)]}
 
-        response = chain.invoke({"messages": state.messages})
+    def general_purpose(self, state: State) -> dict[str, Any]:
+        response = self._run("general_purpose", state)
+        return {"messages": [AIMessage(content=response.content)]}
 
+    async def ageneral_purpose(self, state: State) -> dict[str, Any]:
+        response = await self._arun("general_purpose", state)
         return {"messages": [AIMessage(content=response.content)]}
 
     def unsafe_rejector(self, state: State) -> dict[str, Any]:
@@ -272,75 +473,144 @@ class InquiraAgent:
             ]
         }
 
-    def compile(self, checkpointer=None) -> CompiledStateGraph:
+    def classifier_router(self, state: State) -> dict[str, Any]:
+        # join point for the fan-out mode, routing happens on its outgoing edge
+        return {}
+
+    def compile(
+        self,
+        checkpointer=None,
+        parallel_classifiers: bool = False,
+        fused_classifier: bool = False,
+    ) -> CompiledStateGraph:
+        """
+        Build the Inquira graph.
+
+        By default the classifiers run one after another (safety, then
+        relevancy, then require_code). With `parallel_classifiers=True` all
+        three run in the same superstep and join in `classifier_router`, which
+        applies the same safe/relevant/code decisions in that order. With
+        `fused_classifier=True` a single `classify` call answers all three
+        and feeds the same `classifier_router`.
+        """
+        if parallel_classifiers and fused_classifier:
+            raise ValueError(
+                "parallel_classifiers and fused_classifier are mutually exclusive"
+            )
+
+        # read every prompt up front so the first request doesn't pay for it;
+        # the models are attached on the first call, so compiling never loads
+        # a provider SDK
+        for name in PROMPT_FILES:
+            self._prompt(name)
+
         builder = StateGraph(
             State, input_schema=InputSchema, output_schema=OutputSchema
         )
 
-        builder.add_node("check_relevancy", self.check_relevancy)
-        builder.add_node("check_safety", self.check_safety)
-        builder.add_node("require_code", self.require_code)
-        builder.add_node("create_plan", self.create_plan)
-        builder.add_node("code_generator", self.code_generator)
-        builder.add_node("noncode_generator", self.noncode_generator)
-        builder.add_node("general_purpose", self.general_purpose)
+        # LLM nodes carry both a sync and an async implementation, so the same
+        # compiled graph serves invoke/stream and ainvoke/astream
+        builder.add_node("check_relevancy", self._node("check_relevancy"))
+        builder.add_node("check_safety", self._node("check_safety"))
+        builder.add_node("require_code", self._node("require_code"))
+        builder.add_node("create_plan", self._node("create_plan"))
+        builder.add_node("code_generator", self._node("code_generator"))
+        builder.add_node("noncode_generator", self._node("noncode_generator"))
+        builder.add_node("general_purpose", self._node("general_purpose"))
         builder.add_node("unsafe_rejector", self.unsafe_rejector)
 
-        builder.add_edge(START, "check_safety")
-
         def safety_router(state: State):
             if state.metadata.is_safe:
                 return "safe"
             else:
                 return "unsafe"
 
-        builder.add_conditional_edges(
-            "check_safety",
-            safety_router,
-            {"safe": "check_relevancy", "unsafe": "unsafe_rejector"},
-        )
-
         def relevancy_router(state: State):
             if state.metadata.is_relevant:
                 return "relevant"
             else:
                 return "irrelevant"
 
-        builder.add_conditional_edges(
-            "check_relevancy",
-            relevancy_router,
-            {"relevant": "require_code", "irrelevant": "general_purpose"},
-        )
-
         def code_router(state: State):
             if state.metadata.require_code:
                 return "yes"
             else:
                 return "no"
 
-        builder.add_conditional_edges(
-            "require_code",
-            code_router,
-            {"yes": "create_plan", "no": "noncode_generator"},
-        )
+        def combined_router(state: State):
+            if safety_router(state) == "unsafe":
+                return "unsafe"
+            if relevancy_router(state) == "irrelevant":
+                return "irrelevant"
+            return code_router(state)
+
+        if parallel_classifiers or fused_classifier:
+            builder.add_node("classifier_router", self.classifier_router)
+
+            if fused_classifier:
+                builder.add_node("classify", self._node("classify"))
+                builder.add_edge(START, "classify")
+                builder.add_edge("classify", "classifier_router")
+            else:
+                classifiers = ["check_safety", "check_relevancy", "require_code"]
+                for classifier in classifiers:
+                    builder.add_edge(START, classifier)
+                builder.add_edge(classifiers, "classifier_router")
+
+            builder.add_conditional_edges(
+                "classifier_router",
+                combined_router,
+                {
+                    "unsafe": "unsafe_rejector",
+                    "irrelevant": "general_purpose",
+                    "yes": "create_plan",
+                    "no": "noncode_generator",
+                },
+            )
+        else:
+            builder.add_edge(START, "check_safety")
+            builder.add_conditional_edges(
+                "check_safety",
+                safety_router,
+                {"safe": "check_relevancy", "unsafe": "unsafe_rejector"},
+            )
+            builder.add_conditional_edges(
+                "check_relevancy",
+                relevancy_router,
+                {"relevant": "require_code", "irrelevant": "general_purpose"},
+            )
+            builder.add_conditional_edges(
+                "require_code",
+                code_router,
+                {"yes": "create_plan", "no": "noncode_generator"},
+            )
 
         builder.add_edge("create_plan", "code_generator")
 
         builder.add_edge("code_generator", END)
+        builder.add_edge("noncode_generator", END)
         builder.add_edge("general_purpose", END)
         builder.add_edge("unsafe_rejector", END)
 
-        # builder.add_edge(["check_relevancy", "check_safety"], "router")
-
-        # builder.add_edge("check_relevancy", END)
-        # builder.add_edge("check_safety", END)
-
         return builder.compile(checkpointer=checkpointer)
 
 
-def build_graph(checkpointer: Checkpointer) -> CompiledStateGraph:
-    graph = InquiraAgent()
-    agent = graph.compile(checkpointer=checkpointer)
+def build_graph(
+    checkpointer: Checkpointer,
+    parallel_classifiers: bool = False,
+    fused_classifier: bool = False,
+    schema_top_k: int | None = None,
+    cache_responses: bool = False,
+) -> CompiledStateGraph:
+    graph = InquiraAgent(
+        schema_top_k=schema_top_k,
+        response_cache=default_response_cache if cache_responses else None,
+    )
+    agent = graph.compile(
+        checkpointer=checkpointer,
+        parallel_classifiers=parallel_classifiers,
+        fused_classifier=fused_classifier,
+    )
     return agent
 
 
@@ -353,10 +623,11 @@ def execute(
     _, _, schema_path = thread_id.partition(":")
 
     if schema_path:
-        active_schema = load_json(schema_path)
+        # parse (or reuse) the schema up front so a bad path fails before any LLM call
+        schema_registry.get(schema_path)
         state = InputSchema(
             messages=[HumanMessage(content=user_query)],
-            active_schema=active_schema,
+            schema_path=schema_path,
             current_code="",
         )
 
@@ -374,16 +645,58 @@ def stream_nodes(
 ) -> Iterator:
     cfg: RunnableConfig = {"configurable": {"thread_id": thread_id}}
     _, _, schema_path = thread_id.partition(":")
+    schema_registry.get(schema_path)
     init_state = InputSchema(
         messages=[HumanMessage(content=user_query)],
-        active_schema=load_json(schema_path),
+        schema_path=schema_path,
         current_code="",
     )
     for step in agent.stream(init_state, config=cfg):
         for node_name, payload in step.items():
             # print("STREAM:", node_name, "keys:", list(payload.keys()))
             # print(payload["messages"])
-            yield node_name, payload
+            # join nodes like classifier_router write nothing and stream None
+            yield node_name, payload or {}
+
+
+async def aexecute(
+    agent: CompiledStateGraph,
+    user_query: str,
+    thread_id: str = "adarsh9780:deliveries_schema.json",
+):
+    """Async `execute`; compile the agent with an AsyncSqliteSaver to persist threads."""
+    cfg: RunnableConfig = {"configurable": {"thread_id": thread_id}}
+    _, _, schema_path = thread_id.partition(":")
+
+    if schema_path:
+        schema_registry.get(schema_path)
+        state = InputSchema(
+            messages=[HumanMessage(content=user_query)],
+            schema_path=schema_path,
+            current_code="",
+        )
+
+        return await agent.ainvoke(state, config=cfg)
+    else:
+        raise ValueError(f"no active schema is provided. current thread: {thread_id}")
+
+
+async def astream_nodes(
+    agent: CompiledStateGraph,
+    user_query: str,
+    thread_id="adarsh9780:deliveries_schema.json",
+) -> AsyncIterator:
+    cfg: RunnableConfig = {"configurable": {"thread_id": thread_id}}
+    _, _, schema_path = thread_id.partition(":")
+    schema_registry.get(schema_path)
+    init_state = InputSchema(
+        messages=[HumanMessage(content=user_query)],
+        schema_path=schema_path,
+        current_code="",
+    )
+    async for step in agent.astream(init_state, config=cfg):
+        for node_name, payload in step.items():
+            yield node_name, payload or {}
 
 
 def _stringify_content(content: Any) -> str:
@@ -411,23 +724,26 @@ def convert_ai_messages_to_buffer_string(messages: list[AnyMessage]) -> str:
     return "\n".join(reversed(msgs))
 
 
-if __name__ == "__main__":
-    from langgraph.checkpoint.sqlite import SqliteSaver
-    from langchain_core.runnables import RunnableConfig
+async def repl(db_path: str = "test.db") -> None:
+    from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
 
-    with SqliteSaver.from_conn_string("test.db") as memory:
-        agent = build_graph(checkpointer=None)
+    async with AsyncSqliteSaver.from_conn_string(db_path) as memory:
+        agent = build_graph(checkpointer=memory)
 
-    while True:
-        user_query = input("You: ")
-        if user_query in ("exit", "quit", "kill", "q", "qut", "qt", "ext"):
-            break
+        while True:
+            user_query = await asyncio.to_thread(input, "You: ")
+            if user_query in ("exit", "quit", "kill", "q", "qut", "qt", "ext"):
+                break
+
+            async for node_name, payload in astream_nodes(agent, user_query):
+                if "messages" in payload:
+                    text = convert_ai_messages_to_buffer_string(payload["messages"])
+                    print(f"{node_name}: {text}")
+                if "plan" in payload:
+                    print(f"{node_name} plan:\n{payload['plan']}")
+                if "code" in payload:
+                    print(f"{node_name} plan:\n{payload['code']}")
 
-        for node_name, payload in stream_nodes(agent, user_query):
-            if "messages" in payload:
-                text = convert_ai_messages_to_buffer_string(payload["messages"])
-                print(f"{node_name}: {text}")
-            if "plan" in payload:
-                print(f"{node_name} plan:\n{payload['plan']}")
-            if "code" in payload:
-                print(f"{node_name} plan:\n{payload['code']}")
+
+if __name__ == "__main__":
+    asyncio.run(repl())
@@ -3,145 +3,230 @@ import sqlite3
 from typing import Annotated, TypedDict
 
 from dotenv import load_dotenv
-from langchain.chat_models import init_chat_model
-from langchain_core.messages import AnyMessage, HumanMessage, AIMessage, SystemMessage
-from langgraph.checkpoint.sqlite import SqliteSaver
-from langgraph.graph import START, StateGraph
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AnyMessage, HumanMessage, AIMessage
+from langgraph.graph import END, START, StateGraph
 from langgraph.graph.message import add_messages, RemoveMessage
 from langgraph.graph.state import Checkpointer, CompiledStateGraph
-from langgraph.prebuilt import ToolNode, tools_condition
-from langchain_core.runnables import RunnableConfig
+from langgraph.prebuilt import tools_condition
+from langchain_core.runnables import Runnable, RunnableConfig, RunnableLambda
 
 from tools import (
     get_current_datetime,
+    get_search_result,
     get_system_info,
     list_files,
     read_file,
     search_web,
 )
 from prompts import LIBRARIAN_SYSTEM_PROMPT
+from checkpointers import DeltaSqliteSaver
+from summarization import BackgroundSummarizer, clamp_summary, summary_prompt
+from context_window import ContextWindow
+from tool_runner import parallel_tool_node
+from preferences import render_preferences
+from prompt_prefix import ContextCache, PrefixTracker, assemble
+from clients import chat_model
 
 load_dotenv()
-api_key = os.environ["GOOGLE_API_KEY"]
 
 model = "gemini-2.5-flash-lite"
-tools = [get_current_datetime, list_files, read_file, get_system_info, search_web]
-
-client = init_chat_model(
-    model="google_genai:gemini-3-flash-preview",  # or gpt-4.1, claude-sonnet-4-5-20250929
-    api_key=api_key,
-    temperature=0.7,  # Gemini 3.0+ defaults to 1.0
-    max_tokens=None,
-    timeout=None,
-    max_retries=2,
-    # other params...
-)
+tools = [
+    get_current_datetime,
+    list_files,
+    read_file,
+    get_system_info,
+    search_web,
+    get_search_result,
+]
+
+# built on the first model call, not at import, so importing this module (and
+# build_graph) doesn't load the Gemini SDK or need GOOGLE_API_KEY
+client: BaseChatModel | None = None
+model_with_tools: Runnable | None = None
+
+
+def get_client() -> BaseChatModel:
+    global client
+    if client is None:
+        client = chat_model(
+            "google_genai:gemini-3-flash-preview",  # or gpt-4.1, claude-sonnet-4-5-20250929
+            api_key=os.environ["GOOGLE_API_KEY"],
+            temperature=0.7,  # Gemini 3.0+ defaults to 1.0
+            max_tokens=None,
+            timeout=None,
+            max_retries=2,
+            # other params...
+        )
+    return client
+
+
+def get_model_with_tools() -> Runnable:
+    global model_with_tools
+    if model_with_tools is None:
+        model_with_tools = get_client().bind_tools(tools)
+    return model_with_tools
+
+
+# this graph keeps no preferences, so the system prompt is the same on every
+# call and the start of every prompt can be served from the provider's cache
+SYSTEM_PROMPT = LIBRARIAN_SYSTEM_PROMPT.format(user_preferences=render_preferences({}))
+prefix_tracker = PrefixTracker()
+
+# opt-in: keep the system prompt and tool declarations in Gemini's explicit
+# context cache instead of sending them with every request
+context_cache: ContextCache | None = None
+
+
+def get_context_cache() -> ContextCache | None:
+    global context_cache
+    if context_cache is None and os.environ.get("GEMINI_CONTEXT_CACHE"):
+        context_cache = ContextCache(
+            get_client().model, SYSTEM_PROMPT, tools, api_key=os.environ["GOOGLE_API_KEY"]
+        )
+        # created and refreshed on a background thread, never on a request
+        context_cache.start()
+    return context_cache
+
 
-model_with_tools = client.bind_tools(tools)
+# summarize once the conversation is past ~6k tokens, keeping the last ~2k
+context_window = ContextWindow()
 
 
 def chat(user_query: list[AnyMessage] | str) -> AnyMessage:
-    response = model_with_tools.invoke(user_query)
+    cache = get_context_cache()
+    cache_name = cache.name() if cache is not None else None
+    if cache_name is not None:
+        # the cache already holds the system prompt and tools, and Gemini
+        # rejects a request that sends them again
+        return get_client().invoke(user_query[1:], cached_content=cache_name)
+    response = get_model_with_tools().invoke(user_query)
     return response
 
 
-def create_summary(messages: list[AnyMessage]) -> AnyMessage:
-    prompt = f"""
-    Summarize the following conversation. Make sure redundancy is removed.
-    {messages}
-    """
-    response = chat(prompt)
+async def achat(user_query: list[AnyMessage] | str) -> AnyMessage:
+    cache = get_context_cache()
+    cache_name = cache.name() if cache is not None else None
+    if cache_name is not None:
+        return await get_client().ainvoke(user_query[1:], cached_content=cache_name)
+    response = await get_model_with_tools().ainvoke(user_query)
     return response
 
 
-def get_safe_trim_index(messages: list[AnyMessage], keep_last_n: int = 5) -> int:
-    """
-    Find the safe index to start keeping messages from.
-    Ensures we start with a HumanMessage and don't break tool chains.
-    """
-    # We want to keep at least the last `keep_last_n` messages
-    candidate_index = len(messages) - keep_last_n
+def create_summary(existing_summary: str, messages: list[AnyMessage]) -> AnyMessage:
+    # plain client: the summary never needs tools, and binding them would
+    # send every tool schema along with the transcript
+    response = get_client().invoke(summary_prompt(existing_summary, messages))
+    return response
+
 
-    if candidate_index <= 0:
-        return 0  # Not enough to trim
+async def acreate_summary(
+    existing_summary: str, messages: list[AnyMessage]
+) -> AnyMessage:
+    response = await get_client().ainvoke(summary_prompt(existing_summary, messages))
+    return response
 
-    # Walk forward until we find a HumanMessage
-    for i in range(candidate_index, len(messages)):
-        if isinstance(messages[i], HumanMessage):
-            return i  # Safe to trim everything before this
 
-    # If no HumanMessage found in the window, don't trim at all
-    return 0
+# summaries are computed after the reply is sent and applied on the next turn
+summarizer = BackgroundSummarizer(create_summary, acreate_summary)
 
 
 class State(TypedDict, total=False):
     messages: Annotated[list[AnyMessage], add_messages]
-    conversation_length: int
     summary: str
 
 
-def check_len_node(state: State) -> State:
-    cl = len(state.get("messages", []))
-    return {"conversation_length": cl}
+def echo_prompt(state: State, config: RunnableConfig) -> list[AnyMessage]:
+    # static system prompt, then the summary, then the history: each prompt
+    # extends the thread's previous one until a summary is applied
+    prompt = assemble(SYSTEM_PROMPT, state.get("messages", []), state.get("summary", ""))
+    prefix_tracker.observe(config["configurable"].get("thread_id"), prompt)
+    return prompt
 
 
-def echo(state: State) -> State:
-    system_msg = SystemMessage(content=LIBRARIAN_SYSTEM_PROMPT)
-    summary = state.get("summary", "")
-    if summary:
-        messages = [system_msg, SystemMessage(content=summary)] + state.get(
-            "messages", []
-        )
-        response = chat(messages)
-    else:
-        messages = [system_msg] + state.get("messages", [])
-        response = chat(messages)
+def echo(state: State, config: RunnableConfig) -> State:
+    response = chat(echo_prompt(state, config))
+    prefix_tracker.observe_usage(response)
     return {"messages": [response]}
 
 
-def summarize(state: State) -> State:
+async def aecho(state: State, config: RunnableConfig) -> State:
+    response = await achat(echo_prompt(state, config))
+    prefix_tracker.observe_usage(response)
+    return {"messages": [response]}
+
+
+def messages_to_summarize(state: State) -> list[AnyMessage]:
+    """Messages that summarize should fold into the summary, empty if none."""
     messages = state.get("messages", [])
-    existing_summary = state.get("summary", "")
-    safe_index = get_safe_trim_index(messages)
-    if (len(messages) > 10) and (safe_index > 0):
-        messages_to_delete = messages[:safe_index]
-        conversation_to_summarize = [
-            SystemMessage(content=existing_summary)
-        ] + messages_to_delete
-        summary = create_summary(conversation_to_summarize)
-        summary = existing_summary + "\n" + summary.text
-        summary = f"Here is the conversation summary so far: {summary}"
+    if not context_window.over_budget(messages, state.get("summary", "")):
+        return []
+    return messages[: context_window.trim_index(messages)]
+
 
-        # step 2: delete all messages except last n
-        delete_messages = [RemoveMessage(id=m.id) for m in messages_to_delete]
+def summary_update(messages_to_delete: list[AnyMessage], summary: AnyMessage) -> State:
+    # the model rewrites the whole summary each time, so it replaces the old
+    # one instead of being appended to it
+    summary_text = clamp_summary(summary.text)
 
-        return {"messages": delete_messages, "summary": summary}
-    else:
-        return {}  # to make no changes to the state
+    # step 2: delete all messages except last n
+    delete_messages = [RemoveMessage(id=m.id) for m in messages_to_delete]
 
+    return {"messages": delete_messages, "summary": summary_text}
 
-def len_condition(state: State) -> str:
-    if state.get("conversation_length", 0) > 10:
-        return "summarize"
-    return "echo"
+
+def apply_summary(state: State, config: RunnableConfig) -> State:
+    """Fold in the summary the previous turn started, if it has finished."""
+    finished = summarizer.pop_finished(config["configurable"].get("thread_id"))
+    if finished is None:
+        return {}  # not ready (or none running), echo sees the raw window
+
+    summarized, summary = finished
+    # the checkpoint may have been rewound or forked since the job started
+    current_ids = {m.id for m in state.get("messages", [])}
+    if any(m.id not in current_ids for m in summarized):
+        return {}
+    return summary_update(summarized, summary)
+
+
+def summarize(state: State, config: RunnableConfig) -> State:
+    # runs after the reply and only schedules the summary call, so the user
+    # never waits on it
+    thread_id = config["configurable"].get("thread_id")
+    messages_to_delete = messages_to_summarize(state)
+    if thread_id is not None and messages_to_delete:
+        summarizer.submit(thread_id, state.get("summary", ""), messages_to_delete)
+    return {}  # the summary is applied by apply_summary on the next turn
+
+
+async def asummarize(state: State, config: RunnableConfig) -> State:
+    thread_id = config["configurable"].get("thread_id")
+    messages_to_delete = messages_to_summarize(state)
+    if thread_id is not None and messages_to_delete:
+        summarizer.asubmit(thread_id, state.get("summary", ""), messages_to_delete)
+    return {}
 
 
 def build_graph(checkpointer: Checkpointer | None = None) -> CompiledStateGraph:
     builder = StateGraph(State)
 
-    builder.add_node("echo", echo)
-    builder.add_node("check_len", check_len_node)
-    builder.add_node("summarize", summarize)
-    builder.add_node("tools", ToolNode(tools))
+    # echo calls the model, so it gets an async twin for ainvoke/astream;
+    # summarize has one so its job runs as a task on the caller's event loop
+    builder.add_node("apply_summary", apply_summary)
+    builder.add_node("echo", RunnableLambda(echo, afunc=aecho, name="echo"))
+    builder.add_node(
+        "summarize", RunnableLambda(summarize, afunc=asummarize, name="summarize")
+    )
+    # concurrent tool calls with per-tool timeouts, see tool_runner.py
+    builder.add_node("tools", parallel_tool_node(tools))
 
-    builder.add_edge(START, "check_len")
+    builder.add_edge(START, "apply_summary")
+    builder.add_edge("apply_summary", "echo")
     builder.add_conditional_edges(
-        "check_len", len_condition, {"echo": "echo", "summarize": "summarize"}
+        "echo", tools_condition, {"tools": "tools", END: "summarize"}
     )
-
-    builder.add_edge("summarize", "echo")
-    builder.add_conditional_edges("echo", tools_condition)
     builder.add_edge("tools", "echo")
+    builder.add_edge("summarize", END)
 
     return builder.compile(checkpointer=checkpointer)
 
@@ -149,7 +234,8 @@ def build_graph(checkpointer: Checkpointer | None = None) -> CompiledStateGraph:
 if __name__ == "__main__":
     # memory=MemorySaver()
     conn = sqlite3.connect("chat_echo.db", check_same_thread=False)
-    memory = SqliteSaver(conn)
+    # stores each message once instead of once per checkpoint, see checkpointers.py
+    memory = DeltaSqliteSaver(conn)
     config: RunnableConfig = {"configurable": {"thread_id": "OMOMOM"}}
     graph = build_graph(checkpointer=memory)
     while True:
@@ -170,7 +256,7 @@ if __name__ == "__main__":
                 message, metadata = chunk
                 # We only care about the final response from the model, not intermediate tool calls
                 if isinstance(message, AIMessage) and not message.tool_calls:
-                    if metadata.get("langgraph_node") in ["check_len", "summarize"]:
+                    if metadata.get("langgraph_node") in ["apply_summary", "summarize"]:
                         continue
 
                     if message.content:
@@ -186,8 +272,8 @@ if __name__ == "__main__":
             # Handle State Updates (The "Logic" Part)
             elif mode == "updates":
                 for node_name, updates in chunk.items():
-                    if node_name == "summarize":
-                        print("\n[Kautilya is summarizing the conversation]")
+                    if node_name == "apply_summary" and updates:
+                        print("\n[Kautilya summarized the earlier conversation]")
                     # If the AI decided to call a tool
                     if node_name == "echo" and "messages" in updates:
                         last_msg = updates["messages"][-1]
@@ -0,0 +1,251 @@
+"""
+Per-user book preferences, stored outside the conversation.
+
+Preferences are kept in a `PreferenceStore` (SQLite, one row per user,
+preference kind and item), and `echo` reads them back by user id. They
+therefore outlive summarization, are shared by all of a user's threads, and
+never sit in checkpoint state.
+
+Reads are served from memory: each user's preferences and the system prompt
+rendered from them are cached, and the cache is dropped when that user's
+preferences change. Writes from another process show up after a restart.
+
+`PreferenceExtractor` fills the store. Once a turn is answered, the user's
+message is checked against a few keyword cues locally, and only messages
+that look like they state a preference go to a small structured-output
+model. The result is written to the store in the background, in time for
+the next turn. With `PREFERENCE_TOOL=1` the step-17 graph binds the
+`update_user_preferences` tool instead, and the librarian saves preferences
+itself at the cost of an extra model loop.
+"""
+
+import asyncio
+import contextvars
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections.abc import Sequence
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any
+
+from langchain_core.runnables import Runnable, RunnableConfig
+from pydantic import BaseModel, Field
+
+logger = logging.getLogger(__name__)
+
+PREFERENCES_DB = os.environ.get("PREFERENCES_DB", "user_preferences.db")
+KINDS = ("likes", "dislikes")
+
+_PREFERENCE_CUES = re.compile(
+    r"\b(love[sd]?|like[sd]?|enjoy(ed|s)?|adore[sd]?|prefer(red|s)?|favou?rites?"
+    r"|hate[sd]?|dislike[sd]?|can'?t stand|cannot stand|not (a|really a) fan|not into"
+    r"|bored|tired of|avoid|no more|too (slow|long|dark|sad))\b",
+    re.IGNORECASE,
+)
+
+
+class PreferenceUpdate(BaseModel):
+    likes: list[str] = Field(
+        default_factory=list,
+        description="Genres, authors, books, themes or styles the user says they like",
+    )
+    dislikes: list[str] = Field(
+        default_factory=list,
+        description="Genres, authors, books, themes or styles the user says they dislike",
+    )
+
+
+def mentions_preferences(text: str) -> bool:
+    """Cheap local check; only messages that pass it are sent to the model."""
+    return bool(_PREFERENCE_CUES.search(text))
+
+
+def extraction_prompt(message: str, current: dict[str, list[str]]) -> str:
+    return f"""Extract the reading preferences the user states in their message.
+
+Only include what the user says about their own taste, in a few words each.
+Leave out anything they ask about without saying they like or dislike it,
+and anything already recorded below. Return empty lists if there is nothing.
+
+Already recorded:
+{render_preferences(current)}
+
+User message:
+{message}
+"""
+
+
+def user_id_from_config(config: RunnableConfig) -> str:
+    """`user_id` from the run's configurable, else its thread_id."""
+    configurable = config.get("configurable", {})
+    return str(configurable.get("user_id") or configurable.get("thread_id") or "default")
+
+
+def render_preferences(preferences: dict[str, list[str]]) -> str:
+    if not any(preferences.values()):
+        return "None recorded yet."
+    lines = []
+    for kind in KINDS:
+        if preferences.get(kind):
+            lines.append(f"- {kind.capitalize()}: {', '.join(preferences[kind])}")
+    return "\n".join(lines)
+
+
+class PreferenceStore:
+    def __init__(self, db_path: str = PREFERENCES_DB) -> None:
+        self.db_path = db_path
+        self._conn: sqlite3.Connection | None = None
+        self._lock = threading.RLock()
+        self._preferences: dict[str, dict[str, list[str]]] = {}
+        self._prompts: dict[tuple[str, str], str] = {}
+
+    def _connection(self) -> sqlite3.Connection:
+        # opened on first use so importing tools.py doesn't create the file
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._conn.execute(
+                """CREATE TABLE IF NOT EXISTS user_preferences (
+                    user_id TEXT NOT NULL,
+                    kind TEXT NOT NULL,
+                    item TEXT NOT NULL,
+                    updated_at REAL NOT NULL,
+                    PRIMARY KEY (user_id, kind, item)
+                )"""
+            )
+        return self._conn
+
+    def get(self, user_id: str) -> dict[str, list[str]]:
+        with self._lock:
+            cached = self._preferences.get(user_id)
+            if cached is None:
+                cached = {kind: [] for kind in KINDS}
+                for kind, item in self._connection().execute(
+                    "SELECT kind, item FROM user_preferences WHERE user_id = ? "
+                    "ORDER BY updated_at, item",
+                    (user_id,),
+                ):
+                    cached[kind].append(item)
+                self._preferences[user_id] = cached
+            return {kind: list(items) for kind, items in cached.items()}
+
+    def update(
+        self, user_id: str, likes: Sequence[str] = (), dislikes: Sequence[str] = ()
+    ) -> dict[str, list[str]]:
+        """Add likes and dislikes; an item moves between the two if it flips."""
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                for kind, other, items in (
+                    ("likes", "dislikes", likes),
+                    ("dislikes", "likes", dislikes),
+                ):
+                    for item in {i.strip() for i in items if i.strip()}:
+                        conn.execute(
+                            "DELETE FROM user_preferences WHERE user_id = ? AND kind = ? AND item = ?",
+                            (user_id, other, item),
+                        )
+                        conn.execute(
+                            "INSERT OR REPLACE INTO user_preferences VALUES (?, ?, ?, ?)",
+                            (user_id, kind, item, now),
+                        )
+            self._invalidate(user_id)
+        return self.get(user_id)
+
+    def clear(self, user_id: str) -> None:
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                conn.execute("DELETE FROM user_preferences WHERE user_id = ?", (user_id,))
+            self._invalidate(user_id)
+
+    def _invalidate(self, user_id: str) -> None:
+        self._preferences.pop(user_id, None)
+        for key in [key for key in self._prompts if key[0] == user_id]:
+            del self._prompts[key]
+
+    def system_prompt(self, user_id: str, template: str) -> str:
+        """`template` with {user_preferences} filled in, cached until the next update."""
+        key = (user_id, template)
+        with self._lock:
+            prompt = self._prompts.get(key)
+            if prompt is None:
+                preferences = render_preferences(self.get(user_id))
+                prompt = self._prompts[key] = template.format(user_preferences=preferences)
+            return prompt
+
+
+preference_store = PreferenceStore()
+
+
+class PreferenceExtractor:
+    """
+    Extracts preferences from a user message after the turn and stores them.
+
+    `model` is a structured-output runnable returning `PreferenceUpdate`
+    (e.g. ``chat_model.with_structured_output(PreferenceUpdate)``). Jobs run
+    on a small thread pool for invoke, or as tasks on the caller's event
+    loop for ainvoke, in a fresh context so the call isn't reported to the
+    finished run's callbacks or streamed.
+    """
+
+    def __init__(
+        self, model: Runnable, store: PreferenceStore = preference_store, max_workers: int = 2
+    ) -> None:
+        self.model = model
+        self.store = store
+        self.calls = 0
+        self.skipped = 0
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="preferences"
+        )
+        self._tasks: set[asyncio.Task] = set()
+
+    def _wanted(self, text: str) -> bool:
+        if mentions_preferences(text):
+            self.calls += 1
+            return True
+        self.skipped += 1
+        return False
+
+    def _store(self, user_id: str, update: Any) -> None:
+        if update is not None and (update.likes or update.dislikes):
+            self.store.update(user_id, update.likes, update.dislikes)
+
+    def _extract(self, user_id: str, text: str) -> None:
+        try:
+            prompt = extraction_prompt(text, self.store.get(user_id))
+            self._store(user_id, self.model.invoke(prompt))
+        except Exception:
+            logger.exception("preference extraction for %s failed", user_id)
+
+    async def _aextract(self, user_id: str, text: str) -> None:
+        try:
+            # the store reads and writes sqlite, so only the model call runs
+            # on the loop
+            current = await asyncio.to_thread(self.store.get, user_id)
+            update = await self.model.ainvoke(extraction_prompt(text, current))
+            await asyncio.to_thread(self._store, user_id, update)
+        except Exception:
+            logger.exception("preference extraction for %s failed", user_id)
+
+    def submit(self, user_id: str, text: str) -> bool:
+        if not self._wanted(text):
+            return False
+        self._executor.submit(self._extract, user_id, text)
+        return True
+
+    def asubmit(self, user_id: str, text: str) -> bool:
+        """Like `submit`, but as a task on the running event loop."""
+        if not self._wanted(text):
+            return False
+        task = asyncio.create_task(
+            self._aextract(user_id, text), context=contextvars.Context()
+        )
+        # the loop only keeps weak references to tasks
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return True
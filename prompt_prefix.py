@@ -0,0 +1,269 @@
+"""
+Prompt assembly for echo that keeps the front of the prompt byte-stable.
+
+Providers cache a request by prefix, so everything that changes between
+calls has to come after the parts that don't. Gemini merges every
+SystemMessage into `system_instruction`, which goes before the history. A
+summary or preference change there therefore invalidates the whole prompt.
+`assemble` lays a prompt out as:
+
+    [system prompt]          identical on every call for the same user
+    [summary note]           changes only when a summary is applied
+    *messages                append-only between summaries
+
+Within a thread, each prompt then extends the previous one until the next
+summary is applied. `PrefixTracker` checks this on every call and counts
+the (estimated) tokens that a prefix cache could have served.
+
+`ContextCache` goes one step further for a fully static system prompt. It
+registers the prompt and the tool declarations with Gemini's explicit
+context cache, and hands out the cache name to pass as `cached_content`.
+Gemini rejects a request that sends a system instruction or tools alongside
+a cache, so those calls send `prompt[1:]` to the plain client. Gemini only
+caches prompts of MIN_CACHE_TOKENS or more, which the librarian prompt and
+tools alone don't reach.
+"""
+
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Sequence
+from dataclasses import dataclass
+from typing import Any
+
+from langchain_core.messages import (
+    AIMessage,
+    AnyMessage,
+    HumanMessage,
+    SystemMessage,
+    ToolMessage,
+)
+from langchain_core.tools import BaseTool
+
+from summarization import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_NOTE = "Summary of the conversation so far:\n"
+# Gemini's smallest explicit cache on the Flash models; Pro needs more
+MIN_CACHE_TOKENS = 1024
+
+
+def assemble(system: str, messages: Sequence[AnyMessage], summary: str = "") -> list[AnyMessage]:
+    """`system` first, then the summary as a note, then the history unchanged."""
+    prompt: list[AnyMessage] = [SystemMessage(content=system)]
+    if summary:
+        # a user turn rather than a second SystemMessage, which Gemini would
+        # fold into system_instruction at the head of the request
+        prompt.append(HumanMessage(content=SUMMARY_NOTE + summary))
+    prompt.extend(messages)
+    return prompt
+
+
+def canonical(message: AnyMessage) -> str:
+    """What the provider sees of a message, serialized deterministically."""
+    data: dict[str, Any] = {"role": message.type, "content": message.content}
+    if isinstance(message, AIMessage) and message.tool_calls:
+        # ids are generated client-side and not part of what Gemini caches
+        data["tool_calls"] = [
+            {"name": call["name"], "args": call["args"]} for call in message.tool_calls
+        ]
+    if isinstance(message, ToolMessage):
+        data["name"] = message.name
+    return json.dumps(data, sort_keys=True, ensure_ascii=False, separators=(",", ":"), default=str)
+
+
+@dataclass
+class PrefixReport:
+    prompt_tokens: int
+    reusable_tokens: int  # leading tokens identical to the thread's previous prompt
+    messages: int
+    reusable_messages: int
+
+
+class PrefixTracker:
+    """Compares each prompt with the previous one of the same thread."""
+
+    def __init__(self, max_threads: int = 1024) -> None:
+        self.max_threads = max_threads
+        self.calls = 0
+        self.prompt_tokens = 0
+        self.reusable_tokens = 0
+        self.provider_cached_tokens = 0
+        self._last: OrderedDict[str, list[str]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def observe(self, thread_id: str | None, prompt: Sequence[AnyMessage]) -> PrefixReport:
+        serialized = [canonical(m) for m in prompt]
+        digests = [hashlib.sha1(s.encode()).hexdigest() for s in serialized]
+        tokens = [estimate_tokens(s) for s in serialized]
+        key = str(thread_id)
+        with self._lock:
+            previous = self._last.pop(key, [])
+            self._last[key] = digests
+            while len(self._last) > self.max_threads:
+                self._last.popitem(last=False)
+
+            shared = 0
+            for old, new in zip(previous, digests):
+                if old != new:
+                    break
+                shared += 1
+            report = PrefixReport(
+                prompt_tokens=sum(tokens),
+                reusable_tokens=sum(tokens[:shared]),
+                messages=len(digests),
+                reusable_messages=shared,
+            )
+            self.calls += 1
+            self.prompt_tokens += report.prompt_tokens
+            self.reusable_tokens += report.reusable_tokens
+        logger.debug(
+            "thread %s: %d of ~%d prompt tokens reusable",
+            key, report.reusable_tokens, report.prompt_tokens,
+        )
+        return report
+
+    def observe_usage(self, response: AnyMessage) -> None:
+        """Add the cached token count the provider reported, if any."""
+        usage = getattr(response, "usage_metadata", None) or {}
+        cached = usage.get("input_token_details", {}).get("cache_read", 0)
+        with self._lock:
+            self.provider_cached_tokens += cached or 0
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "prompt_tokens": self.prompt_tokens,
+                "reusable_tokens": self.reusable_tokens,
+                "reuse_rate": self.reusable_tokens / self.prompt_tokens if self.prompt_tokens else 0.0,
+                "provider_cached_tokens": self.provider_cached_tokens,
+            }
+
+
+class ContextCache:
+    """
+    A Gemini explicit context cache holding `system` and the tool declarations.
+
+    The cache is created and re-created shortly before its TTL runs out by a
+    background thread that `start()` launches, so no request ever waits on
+    the network for it. `name()` only reads the current state: it returns
+    None, and callers send the full prompt, until the first create succeeds
+    or while creation is failing (no google-genai, quota). A failed create
+    is retried after `retry_after` seconds.
+
+    Gemini refuses to cache less than a minimum number of tokens (1024 on
+    the Flash models, more on Pro). A prompt plus tools under `min_tokens`
+    is never sent: `start()` logs it once and the cache stays off.
+    """
+
+    def __init__(
+        self,
+        model: str,
+        system: str,
+        tools: Sequence[BaseTool],
+        api_key: str | None = None,
+        ttl: int = 3600,
+        retry_after: float = 300.0,
+        min_tokens: int = MIN_CACHE_TOKENS,
+    ) -> None:
+        self.model = model
+        self.system = system
+        self.tools = list(tools)
+        self.api_key = api_key
+        self.ttl = ttl
+        self.retry_after = retry_after
+        self.min_tokens = min_tokens
+        self._name: str | None = None
+        self._expires_at = 0.0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._too_small: bool | None = None
+
+    def tokens(self) -> int:
+        """Estimated size of what would be cached."""
+        from langchain_core.utils.function_calling import convert_to_openai_tool
+
+        declarations = json.dumps([convert_to_openai_tool(t) for t in self.tools])
+        return estimate_tokens(self.system) + estimate_tokens(declarations)
+
+    def _create(self) -> str:
+        from google import genai
+        from google.genai import types
+        from langchain_google_genai._function_utils import (
+            convert_to_genai_function_declarations,
+        )
+
+        client = genai.Client(api_key=self.api_key)
+        cache = client.caches.create(
+            model=self.model,
+            config=types.CreateCachedContentConfig(
+                display_name="echo-static-prefix",
+                system_instruction=self.system,
+                tools=convert_to_genai_function_declarations(self.tools),
+                ttl=f"{self.ttl}s",
+            ),
+        )
+        return cache.name
+
+    def refresh(self) -> bool:
+        """Create the cache now, on the calling thread. False if that failed."""
+        try:
+            name = self._create()
+        except Exception:
+            logger.warning("could not create Gemini context cache", exc_info=True)
+            return False
+        with self._lock:
+            self._name = name
+            self._expires_at = time.monotonic() + self.ttl
+        return True
+
+    def _loop(self) -> None:
+        while not self._stop.is_set():
+            if self.refresh():
+                # two minutes early, so name()'s one-minute margin never lapses
+                wait = max(self.ttl - 120, 1)
+            else:
+                wait = self.retry_after
+            self._stop.wait(wait)
+
+    def start(self) -> None:
+        """Start the background refresher, unless the prompt is too small to cache."""
+        with self._lock:
+            if self._thread is not None or self._too_small:
+                return
+            if self._too_small is None:
+                tokens = self.tokens()
+                self._too_small = tokens < self.min_tokens
+                if self._too_small:
+                    logger.info(
+                        "Gemini context cache off: ~%d tokens is under the %d-token minimum",
+                        tokens,
+                        self.min_tokens,
+                    )
+                    return
+            self._stop.clear()
+            self._thread = threading.Thread(
+                target=self._loop, name="context-cache", daemon=True
+            )
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def name(self) -> str | None:
+        """Name of the live cache, or None. Never blocks on the network."""
+        now = time.monotonic()
+        with self._lock:
+            # a minute of margin so a request never lands on an expired cache
+            if self._name is not None and now < self._expires_at - 60:
+                return self._name
+            return None
@@ -0,0 +1,160 @@
+"""
+Exact-match cache of structured-output responses.
+
+Inquira's routing calls (`check_safety`, `check_relevancy`, `require_code`,
+`classify`) are functions of the prompt template, the schema and the
+conversation, under a fixed model. Identical questions from different users
+on the same schema used to hit Gemini every time. `response_key` hashes the
+model's parameters, the prompt version, the output schema, the other prompt
+inputs (the schema text, for one) and the normalized messages. `ResponseCache`
+stores the parsed response under that key in SQLite, with the expiry and
+eviction of sqlite_cache.py.
+
+The most recently used `memory_entries` are also kept in memory, so a repeat
+costs a dict lookup instead of a query. Hit and miss counts per node are in
+`stats()`.
+"""
+
+import hashlib
+import json
+import os
+import time
+import unicodedata
+from collections import Counter, OrderedDict
+from collections.abc import Mapping, Sequence
+from typing import Any
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AnyMessage
+
+from sqlite_cache import SqliteCache
+
+RESPONSE_CACHE_DB = os.environ.get("RESPONSE_CACHE_DB", "response_cache.db")
+RESPONSE_CACHE_TTL = float(os.environ.get("RESPONSE_CACHE_TTL", str(7 * 24 * 60 * 60)))
+
+
+def digest(text: str) -> str:
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+def model_identity(model: BaseChatModel) -> str:
+    """Class and parameters (model name, temperature, ...) of a chat model."""
+    params = getattr(model, "_identifying_params", {})
+    return json.dumps(
+        {"type": type(model).__name__, **params}, sort_keys=True, default=str
+    )
+
+
+def normalize_messages(messages: Sequence[AnyMessage]) -> list[tuple[str, str]]:
+    """(type, text) per message, with unicode and whitespace normalized."""
+    return [
+        (m.type, " ".join(unicodedata.normalize("NFKC", m.text).split()))
+        for m in messages
+    ]
+
+
+def response_key(
+    model: str,
+    prompt_version: str,
+    output_schema: str,
+    inputs: Mapping[str, Any],
+) -> str:
+    """Key for a prompt | model call; `inputs` are the prompt variables."""
+    variables = {
+        name: digest(json.dumps(value, sort_keys=True, default=str))
+        for name, value in inputs.items()
+        if name != "messages"
+    }
+    return digest(
+        json.dumps(
+            [
+                model,
+                prompt_version,
+                output_schema,
+                variables,
+                normalize_messages(inputs.get("messages", [])),
+            ],
+            ensure_ascii=False,
+        )
+    )
+
+
+class ResponseCache(SqliteCache):
+    table = "response_cache"
+    columns = {"node": "TEXT NOT NULL"}
+
+    def __init__(
+        self,
+        db_path: str = RESPONSE_CACHE_DB,
+        ttl: float = RESPONSE_CACHE_TTL,
+        max_entries: int = 20_000,
+        memory_entries: int = 1024,
+    ) -> None:
+        super().__init__(db_path, ttl, max_entries)
+        self.memory_entries = memory_entries
+        self.hits: Counter[str] = Counter()
+        self.misses: Counter[str] = Counter()
+        self._memory: OrderedDict[str, tuple[float, dict[str, Any]]] = OrderedDict()
+
+    def _forget(self, keys: list[str]) -> None:
+        for key in keys:
+            self._memory.pop(key, None)
+
+    def _remember(self, key: str, created_at: float, response: dict[str, Any]) -> None:
+        self._memory[key] = (created_at, response)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def get(self, node: str, key: str) -> dict[str, Any] | None:
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None and now - entry[0] <= self.ttl:
+                self._memory.move_to_end(key)
+                self._touched[key] = now
+                self.hits[node] += 1
+                return entry[1]
+
+            row = self._lookup(key, now)
+            if row is None:
+                self._memory.pop(key, None)
+                self.misses[node] += 1
+                return None
+            response = json.loads(row[1])
+            self._remember(key, row[0], response)
+            self.hits[node] += 1
+            return response
+
+    def put(self, node: str, key: str, response: dict[str, Any]) -> None:
+        data = json.dumps(response, default=str)
+        now = time.time()
+        with self._lock:
+            self._put(key, data, now, node=node)
+            self._remember(key, now, json.loads(data))
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            count, _ = self._size()
+            hits = sum(self.hits.values())
+            lookups = hits + sum(self.misses.values())
+            return {
+                "entries": count,
+                "hits": hits,
+                "misses": lookups - hits,
+                "hit_rate": hits / lookups if lookups else 0.0,
+                "by_node": {
+                    node: {"hits": self.hits[node], "misses": self.misses[node]}
+                    for node in sorted(set(self.hits) | set(self.misses))
+                },
+            }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._clear()
+            self._memory.clear()
+            self.hits.clear()
+            self.misses.clear()
+
+
+response_cache = ResponseCache()
@@ -0,0 +1,105 @@
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Any
+
+from pydantic import BaseModel, ConfigDict
+
+from column_index import ColumnIndex
+
+
+def load_json(filepath: str | Path):
+    with open(filepath, "r") as file:
+        schema = json.load(file)
+
+    return schema
+
+
+def render_schema(schema: Any) -> str:
+    """
+    Render a schema for a prompt with as few tokens as possible.
+
+    Column lists (``{"columns": [{"name": ..., "type": ..., "description": ...}]}``)
+    become one line per column; anything else falls back to JSON without
+    whitespace.
+    """
+    if isinstance(schema, dict):
+        columns = schema.get("columns")
+        if isinstance(columns, list) and all(isinstance(c, dict) for c in columns):
+            header = [
+                f"{key}: {value}"
+                for key, value in schema.items()
+                if key != "columns" and not isinstance(value, (dict, list))
+            ]
+            lines = []
+            for column in columns:
+                name = column.get("name", "?")
+                dtype = column.get("type") or column.get("dtype")
+                line = f"- {name} ({dtype})" if dtype else f"- {name}"
+                description = column.get("description")
+                if description:
+                    line += f": {description}"
+                lines.append(line)
+            return "\n".join(header + ["columns:"] + lines)
+
+    return json.dumps(schema, separators=(",", ":"), ensure_ascii=False)
+
+
+def build_index(schema: Any) -> ColumnIndex | None:
+    columns = schema.get("columns") if isinstance(schema, dict) else None
+    if isinstance(columns, list) and all(isinstance(c, dict) for c in columns):
+        return ColumnIndex(columns)
+    return None
+
+
+class SchemaEntry(BaseModel):
+    model_config = ConfigDict(frozen=True, arbitrary_types_allowed=True)
+
+    path: str
+    mtime_ns: int
+    data: dict[str, Any]
+    rendered: str
+    index: ColumnIndex | None = None
+
+
+class SchemaRegistry:
+    """
+    Parse each schema file once and hand out the cached result.
+
+    Entries are keyed by resolved path and invalidated when the file's mtime
+    changes, so graph state only needs to carry the path.
+    """
+
+    def __init__(self) -> None:
+        self._entries: dict[str, SchemaEntry] = {}
+        self._lock = threading.Lock()
+
+    def get(self, path: str | Path) -> SchemaEntry:
+        resolved = str(Path(path).resolve())
+        mtime_ns = os.stat(resolved).st_mtime_ns
+
+        entry = self._entries.get(resolved)
+        if entry is not None and entry.mtime_ns == mtime_ns:
+            return entry
+
+        with self._lock:
+            entry = self._entries.get(resolved)
+            if entry is None or entry.mtime_ns != mtime_ns:
+                schema = load_json(resolved)
+                entry = SchemaEntry(
+                    path=resolved,
+                    mtime_ns=mtime_ns,
+                    data=schema,
+                    rendered=render_schema(schema),
+                    index=build_index(schema),
+                )
+                self._entries[resolved] = entry
+            return entry
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+schema_registry = SchemaRegistry()
@@ -0,0 +1,227 @@
+"""
+Persistent cache of web search responses.
+
+Users repeat themselves ("any sad books set in Japan?" ... "Sad books set in
+Japan"), and every repeat used to cost a full Tavily round trip. Responses
+are cached in SQLite keyed on the normalized query plus search depth, expire
+after `ttl` seconds, and the least recently used entries are evicted once
+the cache is over `max_entries` or `max_bytes` (see sqlite_cache.py).
+
+Queries that are worded differently but use nearly the same words ("cozy
+mysteries with a cat detective" / "cat detective cozy mystery books") are
+matched by a MinHash estimate of their Jaccard similarity over words and
+character 4-grams. A near-duplicate is served only if it is at least
+`similarity_threshold` similar and younger than `near_max_age`, since a
+borrowed answer should be fresher than an exact one. The default threshold
+of 0.7 is set above one-word topic swaps ("best translated russian classics"
+/ "... french classics" sit at ~0.6); paraphrases that share no words are out
+of reach of a lexical index and still miss.
+"""
+
+import hashlib
+import json
+import os
+import random
+import re
+import sqlite3
+import time
+import unicodedata
+from array import array
+from collections import defaultdict
+from typing import Any
+
+from column_index import tokenize
+from sqlite_cache import SqliteCache
+
+SEARCH_CACHE_DB = os.environ.get("SEARCH_CACHE_DB", "search_cache.db")
+SEARCH_CACHE_TTL = float(os.environ.get("SEARCH_CACHE_TTL", str(24 * 60 * 60)))
+SEARCH_CACHE_NEAR_MAX_AGE = float(
+    os.environ.get("SEARCH_CACHE_NEAR_MAX_AGE", str(6 * 60 * 60))
+)
+
+_PUNCTUATION = re.compile(r"[^\w\s]+")
+
+
+def normalize_query(query: str) -> str:
+    """Case, punctuation and whitespace insensitive form of a search query."""
+    text = unicodedata.normalize("NFKC", query).casefold()
+    return " ".join(_PUNCTUATION.sub(" ", text).split())
+
+
+def cache_key(query: str, search_depth: str) -> str:
+    return hashlib.sha256(
+        f"{search_depth}\x00{normalize_query(query)}".encode()
+    ).hexdigest()
+
+
+def query_features(query: str) -> set[str]:
+    """Words plus their character 4-grams, so "melancholic" meets "melancholy"."""
+    features = set()
+    for word in tokenize(normalize_query(query)):
+        features.add(word)
+        padded = f"_{word}_"
+        features.update(padded[i : i + 4] for i in range(len(padded) - 3))
+    return features
+
+
+class MinHashIndex:
+    """
+    MinHash signatures with LSH banding over cached queries.
+
+    `bands` x `rows` must equal `num_perm`; with 16 bands of 4 rows, pairs
+    above ~0.5 Jaccard similarity almost always share a bucket and pairs
+    below ~0.3 rarely do, so only a handful of candidates are compared.
+    """
+
+    _PRIME = (1 << 61) - 1
+
+    def __init__(self, num_perm: int = 64, bands: int = 16, seed: int = 1) -> None:
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        rng = random.Random(seed)
+        self._perms = [
+            (rng.randrange(1, self._PRIME), rng.randrange(0, self._PRIME))
+            for _ in range(num_perm)
+        ]
+        self._signatures: dict[str, tuple[str, array]] = {}
+        self._buckets: defaultdict[tuple, set[str]] = defaultdict(set)
+
+    def signature(self, query: str) -> array:
+        hashes = [
+            int.from_bytes(hashlib.blake2b(f.encode(), digest_size=8).digest(), "big")
+            for f in query_features(query)
+        ] or [0]
+        return array(
+            "Q", (min((a * h + b) % self._PRIME for h in hashes) for a, b in self._perms)
+        )
+
+    def _band_keys(self, search_depth: str, signature: array) -> list[tuple]:
+        return [
+            (search_depth, band, tuple(signature[band * self.rows : (band + 1) * self.rows]))
+            for band in range(self.bands)
+        ]
+
+    def add(self, key: str, search_depth: str, signature: array) -> None:
+        self.discard(key)
+        self._signatures[key] = (search_depth, signature)
+        for band_key in self._band_keys(search_depth, signature):
+            self._buckets[band_key].add(key)
+
+    def discard(self, key: str) -> None:
+        entry = self._signatures.pop(key, None)
+        if entry is None:
+            return
+        for band_key in self._band_keys(*entry):
+            bucket = self._buckets.get(band_key)
+            if bucket is not None:
+                bucket.discard(key)
+                if not bucket:
+                    del self._buckets[band_key]
+
+    def clear(self) -> None:
+        self._signatures.clear()
+        self._buckets.clear()
+
+    def nearest(self, search_depth: str, signature: array) -> tuple[str | None, float]:
+        """Most similar indexed key for `search_depth` and its estimated Jaccard."""
+        candidates = set()
+        for band_key in self._band_keys(search_depth, signature):
+            candidates |= self._buckets.get(band_key, set())
+        best, best_similarity = None, 0.0
+        for key in candidates:
+            other = self._signatures[key][1]
+            similarity = sum(x == y for x, y in zip(signature, other)) / self.num_perm
+            if similarity > best_similarity:
+                best, best_similarity = key, similarity
+        return best, best_similarity
+
+
+class SearchCache(SqliteCache):
+    table = "search_cache"
+    columns = {"query": "TEXT NOT NULL", "search_depth": "TEXT NOT NULL"}
+
+    def __init__(
+        self,
+        db_path: str = SEARCH_CACHE_DB,
+        ttl: float = SEARCH_CACHE_TTL,
+        max_entries: int = 5000,
+        max_bytes: int = 50 * 1024 * 1024,
+        near_duplicates: bool = True,
+        similarity_threshold: float = 0.7,
+        near_max_age: float = SEARCH_CACHE_NEAR_MAX_AGE,
+    ) -> None:
+        super().__init__(db_path, ttl, max_entries, max_bytes)
+        self.near_duplicates = near_duplicates
+        self.similarity_threshold = similarity_threshold
+        self.near_max_age = near_max_age
+        self.hits = 0
+        self.near_hits = 0
+        self.misses = 0
+        self._index = MinHashIndex()
+
+    def _opened(self, conn: sqlite3.Connection) -> None:
+        # signatures are cheap to recompute, so the LSH index lives in memory
+        # and is rebuilt from the stored queries
+        for key, query, search_depth in conn.execute(
+            "SELECT key, query, search_depth FROM search_cache"
+        ):
+            self._index.add(key, search_depth, self._index.signature(query))
+
+    def _forget(self, keys: list[str]) -> None:
+        for key in keys:
+            self._index.discard(key)
+
+    def get(self, query: str, search_depth: str) -> dict[str, Any] | None:
+        now = time.time()
+        with self._lock:
+            row = self._lookup(cache_key(query, search_depth), now)
+            if row is not None:
+                self.hits += 1
+                return json.loads(row[1])
+
+            if self.near_duplicates:
+                signature = self._index.signature(query)
+                key, similarity = self._index.nearest(search_depth, signature)
+                if key is not None and similarity >= self.similarity_threshold:
+                    # a borrowed answer has to be fresher than an exact one
+                    row = self._lookup(key, now, max_age=self.near_max_age)
+                    if row is not None:
+                        self.near_hits += 1
+                        return json.loads(row[1])
+
+            self.misses += 1
+        return None
+
+    def put(self, query: str, search_depth: str, response: dict[str, Any]) -> None:
+        key = cache_key(query, search_depth)
+        data = json.dumps(response, default=str)
+        with self._lock:
+            self._put(
+                key, data, time.time(), query=normalize_query(query), search_depth=search_depth
+            )
+            self._index.add(key, search_depth, self._index.signature(query))
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            count, total = self._size()
+            lookups = self.hits + self.near_hits + self.misses
+            return {
+                "entries": count,
+                "bytes": total,
+                "hits": self.hits,
+                "near_hits": self.near_hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits + self.near_hits) / lookups if lookups else 0.0,
+            }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._clear()
+            self._index.clear()
+            self.hits = self.near_hits = self.misses = 0
+
+
+search_cache = SearchCache()
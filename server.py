@@ -0,0 +1,295 @@
+"""
+HTTP + SSE front end for the echo (librarian) and Inquira graphs.
+
+    uvicorn server:app --port 8000
+
+    curl -N -X POST localhost:8000/echo/threads/OMOMOM/stream \
+        -H 'content-type: application/json' -d '{"message": "a sad book set in Japan"}'
+
+    curl -N -X POST localhost:8000/inquira/threads/adarsh9780:deliveries_schema.json/stream \
+        -H 'content-type: application/json' -d '{"message": "late deliveries per city?"}'
+
+Each graph is compiled once at startup and shared by every request; the
+thread_id in the path selects the conversation in the checkpointer, which
+stores it as `<graph>:<thread_id>` so the graphs never share a thread. Tokens
+stream as `token` events, node updates as `update` events, and the stream
+ends with `done` (or `error`).
+"""
+
+import asyncio
+import functools
+import json
+import logging
+import os
+from collections.abc import AsyncIterator, Callable
+from contextlib import AsyncExitStack, asynccontextmanager
+from typing import Any
+
+from fastapi import FastAPI, HTTPException
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage
+from langchain_core.runnables import RunnableConfig
+from langgraph.graph.state import CompiledStateGraph
+from pydantic import BaseModel
+from sse_starlette import EventSourceResponse, ServerSentEvent
+
+logger = logging.getLogger(__name__)
+
+MAX_CONCURRENT_RUNS = int(os.environ.get("MAX_CONCURRENT_RUNS", "64"))
+SEND_TIMEOUT_SECONDS = float(os.environ.get("SSE_SEND_TIMEOUT", "30"))
+CHECKPOINT_DB = os.environ.get("CHECKPOINT_DB", "chat_echo.db")
+# serve repeated Inquira routing decisions from response_cache.py
+INQUIRA_RESPONSE_CACHE = os.environ.get("INQUIRA_RESPONSE_CACHE", "") not in ("", "0")
+
+# nodes whose LLM output is internal bookkeeping, not part of the reply
+SILENT_NODES = {"apply_summary", "summarize"}
+
+
+class ChatRequest(BaseModel):
+    message: str
+
+
+def echo_input(thread_id: str, message: str) -> Any:
+    return {"messages": [HumanMessage(content=message)]}
+
+
+def inquira_input(thread_id: str, message: str) -> Any:
+    from inquira_agent import InputSchema
+    from schema_registry import schema_registry
+
+    _, _, schema_path = thread_id.partition(":")
+    if not schema_path:
+        raise HTTPException(
+            status_code=400,
+            detail="inquira thread ids look like '<user>:<schema path>'",
+        )
+    try:
+        schema_registry.get(schema_path)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail=f"unknown schema {schema_path}")
+    return InputSchema(messages=[HumanMessage(content=message)], schema_path=schema_path)
+
+
+INPUT_BUILDERS: dict[str, Callable[[str, str], Any]] = {
+    "echo": echo_input,
+    "inquira": inquira_input,
+}
+
+
+def _text(content: Any) -> str:
+    if isinstance(content, str):
+        return content
+    if isinstance(content, list):
+        return "".join(
+            part["text"] if isinstance(part, dict) else str(part)
+            for part in content
+            if isinstance(part, str) or (isinstance(part, dict) and "text" in part)
+        )
+    return ""
+
+
+def _jsonable(value: Any) -> Any:
+    if isinstance(value, BaseMessage):
+        return {"type": value.type, "name": value.name, "content": _text(value.content)}
+    if isinstance(value, BaseModel):
+        return value.model_dump(mode="json")
+    if isinstance(value, dict):
+        return {key: _jsonable(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_jsonable(item) for item in value]
+    if isinstance(value, (str, int, float, bool)) or value is None:
+        return value
+    return str(value)
+
+
+def checkpoint_thread_id(graph_name: str, thread_id: str) -> str:
+    """The thread's id in the checkpointer all graphs share."""
+    return f"{graph_name}:{thread_id}"
+
+
+async def stream_events(
+    graph: CompiledStateGraph, graph_input: Any, thread_id: str
+) -> AsyncIterator[ServerSentEvent]:
+    """Translate `astream(stream_mode=["messages", "updates"])` into SSE events."""
+    config: RunnableConfig = {"configurable": {"thread_id": thread_id}}
+    async for mode, chunk in graph.astream(
+        graph_input, config=config, stream_mode=["messages", "updates"]
+    ):
+        if mode == "messages":
+            message, metadata = chunk
+            if metadata.get("langgraph_node") in SILENT_NODES:
+                continue
+            # tool calls (and structured outputs) stream as tool-call chunks, skip them
+            if not isinstance(message, AIMessage) or message.tool_calls:
+                continue
+            if getattr(message, "tool_call_chunks", None):
+                continue
+            text = _text(message.content)
+            if text:
+                yield ServerSentEvent(data=text, event="token")
+
+        elif mode == "updates":
+            for node_name, updates in chunk.items():
+                payload = {"node": node_name, "update": _jsonable(updates or {})}
+                yield ServerSentEvent(data=json.dumps(payload), event="update")
+
+
+class GraphServer:
+    """
+    Shared compiled graphs plus the admission control around them.
+
+    At most MAX_CONCURRENT_RUNS graph runs are in flight at once (extra
+    requests get a 503 instead of queueing unboundedly), and a thread_id
+    only ever has one run in flight, since two concurrent runs on the same
+    thread would race on its checkpoints.
+    """
+
+    def __init__(
+        self,
+        graphs: dict[str, CompiledStateGraph],
+        max_concurrent_runs: int = MAX_CONCURRENT_RUNS,
+    ) -> None:
+        self.graphs = graphs
+        self._slots = asyncio.Semaphore(max_concurrent_runs)
+        # (graph, thread) -> the reservation holding it
+        self._busy_threads: dict[tuple[str, str], object] = {}
+
+    def admit(self, graph_name: str, thread_id: str) -> object:
+        """Reserve the thread; the returned token is passed back to `release`."""
+        if graph_name not in self.graphs:
+            raise HTTPException(status_code=404, detail=f"unknown graph {graph_name}")
+        if (graph_name, thread_id) in self._busy_threads:
+            raise HTTPException(
+                status_code=409, detail=f"thread {thread_id} already has a run in flight"
+            )
+        if self._slots.locked():
+            raise HTTPException(
+                status_code=503,
+                detail="server is at capacity",
+                headers={"Retry-After": "1"},
+            )
+        # reserved here rather than in run() so a second request can't slip in
+        # before the first stream starts
+        token = object()
+        self._busy_threads[(graph_name, thread_id)] = token
+        return token
+
+    def release(self, graph_name: str, thread_id: str, token: object) -> None:
+        # only our own reservation: a later request may already hold the thread
+        key = (graph_name, thread_id)
+        if self._busy_threads.get(key) is token:
+            del self._busy_threads[key]
+
+    async def run(
+        self, graph_name: str, thread_id: str, graph_input: Any, token: object
+    ) -> AsyncIterator[ServerSentEvent]:
+        try:
+            async with self._slots:
+                async for event in stream_events(
+                    self.graphs[graph_name],
+                    graph_input,
+                    checkpoint_thread_id(graph_name, thread_id),
+                ):
+                    yield event
+                yield ServerSentEvent(data="", event="done")
+        except Exception as exc:  # surfaced to the client instead of a dropped stream
+            yield ServerSentEvent(data=str(exc), event="error")
+        finally:
+            self.release(graph_name, thread_id, token)
+
+
+class ReservedEventSourceResponse(EventSourceResponse):
+    """
+    SSE response that releases its thread reservation when it ends.
+
+    `run()` releases it too, but only once the stream has started; a client
+    that disconnects before the first send (or a response that is never
+    sent) would otherwise leave the thread busy for good.
+    """
+
+    def __init__(self, *args: Any, release: Callable[[], None], **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        self._release = release
+
+    async def __call__(self, scope: Any, receive: Any, send: Any) -> None:
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            self._release()
+
+
+def create_app(graphs: dict[str, CompiledStateGraph] | None = None) -> FastAPI:
+    """
+    Build the app. Without `graphs`, the echo and Inquira graphs are compiled
+    at startup against a shared AsyncSqliteSaver at CHECKPOINT_DB.
+    """
+
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        async with AsyncExitStack() as stack:
+            if graphs is None:
+                from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+
+                import inquira_agent
+                import main
+
+                checkpointer = await stack.enter_async_context(
+                    AsyncSqliteSaver.from_conn_string(CHECKPOINT_DB)
+                )
+                builders: dict[str, Callable[[], CompiledStateGraph]] = {
+                    "echo": lambda: main.build_graph(checkpointer=checkpointer),
+                    "inquira": lambda: inquira_agent.build_graph(
+                        checkpointer=checkpointer, cache_responses=INQUIRA_RESPONSE_CACHE
+                    ),
+                }
+                # one graph that can't be built (a missing prompt file, say)
+                # is left out rather than taking the others down with it
+                compiled = {}
+                for name, build in builders.items():
+                    try:
+                        compiled[name] = build()
+                    except Exception:
+                        logger.exception("graph %s failed to build, not serving it", name)
+                if "echo" in compiled:
+                    # with GEMINI_CONTEXT_CACHE set, starts creating the cache
+                    # in the background before the first request needs it
+                    main.get_context_cache()
+            else:
+                compiled = graphs
+            app.state.server = GraphServer(compiled)
+            yield
+
+    app = FastAPI(title="anu-project", lifespan=lifespan)
+
+    @app.get("/health")
+    async def health() -> dict[str, Any]:
+        return {"graphs": sorted(app.state.server.graphs)}
+
+    @app.post("/{graph_name}/threads/{thread_id}/stream")
+    async def stream(
+        graph_name: str, thread_id: str, request: ChatRequest
+    ) -> EventSourceResponse:
+        server: GraphServer = app.state.server
+        if graph_name not in server.graphs:
+            raise HTTPException(status_code=404, detail=f"unknown graph {graph_name}")
+        build_input = INPUT_BUILDERS.get(graph_name, echo_input)
+        # validated before the thread is reserved, so a 400/404 leaves it free
+        graph_input = build_input(thread_id, request.message)
+        token = server.admit(graph_name, thread_id)
+        release = functools.partial(server.release, graph_name, thread_id, token)
+        try:
+            # the generator only advances as fast as the client reads, and a
+            # client that stops reading for SEND_TIMEOUT_SECONDS is dropped
+            return ReservedEventSourceResponse(
+                server.run(graph_name, thread_id, graph_input, token),
+                send_timeout=SEND_TIMEOUT_SECONDS,
+                ping=15,
+                release=release,
+            )
+        except BaseException:
+            release()
+            raise
+
+    return app
+
+
+app = create_app()
@@ -0,0 +1,160 @@
+"""
+SQLite table of cached responses with a TTL and LRU eviction.
+
+`SearchCache` and `ResponseCache` both keep a JSON response per key, expire
+it `ttl` seconds after it was written, and evict the least recently used
+entries once there are more than `max_entries` (or more than `max_bytes` of
+responses, if set). `SqliteCache` is that shared part; subclasses name the
+table, add their own columns and decide what a lookup is.
+
+- The connection is opened on first use, so a cache created at import time
+  doesn't create its file until it is used.
+- The file is in WAL mode with synchronous=NORMAL. A write lost to a power
+  failure costs one recomputed response, which is cheaper than an fsync on
+  every put.
+- `used_at` updates from hits are kept in memory and written with the next
+  put.
+- Expired and surplus entries are evicted every `evict_every` puts, not on
+  each one, so a table may run that many entries over its caps in between.
+- A table left behind by an older layout of the same cache is dropped, not
+  migrated.
+
+Subclasses hold `_lock` around calls to the underscore methods.
+"""
+
+import sqlite3
+import threading
+
+# columns every cache table has, besides the subclass's own
+BASE_COLUMNS = {
+    "created_at": "REAL NOT NULL",
+    "used_at": "REAL NOT NULL",
+    "size": "INTEGER NOT NULL",
+    "response": "TEXT NOT NULL",
+}
+
+
+class SqliteCache:
+    table: str
+    # the subclass's own columns and their types
+    columns: dict[str, str] = {}
+
+    def __init__(
+        self,
+        db_path: str,
+        ttl: float,
+        max_entries: int,
+        max_bytes: int | None = None,
+        evict_every: int = 64,
+    ) -> None:
+        self.db_path = db_path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.evict_every = evict_every
+        self._puts = 0
+        self._touched: dict[str, float] = {}
+        self._conn: sqlite3.Connection | None = None
+        self._lock = threading.Lock()
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            columns = {"key": "TEXT PRIMARY KEY", **self.columns, **BASE_COLUMNS}
+            existing = {row[1] for row in conn.execute(f"PRAGMA table_info({self.table})")}
+            if existing and existing != set(columns):
+                with conn:
+                    conn.execute(f"DROP TABLE {self.table}")
+            conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {self.table} "
+                f"({', '.join(f'{name} {type_}' for name, type_ in columns.items())})"
+            )
+            conn.execute(
+                f"CREATE INDEX IF NOT EXISTS {self.table}_used_at ON {self.table}(used_at)"
+            )
+            self._conn = conn
+            self._opened(conn)
+        return self._conn
+
+    def _opened(self, conn: sqlite3.Connection) -> None:
+        """Called once the table exists, e.g. to rebuild an in-memory index."""
+
+    def _forget(self, keys: list[str]) -> None:
+        """Called with the keys of deleted entries."""
+
+    def _lookup(
+        self, key: str, now: float, max_age: float | None = None
+    ) -> tuple[float, str] | None:
+        """(created_at, response) of a live entry no older than `max_age`."""
+        row = (
+            self._connection()
+            .execute(f"SELECT created_at, response FROM {self.table} WHERE key = ?", (key,))
+            .fetchone()
+        )
+        limit = self.ttl if max_age is None else min(self.ttl, max_age)
+        # an expired row stays until the next eviction
+        if row is None or now - row[0] > limit:
+            return None
+        self._touched[key] = now
+        return row
+
+    def _put(self, key: str, response: str, now: float, **columns: object) -> None:
+        names = ["key", *columns, *BASE_COLUMNS]
+        conn = self._connection()
+        with conn:
+            conn.execute(
+                f"INSERT OR REPLACE INTO {self.table} ({', '.join(names)}) "
+                f"VALUES ({', '.join('?' * len(names))})",
+                (key, *columns.values(), now, now, len(response), response),
+            )
+            conn.executemany(
+                f"UPDATE {self.table} SET used_at = ? WHERE key = ?",
+                [(used_at, touched) for touched, used_at in self._touched.items()],
+            )
+            self._touched.clear()
+            self._puts += 1
+            if self._puts % self.evict_every == 0:
+                self._evict(conn, now)
+
+    def _delete(self, conn: sqlite3.Connection, keys: list[str]) -> None:
+        conn.executemany(f"DELETE FROM {self.table} WHERE key = ?", [(k,) for k in keys])
+        self._forget(keys)
+
+    def _fits(self, count: int, total: int) -> bool:
+        return count <= self.max_entries and (self.max_bytes is None or total <= self.max_bytes)
+
+    def _evict(self, conn: sqlite3.Connection, now: float) -> None:
+        expired = conn.execute(
+            f"SELECT key FROM {self.table} WHERE created_at < ?", (now - self.ttl,)
+        ).fetchall()
+        self._delete(conn, [key for (key,) in expired])
+        count, total = self._size()
+        if self._fits(count, total):
+            return
+        # walk from least to most recently used until the caps hold
+        doomed = []
+        for key, size in conn.execute(
+            f"SELECT key, size FROM {self.table} ORDER BY used_at"
+        ).fetchall():
+            if self._fits(count, total):
+                break
+            doomed.append(key)
+            count -= 1
+            total -= size
+        self._delete(conn, doomed)
+
+    def _size(self) -> tuple[int, int]:
+        """Number of entries and bytes of responses."""
+        return (
+            self._connection()
+            .execute(f"SELECT COUNT(*), COALESCE(SUM(size), 0) FROM {self.table}")
+            .fetchone()
+        )
+
+    def _clear(self) -> None:
+        conn = self._connection()
+        with conn:
+            conn.execute(f"DELETE FROM {self.table}")
+        self._touched.clear()
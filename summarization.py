@@ -0,0 +1,161 @@
+"""
+Running conversation summary for the echo graphs.
+
+Only messages that are being evicted from the window are folded into the
+summary, the transcript is rendered as plain "Role: text" lines instead of
+message reprs, and the result is held under a token budget. So the summary
+(and with it the prompt of every `echo` call) stays the same size however
+long the conversation gets.
+"""
+
+import asyncio
+import contextvars
+import logging
+import threading
+from collections.abc import Awaitable, Callable
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from langchain_core.messages import AIMessage, AnyMessage, HumanMessage, ToolMessage
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_TOKEN_BUDGET = 300
+# evicted tool results are mostly raw payloads, the gist fits in a few lines
+TOOL_RESULT_CHARS = 400
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count, ~4 characters per token for English text."""
+    return (len(text) + 3) // 4
+
+
+def message_text(message: AnyMessage) -> str:
+    content = message.content
+    if isinstance(content, str):
+        return content
+    parts = []
+    for part in content:
+        if isinstance(part, str):
+            parts.append(part)
+        elif isinstance(part, dict) and "text" in part:
+            parts.append(part["text"])
+    return "".join(parts)
+
+
+def render_message(message: AnyMessage) -> str:
+    text = " ".join(message_text(message).split())
+    if isinstance(message, HumanMessage):
+        return f"User: {text}"
+    if isinstance(message, ToolMessage):
+        if len(text) > TOOL_RESULT_CHARS:
+            text = text[:TOOL_RESULT_CHARS] + " ..."
+        return f"Tool {message.name}: {text}"
+    if isinstance(message, AIMessage):
+        lines = [f"Assistant: {text}"] if text else []
+        for call in message.tool_calls:
+            args = ", ".join(f"{key}={value!r}" for key, value in call["args"].items())
+            lines.append(f"Assistant called {call['name']}({args})")
+        return "\n".join(lines)
+    return f"{message.type}: {text}"
+
+
+def render_transcript(messages: list[AnyMessage]) -> str:
+    return "\n".join(line for line in map(render_message, messages) if line)
+
+
+def summary_prompt(
+    existing_summary: str,
+    new_messages: list[AnyMessage],
+    token_budget: int = SUMMARY_TOKEN_BUDGET,
+) -> str:
+    words = int(token_budget * 0.75)
+    return f"""Update the running summary of a conversation between a user and a
+librarian assistant with the new messages below.
+
+Keep facts that matter later: the user's tastes and dislikes, books already
+recommended and how the user reacted, open questions. Drop greetings,
+repetition and raw tool output. Reply with the updated summary only, at most
+{words} words.
+
+Current summary:
+{existing_summary or "(empty)"}
+
+New messages:
+{render_transcript(new_messages)}
+"""
+
+
+def clamp_summary(text: str, token_budget: int = SUMMARY_TOKEN_BUDGET) -> str:
+    """Cut `text` at the last sentence end that fits the budget."""
+    text = text.strip()
+    if estimate_tokens(text) <= token_budget:
+        return text
+    cut = text[: token_budget * 4]
+    end = max(cut.rfind(". "), cut.rfind("\n"))
+    return cut[: end + 1].strip() if end > 0 else cut.strip()
+
+
+class BackgroundSummarizer:
+    """
+    Runs summary calls off the response path, at most one per thread.
+
+    `submit` starts folding `messages` into the summary once the reply has
+    been sent; the next turn calls `pop_finished` and applies the result if
+    it is ready, or carries on with the raw window if it is not (the job is
+    left running and picked up on a later turn). Results live in memory
+    only, so a restart just means the summary is recomputed.
+    """
+
+    def __init__(
+        self,
+        summarize: Callable[[str, list[AnyMessage]], AnyMessage],
+        asummarize: Callable[[str, list[AnyMessage]], Awaitable[AnyMessage]],
+        max_workers: int = 4,
+    ) -> None:
+        self._summarize = summarize
+        self._asummarize = asummarize
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="summarizer"
+        )
+        self._pending: dict[str, tuple[Future | asyncio.Task, list[AnyMessage]]] = {}
+        self._lock = threading.Lock()
+
+    def submit(
+        self, thread_id: str, existing_summary: str, messages: list[AnyMessage]
+    ) -> bool:
+        with self._lock:
+            if thread_id in self._pending:
+                return False
+            job = self._executor.submit(self._summarize, existing_summary, messages)
+            self._pending[thread_id] = (job, messages)
+        return True
+
+    def asubmit(
+        self, thread_id: str, existing_summary: str, messages: list[AnyMessage]
+    ) -> bool:
+        """Like `submit`, but as a task on the running event loop."""
+        with self._lock:
+            if thread_id in self._pending:
+                return False
+            # fresh context: the finished run's callbacks shouldn't see this call
+            job = asyncio.create_task(
+                self._asummarize(existing_summary, messages),
+                context=contextvars.Context(),
+            )
+            self._pending[thread_id] = (job, messages)
+        return True
+
+    def pop_finished(
+        self, thread_id: str
+    ) -> tuple[list[AnyMessage], AnyMessage] | None:
+        """(summarized messages, summary) if the thread's job is done, else None."""
+        with self._lock:
+            job, messages = self._pending.get(thread_id, (None, None))
+            if job is None or not job.done():
+                return None
+            del self._pending[thread_id]
+        if job.cancelled() or job.exception() is not None:
+            # dropped, the next turn past the budget schedules it again
+            logger.warning("background summary for %s failed", thread_id)
+            return None
+        return messages, job.result()
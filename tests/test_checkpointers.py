@@ -0,0 +1,108 @@
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
+
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage
+from langgraph.checkpoint.base import empty_checkpoint
+
+from checkpointers import (
+    RetentionPolicy,
+    collect_message_garbage,
+    compact,
+    sqlite_checkpointer,
+)
+
+
+def put(saver, thread_id, messages, parent=None, source="loop"):
+    checkpoint = empty_checkpoint()
+    checkpoint["channel_values"] = {"messages": messages}
+    configurable = {"thread_id": thread_id, "checkpoint_ns": ""}
+    if parent is not None:
+        configurable["checkpoint_id"] = parent
+    config = saver.put({"configurable": configurable}, checkpoint, {"source": source}, {})
+    return config["configurable"]["checkpoint_id"]
+
+
+def messages_of(saver, thread_id):
+    found = saver.get_tuple({"configurable": {"thread_id": thread_id, "checkpoint_ns": ""}})
+    return found.checkpoint["channel_values"]["messages"]
+
+
+def rows(db_path, sql):
+    with closing(sqlite3.connect(db_path)) as conn:
+        return conn.execute(sql).fetchall()
+
+
+@pytest.mark.parametrize("delta", [True, False])
+def test_new_database_uses_incremental_vacuum(tmp_path, delta):
+    db_path = str(tmp_path / "checkpoints.db")
+    with sqlite_checkpointer(db_path, delta=delta) as saver:
+        saver.get_tuple({"configurable": {"thread_id": "t"}})
+
+    with closing(sqlite3.connect(db_path)) as conn:
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        assert conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2  # INCREMENTAL
+
+
+def test_delta_saver_round_trip(tmp_path):
+    db_path = str(tmp_path / "checkpoints.db")
+    history = {
+        f"t{i}": [HumanMessage(content=f"question {i}", id=f"h{i}"), AIMessage(content="shared", id="a")]
+        for i in range(20)
+    }
+    with sqlite_checkpointer(db_path) as saver:
+        # concurrent puts go through the batching writer thread
+        with ThreadPoolExecutor(8) as pool:
+            list(pool.map(lambda item: put(saver, *item), history.items()))
+        for thread_id, messages in history.items():
+            assert messages_of(saver, thread_id) == messages
+
+    # one row per distinct message, and the checkpoints only hold references
+    assert len(rows(db_path, "SELECT hash FROM messages")) == 21
+    for (blob,) in rows(db_path, "SELECT checkpoint FROM checkpoints"):
+        assert b"question" not in blob
+
+    with sqlite_checkpointer(db_path) as saver:
+        assert messages_of(saver, "t3") == history["t3"]
+
+
+def test_compaction_keeps_last_and_input_checkpoints(tmp_path):
+    db_path = str(tmp_path / "checkpoints.db")
+    with sqlite_checkpointer(db_path) as saver:
+        ids, parent = [], None
+        for step in range(10):
+            source = "input" if step % 3 == 0 else "loop"
+            parent = put(saver, "t", [HumanMessage(content=str(step), id=str(step))], parent, source)
+            ids.append(parent)
+
+    stats = compact(db_path, RetentionPolicy(keep_last=3))
+
+    kept = {ids[i] for i in (0, 3, 6, 7, 8, 9)}
+    assert stats["checkpoints_deleted"] == 4
+    remaining = rows(
+        db_path, "SELECT checkpoint_id, parent_checkpoint_id FROM checkpoints ORDER BY checkpoint_id"
+    )
+    assert {checkpoint_id for checkpoint_id, _ in remaining} == kept
+    # every kept checkpoint points at the previous kept one
+    assert [parent for _, parent in remaining] == [None] + [c for c, _ in remaining[:-1]]
+    with sqlite_checkpointer(db_path) as saver:
+        assert messages_of(saver, "t") == [HumanMessage(content="9", id="9")]
+
+
+def test_garbage_collection_keeps_referenced_messages(tmp_path):
+    db_path = str(tmp_path / "checkpoints.db")
+    kept = HumanMessage(content="kept", id="k")
+    dropped = HumanMessage(content="dropped", id="d")
+    with sqlite_checkpointer(db_path) as saver:
+        put(saver, "t1", [kept])
+        put(saver, "t2", [kept, dropped])
+        saver.delete_thread("t2")
+
+        with closing(sqlite3.connect(db_path, isolation_level=None)) as conn:
+            assert collect_message_garbage(conn) == 1
+            assert collect_message_garbage(conn) == 0
+
+        saver._message_cache.clear()
+        assert messages_of(saver, "t1") == [kept]
+    assert len(rows(db_path, "SELECT hash FROM messages")) == 1
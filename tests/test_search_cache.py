@@ -0,0 +1,51 @@
+import time
+
+import pytest
+
+from search_cache import SearchCache
+
+RESPONSE = {"results": [{"title": "The Thursday Murder Club", "url": "https://example.com"}]}
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return SearchCache(str(tmp_path / "search.db"), ttl=3600, near_max_age=600)
+
+
+def test_exact_hit_on_normalized_query(cache):
+    cache.put("Cozy mysteries with a cat detective?", "advanced", RESPONSE)
+
+    assert cache.get("  cozy MYSTERIES with a cat detective ", "advanced") == RESPONSE
+    assert cache.get("cozy mysteries with a cat detective", "basic") is None
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["near_hits"] == 0
+
+
+def test_near_duplicate_hit(cache):
+    cache.put("cozy mysteries with a cat detective", "advanced", RESPONSE)
+
+    # a filler word added: ~0.9 estimated similarity, above the 0.7 threshold
+    assert cache.similarity_threshold == 0.7
+    assert cache.get("cozy mysteries with a cat detective books", "advanced") == RESPONSE
+    assert cache.stats()["near_hits"] == 1
+
+
+def test_one_word_topic_swap_does_not_match(cache):
+    cache.put("best translated russian classics", "advanced", RESPONSE)
+
+    assert cache.get("best translated french classics", "advanced") is None
+    assert cache.stats()["misses"] == 1
+
+
+def test_entries_expire(cache, monkeypatch):
+    cache.put("sad novels set in japan", "advanced", RESPONSE)
+    cache.put("science fiction with first contact", "advanced", RESPONSE)
+    now = time.time()
+
+    # near-duplicates have to be younger than near_max_age, exact hits than ttl
+    monkeypatch.setattr(time, "time", lambda: now + 601)
+    assert cache.get("good science fiction with first contact", "advanced") is None
+    assert cache.get("sad novels set in japan", "advanced") == RESPONSE
+
+    monkeypatch.setattr(time, "time", lambda: now + 3601)
+    assert cache.get("sad novels set in japan", "advanced") is None
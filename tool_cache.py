@@ -0,0 +1,115 @@
+"""
+Memoization for deterministic tools.
+
+The agent often calls `read_file`, `list_files` or `get_system_info` with the
+same arguments several times in a conversation. `memoize` goes between
+`@tool` and the function and returns the previous result while it is still
+valid:
+
+    @tool
+    @memoize(ttl=300, stamp=path_stamp("file_path"))
+    def read_file(file_path: str, ...) -> str: ...
+
+An entry is valid until `ttl` seconds have passed (None: for the life of the
+process) and for as long as `stamp(**arguments)` returns what it returned
+when the entry was stored. For filesystem tools, the stamp is the path's
+mtime and size. Hit and miss counts per tool are in `tool_cache_stats()`.
+"""
+
+import functools
+import inspect
+import os
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable
+from typing import Any
+
+_caches: dict[str, "_ToolCache"] = {}
+
+
+class _ToolCache:
+    def __init__(self, ttl: float | None, maxsize: int) -> None:
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.entries: OrderedDict[str, tuple[float, Any, Any]] = OrderedDict()
+        self.lock = threading.Lock()
+
+
+def path_stamp(argument: str) -> Callable[..., Any]:
+    """Stamp from the mtime and size of the path passed as `argument`."""
+
+    def stamp(**arguments: Any) -> Any:
+        try:
+            stat = os.stat(os.path.expanduser(arguments[argument]))
+        except OSError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    return stamp
+
+
+def cwd_stamp(**arguments: Any) -> str:
+    """Stamp for results that depend on the working directory."""
+    return os.getcwd()
+
+
+def memoize(
+    ttl: float | None = None,
+    stamp: Callable[..., Any] | None = None,
+    maxsize: int = 256,
+) -> Callable[[Callable], Callable]:
+    def decorator(fn: Callable) -> Callable:
+        signature = inspect.signature(fn)
+        cache = _caches[fn.__name__] = _ToolCache(ttl, maxsize)
+
+        @functools.wraps(fn)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            key = repr(sorted(bound.arguments.items()))
+            current = stamp(**bound.arguments) if stamp else None
+            now = time.monotonic()
+
+            with cache.lock:
+                entry = cache.entries.get(key)
+                if entry is not None:
+                    stored_at, stored_stamp, result = entry
+                    if (ttl is None or now - stored_at < ttl) and stored_stamp == current:
+                        cache.entries.move_to_end(key)
+                        cache.hits += 1
+                        return result
+                cache.misses += 1
+
+            result = fn(*args, **kwargs)
+            with cache.lock:
+                cache.entries[key] = (now, current, result)
+                cache.entries.move_to_end(key)
+                while len(cache.entries) > cache.maxsize:
+                    cache.entries.popitem(last=False)
+            return result
+
+        return wrapper
+
+    return decorator
+
+
+def tool_cache_stats() -> dict[str, dict[str, int]]:
+    stats = {}
+    for name, cache in _caches.items():
+        with cache.lock:
+            stats[name] = {
+                "hits": cache.hits,
+                "misses": cache.misses,
+                "entries": len(cache.entries),
+            }
+    return stats
+
+
+def clear_tool_caches() -> None:
+    for cache in _caches.values():
+        with cache.lock:
+            cache.entries.clear()
+            cache.hits = cache.misses = 0
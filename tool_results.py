@@ -0,0 +1,151 @@
+"""
+Compact tool results for the message history.
+
+A Tavily "advanced" search returns long content chunks for every hit. As a
+ToolMessage that payload is re-sent on every `echo` call until it is
+summarized away, although the librarian only needs titles, links and a
+couple of relevant sentences per hit. `compact_search_response` renders
+exactly that under a token cap. The full response is kept out of the history
+in a `ToolResultStore`, and the model can fetch one result in full with the
+`get_search_result` tool using the reference included in the compact text.
+"""
+
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Any
+
+from column_index import tokenize
+from summarization import estimate_tokens
+
+TOOL_RESULTS_DB = os.environ.get("TOOL_RESULTS_DB", "tool_results.db")
+SEARCH_RESULT_TOKEN_CAP = 600
+SNIPPETS_PER_RESULT = 2
+SNIPPET_CHARS = 240
+FULL_RESULT_CHARS = 8000
+
+_SENTENCE_SPLIT = re.compile(r"(?<=[.!?])\s+|\s*(?:\.\.\.|…|\n)+\s*")
+
+
+class ToolResultStore:
+    """
+    Full tool payloads, stored outside the message history by reference.
+
+    Backed by SQLite so references in checkpointed messages stay valid
+    across restarts. Only the newest `max_rows` payloads are kept.
+    """
+
+    def __init__(self, db_path: str = TOOL_RESULTS_DB, max_rows: int = 1000) -> None:
+        self.db_path = db_path
+        self.max_rows = max_rows
+        self._conn: sqlite3.Connection | None = None
+        self._lock = threading.Lock()
+
+    def _connection(self) -> sqlite3.Connection:
+        # opened on first use so importing tools.py doesn't create the file
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._conn.execute(
+                """CREATE TABLE IF NOT EXISTS tool_results (
+                    ref TEXT PRIMARY KEY,
+                    tool TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    payload TEXT NOT NULL
+                )"""
+            )
+        return self._conn
+
+    def put(self, tool: str, payload: Any) -> str:
+        data = json.dumps(payload, sort_keys=True, default=str)
+        ref = f"{tool}:{hashlib.sha256(data.encode()).hexdigest()[:12]}"
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO tool_results VALUES (?, ?, ?, ?)",
+                    (ref, tool, time.time(), data),
+                )
+                conn.execute(
+                    """DELETE FROM tool_results WHERE ref NOT IN (
+                        SELECT ref FROM tool_results ORDER BY created_at DESC LIMIT ?
+                    )""",
+                    (self.max_rows,),
+                )
+        return ref
+
+    def get(self, ref: str) -> Any | None:
+        with self._lock:
+            row = (
+                self._connection()
+                .execute("SELECT payload FROM tool_results WHERE ref = ?", (ref,))
+                .fetchone()
+            )
+        return json.loads(row[0]) if row else None
+
+
+tool_result_store = ToolResultStore()
+
+
+def top_snippets(text: str, query: str, n: int = SNIPPETS_PER_RESULT) -> list[str]:
+    """The `n` sentences of `text` sharing the most terms with `query`, in text order."""
+    sentences = [s.strip() for s in _SENTENCE_SPLIT.split(text or "") if s.strip()]
+    if len(sentences) <= n:
+        chosen = sentences
+    else:
+        terms = set(tokenize(query))
+        overlap = [len(terms & set(tokenize(s))) for s in sentences]
+        best = sorted(range(len(sentences)), key=lambda i: (-overlap[i], i))[:n]
+        chosen = [sentences[i] for i in sorted(best)]
+    return [
+        s if len(s) <= SNIPPET_CHARS else s[:SNIPPET_CHARS].rsplit(" ", 1)[0] + " ..."
+        for s in chosen
+    ]
+
+
+def compact_search_response(
+    response: dict[str, Any], ref: str, token_cap: int = SEARCH_RESULT_TOKEN_CAP
+) -> str:
+    """Titles, URLs and top snippets of a Tavily response, within `token_cap`."""
+    query = response.get("query", "")
+    results = sorted(
+        response.get("results", []), key=lambda r: -(r.get("score") or 0.0)
+    )
+    text = f"Search results for {query!r} (ref {ref}):"
+    if response.get("answer"):
+        text += f"\nAnswer: {response['answer']}"
+
+    shown = 0
+    for number, result in enumerate(results, start=1):
+        block = f"\n{number}. {result.get('title') or 'Untitled'} - {result.get('url', '')}"
+        for snippet in top_snippets(result.get("content", ""), query):
+            block += f"\n   {snippet}"
+        # always show at least one hit, even if it alone is over the cap
+        if shown and estimate_tokens(text + block) > token_cap:
+            break
+        text += block
+        shown += 1
+
+    if shown < len(results):
+        text += f"\n({len(results) - shown} more results not shown)"
+    return text + f"\nFull text of a result: get_search_result(ref={ref!r}, index=N)"
+
+
+def full_search_result(ref: str, index: int) -> str:
+    response = tool_result_store.get(ref)
+    if response is None:
+        return f"Error: no stored search results for '{ref}'."
+    results = sorted(
+        response.get("results", []), key=lambda r: -(r.get("score") or 0.0)
+    )
+    if not 1 <= index <= len(results):
+        return f"Error: '{ref}' has results 1 to {len(results)}, not {index}."
+
+    result = results[index - 1]
+    content = result.get("raw_content") or result.get("content") or ""
+    if len(content) > FULL_RESULT_CHARS:
+        content = content[:FULL_RESULT_CHARS] + "\n... [truncated]"
+    return f"{result.get('title') or 'Untitled'} - {result.get('url', '')}\n\n{content}"
@@ -0,0 +1,137 @@
+"""
+Timeouts for the echo graph's tool calls.
+
+When the model asks for several tools in one turn (three genre searches and
+the date, say), `ToolNode` already runs them concurrently and returns the
+results in call order. What it lacks is a bound on how long one call may
+hold up the turn, and under `ainvoke` every sync tool lands on the event
+loop's default executor. `parallel_tool_node` adds both, through ToolNode's
+own wrapper hooks, under invoke and ainvoke alike:
+
+- a call that runs out of its timeout answers with an error ToolMessage,
+  so the model can carry on without that result;
+- tools listed in TOOL_TIMEOUTS are the ones that wait on the network.
+  Their sync calls run on `slow_tool_executor` with that timeout;
+- the other sync tools run on `tool_executor` with DEFAULT_TOOL_TIMEOUT,
+  and tools with a coroutine run on the loop.
+
+A Python thread can't be stopped, so a call that times out keeps its worker
+until it returns. Once SLOW_TOOL_WORKERS slow calls hang, later slow calls
+wait in the pool's queue and time out there (they are then dropped without
+running); local tools keep their own pool and are not held up. Likewise,
+TOOL_WORKERS hung local calls make later local calls time out in the queue.
+"""
+
+import asyncio
+import contextvars
+import functools
+import inspect
+import os
+from collections.abc import Callable, Sequence
+from concurrent.futures import Executor, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import Any
+
+from langchain_core.messages import ToolMessage
+from langchain_core.runnables import RunnableConfig
+from langchain_core.tools import BaseTool, StructuredTool
+from langgraph.prebuilt import ToolNode
+from langgraph.prebuilt.tool_node import ToolCallRequest
+
+TOOL_WORKERS = int(os.environ.get("TOOL_WORKERS", "8"))
+SLOW_TOOL_WORKERS = int(os.environ.get("SLOW_TOOL_WORKERS", "8"))
+DEFAULT_TOOL_TIMEOUT = 10.0
+# seconds; web search at "advanced" depth is the slow one
+TOOL_TIMEOUTS = {"search_web": 20.0}
+
+tool_executor = ThreadPoolExecutor(max_workers=TOOL_WORKERS, thread_name_prefix="tool")
+# hung network calls only ever fill this one, see the module docstring
+slow_tool_executor = ThreadPoolExecutor(
+    max_workers=SLOW_TOOL_WORKERS, thread_name_prefix="slow-tool"
+)
+
+
+def timeout_message(request: ToolCallRequest, timeout: float) -> ToolMessage:
+    name = request.tool_call["name"]
+    return ToolMessage(
+        content=f"Error: {name} did not finish within {timeout:g}s, try again or go on without it.",
+        name=name,
+        tool_call_id=request.tool_call["id"],
+        status="error",
+    )
+
+
+def on_executor(tool: BaseTool, executor: Executor) -> BaseTool:
+    """Copy of a sync-only tool whose async path runs it on `executor`."""
+    if not isinstance(tool, StructuredTool) or tool.coroutine is not None:
+        return tool
+    func = tool.func
+    # the tool only passes a RunnableConfig to a coroutine that asks for one
+    config_param = next(
+        (
+            name
+            for name, param in inspect.signature(func).parameters.items()
+            if param.annotation is RunnableConfig
+        ),
+        None,
+    )
+
+    async def run(*args: Any, **kwargs: Any) -> Any:
+        # copy_context keeps callbacks and tracing attached to the run
+        call = functools.partial(contextvars.copy_context().run, func, *args, **kwargs)
+        return await asyncio.get_running_loop().run_in_executor(executor, call)
+
+    if config_param is None:
+        coroutine = run
+    else:
+
+        async def coroutine(*args: Any, config: RunnableConfig, **kwargs: Any) -> Any:
+            return await run(*args, **{config_param: config}, **kwargs)
+
+    return tool.model_copy(update={"coroutine": coroutine})
+
+
+def parallel_tool_node(
+    tools: Sequence[BaseTool | Callable],
+    timeouts: dict[str, float] | None = None,
+    default_timeout: float = DEFAULT_TOOL_TIMEOUT,
+    executor: Executor = tool_executor,
+    slow_executor: Executor = slow_tool_executor,
+    **kwargs: Any,
+) -> ToolNode:
+    """
+    ToolNode with per-tool timeouts. Sync tools named in `timeouts` run on
+    `slow_executor`, the other sync tools on `executor`.
+    """
+    timeouts = TOOL_TIMEOUTS if timeouts is None else timeouts
+
+    def wrap_tool_call(request: ToolCallRequest, execute: Callable) -> Any:
+        name = request.tool_call["name"]
+        timeout = timeouts.get(name, default_timeout)
+        pool = slow_executor if name in timeouts else executor
+        call = functools.partial(contextvars.copy_context().run, execute, request)
+        future = pool.submit(call)
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeoutError:
+            # drops a call still queued; a running one keeps its worker until
+            # it returns, and its result is dropped then
+            future.cancel()
+            return timeout_message(request, timeout)
+
+    async def awrap_tool_call(request: ToolCallRequest, execute: Callable) -> Any:
+        timeout = timeouts.get(request.tool_call["name"], default_timeout)
+        try:
+            return await asyncio.wait_for(execute(request), timeout)
+        except asyncio.TimeoutError:
+            return timeout_message(request, timeout)
+
+    tools = [
+        on_executor(t, slow_executor if t.name in timeouts else executor)
+        if isinstance(t, BaseTool)
+        else t
+        for t in tools
+    ]
+    return ToolNode(
+        tools, wrap_tool_call=wrap_tool_call, awrap_tool_call=awrap_tool_call, **kwargs
+    )
@@ -1,6 +1,29 @@
+from typing import TYPE_CHECKING
+
 from langchain.tools import tool
-from tavily import TavilyClient
-import json
+from langchain_core.runnables import RunnableConfig
+
+from search_cache import search_cache
+from tool_cache import cwd_stamp, memoize, path_stamp
+from tool_results import compact_search_response, full_search_result, tool_result_store
+
+if TYPE_CHECKING:
+    from tavily import TavilyClient
+
+# built on first search and reused, so each search skips client setup; the SDK
+# itself is only imported then too
+search_client: "TavilyClient | None" = None
+
+
+def get_search_client() -> "TavilyClient":
+    global search_client
+    if search_client is None:
+        import os
+
+        from tavily import TavilyClient
+
+        search_client = TavilyClient(api_key=os.environ["TAVILY_API_KEY"])
+    return search_client
 
 
 @tool
@@ -16,15 +39,32 @@ def get_current_datetime() -> str:
 
 
 @tool
-def list_files(directory: str) -> str:
-    """List all files and folders in a directory.
+# a directory's mtime moves when entries are added or removed, not when a file
+# inside is rewritten, so sizes in a cached listing may be up to `ttl` old
+@memoize(ttl=30, stamp=path_stamp("directory"))
+def list_files(
+    directory: str,
+    pattern: str = "*",
+    sort_by: str = "name",
+    offset: int = 0,
+    limit: int = 50,
+    summary: bool = False,
+) -> str:
+    """List files and folders in a directory, a page at a time.
 
     Args:
         directory: Path to the directory to list. Use '~' for home directory.
                    Example: '~/Downloads', '/tmp', '.'
+        pattern: Glob pattern to filter names, e.g. '*.pdf' (default '*').
+        sort_by: 'name' (folders first), 'size' or 'mtime' (largest/newest first).
+        offset: Number of entries to skip, to page through a large directory.
+        limit: Maximum number of entries to return (default 50, at most 200).
+        summary: If true, return counts and total size per file extension instead.
     """
     import os
 
+    from dir_listing import entry_stat, human_size, list_page, summarize
+
     # Expand ~ to home directory
     expanded_path = os.path.expanduser(directory)
 
@@ -35,51 +75,70 @@ def list_files(directory: str) -> str:
         return f"Error: '{directory}' is not a directory."
 
     try:
-        items = os.listdir(expanded_path)
-        if not items:
+        if summary:
+            by_ext = summarize(expanded_path, pattern)
+            if not by_ext:
+                return f"Directory '{directory}' has no entries matching '{pattern}'."
+            rows = sorted(by_ext.items(), key=lambda item: -item[1][1])
+            lines = [
+                f"{ext}: {count} ({human_size(size)})" if ext != "<dir>" else f"folders: {count}"
+                for ext, (count, size) in rows[:50]
+            ]
+            if len(rows) > 50:
+                lines.append(f"... and {len(rows) - 50} more extensions")
+            total = sum(size for _, size in by_ext.values())
+            return (
+                f"Summary of '{directory}' ({sum(c for c, _ in by_ext.values())} entries, "
+                f"{human_size(total)}):\n" + "\n".join(lines)
+            )
+
+        listing = list_page(expanded_path, pattern, sort_by, offset, limit)
+    except ValueError as e:
+        return f"Error: {e}"
+    except PermissionError:
+        return f"Error: Permission denied to access '{directory}'."
+
+    if not listing.total:
+        if pattern in ("", "*"):
             return f"Directory '{directory}' is empty."
+        return f"Directory '{directory}' has no entries matching '{pattern}'."
 
-        # Separate files and directories
-        files = []
-        dirs = []
-        for item in items:
-            full_path = os.path.join(expanded_path, item)
-            if os.path.isdir(full_path):
-                dirs.append(f"📁 {item}/")
-            else:
-                # Get file size
-                size = os.path.getsize(full_path)
-                if size < 1024:
-                    size_str = f"{size} B"
-                elif size < 1024 * 1024:
-                    size_str = f"{size / 1024:.1f} KB"
-                else:
-                    size_str = f"{size / (1024 * 1024):.1f} MB"
-                files.append(f"📄 {item} ({size_str})")
-
-        result = f"Contents of '{directory}':\n"
-        result += (
-            f"\nDirectories ({len(dirs)}):\n" + "\n".join(sorted(dirs)) if dirs else ""
-        )
-        result += (
-            f"\n\nFiles ({len(files)}):\n" + "\n".join(sorted(files)) if files else ""
-        )
-        return result
+    lines = []
+    for entry in listing.entries:
+        if entry.is_dir():
+            lines.append(f"📁 {entry.name}/")
+        else:
+            stat = entry_stat(entry)
+            lines.append(f"📄 {entry.name} ({human_size(stat.st_size) if stat else '?'})")
 
-    except PermissionError:
-        return f"Error: Permission denied to access '{directory}'."
+    first = listing.offset + 1
+    last = listing.offset + len(listing.entries)
+    result = f"Contents of '{directory}' ({first}-{last} of {listing.total}, by {sort_by}):\n"
+    result += "\n".join(lines)
+    if listing.next_offset is not None:
+        result += f"\n\n... [more entries, continue with offset={listing.next_offset}]"
+    return result
 
 
 @tool
-def read_file(file_path: str, max_lines: int = 50) -> str:
-    """Read the contents of a text file.
+@memoize(ttl=300, stamp=path_stamp("file_path"))
+def read_file(
+    file_path: str, max_lines: int = 50, offset: int = 0, tail: bool = False
+) -> str:
+    """Read lines from a text file, a page at a time.
+
+    Large files are fine: only the requested lines are read.
 
     Args:
         file_path: Path to the file to read. Use '~' for home directory.
-        max_lines: Maximum number of lines to read (default 50 to prevent huge outputs).
+        max_lines: Maximum number of lines to return (default 50).
+        offset: Number of lines to skip from the start, to page through a file.
+        tail: If true, return the last max_lines lines instead (e.g. for logs).
     """
     import os
 
+    from file_reader import MAX_OUTPUT_BYTES, is_binary, read_page, read_tail
+
     expanded_path = os.path.expanduser(file_path)
 
     if not os.path.exists(expanded_path):
@@ -89,23 +148,39 @@ def read_file(file_path: str, max_lines: int = 50) -> str:
         return f"Error: '{file_path}' is a directory, not a file."
 
     try:
-        with open(expanded_path, "r", encoding="utf-8") as f:
-            lines = f.readlines()
-            total_lines = len(lines)
-
-            if total_lines > max_lines:
-                content = "".join(lines[:max_lines])
-                return f"File: {file_path} (showing first {max_lines} of {total_lines} lines)\n\n{content}\n\n... [{total_lines - max_lines} more lines]"
-            else:
-                return f"File: {file_path} ({total_lines} lines)\n\n{''.join(lines)}"
-
-    except UnicodeDecodeError:
-        return f"Error: '{file_path}' is not a text file (binary content)."
+        if is_binary(expanded_path):
+            return f"Error: '{file_path}' is not a text file (binary content)."
+
+        max_lines = max(max_lines, 0)
+        if tail:
+            page = read_tail(expanded_path, max_lines)
+        else:
+            page = read_page(expanded_path, max(offset, 0), max_lines)
+
     except PermissionError:
         return f"Error: Permission denied to read '{file_path}'."
 
+    if page.total_lines is not None:
+        total = f"{page.total_lines}"
+    elif page.estimated_total is not None:
+        total = f"~{page.estimated_total}"
+    else:
+        total = "?"
+    if not page.lines:
+        return f"File: {file_path} ({total} lines, nothing at offset {offset})"
+
+    last_line = page.first_line + len(page.lines) - 1
+    header = f"File: {file_path} (lines {page.first_line}-{last_line} of {total})"
+    result = f"{header}\n\n" + "\n".join(page.lines)
+    if page.truncated_bytes:
+        result += f"\n\n... [stopped at the {MAX_OUTPUT_BYTES} character limit]"
+    if page.more_after:
+        result += f"\n\n... [more lines, continue with offset={last_line}]"
+    return result
+
 
 @tool
+@memoize(stamp=cwd_stamp)  # fixed for the life of the process, bar the cwd
 def get_system_info() -> str:
     """Get information about the current system including OS, Python version, and working directory.
 
@@ -127,20 +202,47 @@ def get_system_info() -> str:
 
 
 @tool
-def search_web(query: str) -> dict:
+def search_web(query: str) -> str:
     """
     Use this tool to search the web for information.
+
+    Returns titles, URLs and the most relevant snippets of each result, plus
+    a reference that get_search_result takes to fetch a result's full text.
     """
-    import os
+    response = search_cache.get(query, "advanced")
+    if response is None:
+        response = get_search_client().search(query=query, search_depth="advanced")
+        search_cache.put(query, "advanced", response)
+    # the raw response stays out of the message history, see tool_results.py
+    ref = tool_result_store.put("search_web", response)
+    return compact_search_response(response, ref)
+
 
-    api_key = os.environ["TAVILY_API_KEY"]
-    client = TavilyClient(api_key=api_key)
-    response = client.search(query=query, search_depth="advanced")
-    return response
+@tool
+def get_search_result(ref: str, index: int) -> str:
+    """Get the full text of one result from an earlier search_web call.
+
+    Use this only when the snippets from search_web are not enough.
+
+    Args:
+        ref: The reference printed by search_web, e.g. 'search_web:3f2a9c1e0b7d'.
+        index: The number of the result as listed by search_web, starting at 1.
+    """
+    return full_search_result(ref, index)
 
 
 @tool
-def update_user_preferences(likes: list[str] = [], dislikes: list[str] = []):
-    """..."""
-    prefs = {"likes": likes, "dislikes": dislikes}
-    return f"PREF_UPDATE:{json.dumps(prefs)}"
+def update_user_preferences(
+    config: RunnableConfig, likes: list[str] = [], dislikes: list[str] = []
+) -> str:
+    """Save the user's book preferences. Call this when the user says what they
+    like or dislike (genres, authors, themes, pacing, ...).
+
+    Args:
+        likes: Things the user likes, e.g. ['slow-burn mysteries', 'Ishiguro'].
+        dislikes: Things the user dislikes, e.g. ['romance'].
+    """
+    from preferences import preference_store, render_preferences, user_id_from_config
+
+    prefs = preference_store.update(user_id_from_config(config), likes, dislikes)
+    return f"Preferences saved.\n{render_preferences(prefs)}"